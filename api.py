@@ -5,17 +5,137 @@
 Chat-Excel API: 提供RESTful接口将Excel文件转换为SQL语句
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import tempfile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse
+import hashlib
 import os
-from typing import Dict, List
+import tempfile
+import zlib
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict
 
 from core.excel_parser import ExcelParser
 from core.sql_generator import SQLGenerator
+from core.pipeline import profile_workbook, iter_workbook_sql
+from core.profiling import Profiler
+from core.cache import ResultCache, SheetCache, cache_key, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_DISK_BYTES
+from core.workers import WorkerPool, WorkerPoolFull
+from core.jobs import JobManager, JOB_DONE, JOB_FAILED, DEFAULT_JOB_CONCURRENCY, DEFAULT_JOB_TTL
+
+# 转换任务的工作池：CHAT_EXCEL_WORKERS为同时执行的任务数（默认为CPU核心数），
+# CHAT_EXCEL_MAX_QUEUE为排队任务数上限（默认为工作数的2倍），超过时返回503，
+# CHAT_EXCEL_WORKER_MODE为thread（默认，直接读取上传的临时文件）或process
+worker_pool = WorkerPool(
+    max_workers=int(os.getenv("CHAT_EXCEL_WORKERS", 0)) or None,
+    max_queue=int(os.getenv("CHAT_EXCEL_MAX_QUEUE")) if os.getenv("CHAT_EXCEL_MAX_QUEUE") else None,
+    mode=os.getenv("CHAT_EXCEL_WORKER_MODE", "thread")
+)
+
+# 后台转换任务：CHAT_EXCEL_JOB_CONCURRENCY为同时执行的任务数，
+# CHAT_EXCEL_JOB_TTL为任务结束后结果保留的秒数，CHAT_EXCEL_JOB_DIR为任务文件目录（默认为临时目录）
+job_manager = JobManager(
+    concurrency=int(os.getenv("CHAT_EXCEL_JOB_CONCURRENCY", DEFAULT_JOB_CONCURRENCY)),
+    ttl=float(os.getenv("CHAT_EXCEL_JOB_TTL", DEFAULT_JOB_TTL)),
+    work_dir=os.getenv("CHAT_EXCEL_JOB_DIR") or None
+)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    worker_pool.shutdown()
+    job_manager.shutdown(wait=False)
+
+app = FastAPI(lifespan=lifespan)
+
+# 流式响应每次发送的字节数下限，避免逐条语句发送过多的小块
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 读取上传文件时每次读取的字节数
+UPLOAD_READ_SIZE = 1024 * 1024
 
-app = FastAPI()
+# 上传文件的大小上限：CHAT_EXCEL_MAX_UPLOAD_BYTES，默认为200MB
+MAX_UPLOAD_BYTES = int(os.getenv("CHAT_EXCEL_MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+
+# /sheets每个工作表最多预览的行数
+MAX_PREVIEW_ROWS = 1000
+
+class UploadLimitMiddleware:
+    """限制请求体大小的ASGI中间件
+    
+    声明的Content-Length超过上限时直接返回413；没有Content-Length的分块上传在接收过程中累计字节数，
+    超过上限时立即停止接收并返回413，上传内容不会先完整写入临时文件。
+    """
+    
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"上传文件超过大小上限 {self.max_bytes} 字节"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse(status_code=413, content={"detail": detail})
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > self.max_bytes:
+                # FastAPI解析请求体时遇到HTTPException会原样抛出，由异常处理返回413
+                raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
+async def _scan_upload(file, on_chunk=None):
+    """逐块读取上传文件，读取完毕后回到文件开头
+    
+    文件内容不会一次性读入内存；大小上限已经在接收请求体时由UploadLimitMiddleware检查。
+    
+    Args:
+        file (UploadFile): 上传文件
+        on_chunk (callable, optional): 每读取一块时调用，参数为该块的字节
+        
+    Returns:
+        int: 文件字节数
+    """
+    size = 0
+    await file.seek(0)
+    while chunk := await file.read(UPLOAD_READ_SIZE):
+        size += len(chunk)
+        if on_chunk is not None:
+            on_chunk(chunk)
+    await file.seek(0)
+    return size
+
+# 转换结果缓存：CHAT_EXCEL_CACHE_ENTRIES为内存缓存条目数，
+# 设置CHAT_EXCEL_CACHE_DIR时同时使用磁盘缓存，总大小不超过CHAT_EXCEL_CACHE_MAX_BYTES
+result_cache = ResultCache(
+    max_entries=int(os.getenv("CHAT_EXCEL_CACHE_ENTRIES", DEFAULT_MAX_ENTRIES)),
+    cache_dir=os.getenv("CHAT_EXCEL_CACHE_DIR") or None,
+    max_disk_bytes=int(os.getenv("CHAT_EXCEL_CACHE_MAX_BYTES", DEFAULT_MAX_DISK_BYTES))
+)
+
+# 解析结果缓存：设置CHAT_EXCEL_SHEET_CACHE_DIR时，同一文件以相同的解析参数再次转换（如更换方言）时不再解析Excel，
+# 总大小不超过CHAT_EXCEL_SHEET_CACHE_MAX_BYTES
+sheet_cache = SheetCache(
+    os.getenv("CHAT_EXCEL_SHEET_CACHE_DIR"),
+    max_disk_bytes=int(os.getenv("CHAT_EXCEL_SHEET_CACHE_MAX_BYTES", DEFAULT_MAX_DISK_BYTES))
+) if os.getenv("CHAT_EXCEL_SHEET_CACHE_DIR") else None
 
 # 配置静态文件和模板目录
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -27,8 +147,49 @@ from fastapi.responses import FileResponse
 async def read_index():
     return FileResponse("static/index.html")
 
+@app.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, int]:
+    """
+    返回转换结果缓存的统计
+    
+    返回:
+        {"hits": 命中数, "misses": 未命中数, "entries": 内存缓存条目数, "disk_bytes": 磁盘缓存字节数}
+    """
+    return result_cache.stats()
+
+@app.post("/sheets")
+async def get_sheets(
+    file: UploadFile = File(...),
+    preview_rows: int = Form(10)
+) -> Dict[str, Any]:
+    """
+    返回上传文件中各工作表的元数据和前几行预览，不解析整个工作簿
+    
+    xlsx/xlsm文件只读取workbook.xml、每个工作表开头的dimension和预览行，
+    页面可以据此让用户选择工作表、表头行和数据起始行，再调用/convert转换。
+    
+    参数:
+        file: 上传的Excel文件
+        preview_rows: 每个工作表预览的行数(可选，默认为10，最多为1000，为0时不预览)
+    
+    返回:
+        {"sheets": [{"name": 工作表名称, "rows": 最后一行的行号, "columns": 最后一列的列号,
+                     "preview": [[单元格值, ...], ...]}, ...]}
+        文件没有记录工作表范围（或不是xlsx/xlsm文件）时rows和columns为null
+    """
+    try:
+        if not 0 <= preview_rows <= MAX_PREVIEW_ROWS:
+            raise ValueError(f"预览行数必须在0到{MAX_PREVIEW_ROWS}之间: {preview_rows}")
+        parser = ExcelParser(file.file)
+        sheets = await run_in_threadpool(parser.get_sheet_info, preview_rows)
+    except Exception as e:
+        print(f"读取工作表信息时出错: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"sheets": sheets}
+
 @app.post("/convert")
 async def convert_excel_to_sql(
+    response: Response,
     file: UploadFile = File(...),
     dialect: str = "mysql",
     sheet: str = Form(None),
@@ -36,8 +197,14 @@ async def convert_excel_to_sql(
     header_row: int = Form(None),
     data_start_row: int = Form(None),
     valid_column_start: int = Form(None),
-    valid_column_end: int = Form(None)
-) -> Dict[str, List[str]]:
+    valid_column_end: int = Form(None),
+    inference: str = Form("full"),
+    rows_per_insert: int = Form(None),
+    max_insert_bytes: int = Form(None),
+    output_format: str = Form("insert"),
+    upsert: bool = Form(False),
+    key_columns: str = Form(None)
+) -> Dict[str, Any]:
     """
     将上传的Excel文件转换为SQL语句
     
@@ -50,67 +217,334 @@ async def convert_excel_to_sql(
         data_start_row: 数据开始行索引，从1开始(可选，默认为1)
         valid_column_start: 有效列起始索引，从0开始(可选，默认为0)
         valid_column_end: 有效列结束索引(可选，默认为None表示所有列)
+        inference: 类型推断策略(full/sample(n)/progressive，可选，默认为full)
+        rows_per_insert: 每条INSERT语句最多包含的行数(可选，默认为500)
+        max_insert_bytes: 每条INSERT语句最多占用的字节数(可选，默认SQLite为1000000，其他方言不限制)
+        output_format: 数据输出格式(insert/copy，copy仅支持postgresql，可选，默认为insert)
+        upsert: 是否生成upsert，建表语句带主键，已存在的行更新而不是重复插入(可选，默认为false，不支持copy格式)
+        key_columns: upsert的键列，多个列以逗号分隔(可选，默认自动检测)
+    
+    相同文件内容和参数的转换结果会被缓存，响应头X-Cache为HIT或MISS。
+    转换在工作池中执行，工作池已满时返回503。
+    各阶段耗时同时以Server-Timing响应头返回，可以在浏览器开发者工具中查看。
     
     返回:
-        {"sql_statements": [SQL语句列表]}
+        {"sql_statements": [SQL语句列表], "timings": 各阶段的耗时、调用次数、行数和字节数}
+        upload为接收上传文件，worker为在工作池中排队和转换，open、read、infer_types、null_values、
+        format为工作池中转换的各阶段（缓存命中时没有这些阶段）
     """
     # 设置默认值
     header_row = 0 if header_row is None else int(header_row)
     data_start_row = 1 if data_start_row is None else int(data_start_row)
     valid_column_start = 0 if valid_column_start is None else int(valid_column_start)
+    key_columns = [column.strip() for column in key_columns.split(',')] if key_columns else None
     
     print(f"Received request with parameters: dialect={dialect}, sheet={sheet}, table_prefix={table_prefix}, header_row={header_row}, data_start_row={data_start_row}, valid_column_start={valid_column_start}, valid_column_end={valid_column_end}")
+    profiler = Profiler()
+    # 线程池直接读取上传的临时文件；文件对象无法传给其他进程，进程池在计算摘要的同时
+    # 逐块复制到临时文件后传入路径，上传内容只读取一遍，也不会整个读入内存
+    source = file.file
+    temp_file = None
     try:
-        # 保存上传文件到临时文件
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
+        digest = hashlib.sha256()
+        on_chunk = digest.update
+        if worker_pool.mode != "thread":
+            temp_file = tempfile.NamedTemporaryFile(suffix=Path(file.filename or "").suffix, delete=False)
+            source = temp_file.name
+            
+            def on_chunk(chunk):
+                digest.update(chunk)
+                temp_file.write(chunk)
         
-        # 创建解析器和生成器
-        parser = ExcelParser(tmp_path)
-        generator = SQLGenerator(dialect=dialect, table_prefix=table_prefix)
+        with profiler.stage("upload"):
+            size = await _scan_upload(file, on_chunk=on_chunk)
+            if temp_file is not None:
+                temp_file.close()
+        profiler.count("upload", bytes=size)
         
-        # 解析Excel文件
-        if sheet:
-            sheets_data = {sheet: parser.parse_sheet(
-                sheet, 
-                header_row=header_row, 
-                data_start_row=data_start_row, 
-                valid_column_start=valid_column_start, 
-                valid_column_end=valid_column_end
-            )}
-        else:
-            sheets_data = parser.parse_all_sheets(
-                header_row=header_row, 
-                data_start_row=data_start_row, 
-                valid_column_start=valid_column_start, 
-                valid_column_end=valid_column_end
-            )
-        
-        # 生成SQL语句
-        sql_statements = []
-        for sheet_name, data in sheets_data.items():
-            table_name = f"{table_prefix or ''}{sheet_name}"
-            create_table = generator.generate_create_table(table_name, data)
-            insert_data = generator.generate_insert_data(table_name, data)
-            
-            sql_statements.append(create_table)
-            sql_statements.append(insert_data)
+        # 相同的文件内容和转换参数直接返回缓存的结果
+        key = cache_key(
+            digest,
+            dialect=dialect,
+            sheet=sheet,
+            table_prefix=table_prefix,
+            header_row=header_row,
+            data_start_row=data_start_row,
+            valid_column_start=valid_column_start,
+            valid_column_end=valid_column_end,
+            inference=inference,
+            rows_per_insert=rows_per_insert,
+            max_insert_bytes=max_insert_bytes,
+            output_format=output_format,
+            upsert=upsert,
+            key_columns=key_columns
+        )
+        cached = result_cache.get(key)
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            return _with_timings(response, {"sql_statements": cached}, profiler)
+        response.headers["X-Cache"] = "MISS"
         
-        # 删除临时文件
-        os.unlink(tmp_path)
+        # 在工作池中解析Excel文件并生成SQL语句，不阻塞事件循环
+        with profiler.stage("worker"):
+            sql_statements, report = await worker_pool.run(
+                profile_workbook,
+                source,
+                dialect=dialect,
+                sheet_names=[sheet] if sheet else None,
+                table_prefix=table_prefix,
+                header_row=header_row,
+                data_start_row=data_start_row,
+                valid_column_start=valid_column_start,
+                valid_column_end=valid_column_end,
+                inference=inference,
+                rows_per_insert=rows_per_insert,
+                max_insert_bytes=max_insert_bytes,
+                output_format=output_format,
+                upsert=upsert,
+                key_columns=key_columns,
+                sheet_cache=sheet_cache
+            )
+        profiler.merge(report)
         
-        return {"sql_statements": sql_statements}
+        result_cache.put(key, sql_statements)
+        return _with_timings(response, {"sql_statements": sql_statements}, profiler)
         
+    except HTTPException:
+        raise
+    except WorkerPoolFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        # 确保删除临时文件
         print(f"转换Excel到SQL时出错: {e}")
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if temp_file is not None:
+            temp_file.close()
+            os.unlink(temp_file.name)
 
+@app.post("/convert/stream")
+async def convert_excel_to_sql_stream(
+    file: UploadFile = File(...),
+    dialect: str = Form("mysql"),
+    sheet: str = Form(None),
+    table_prefix: str = Form(None),
+    header_row: int = Form(None),
+    data_start_row: int = Form(None),
+    valid_column_start: int = Form(None),
+    valid_column_end: int = Form(None),
+    inference: str = Form("full"),
+    rows_per_insert: int = Form(None),
+    max_insert_bytes: int = Form(None),
+    output_format: str = Form("insert"),
+    batch_size: int = Form(10000),
+    gzip: bool = Form(False)
+) -> StreamingResponse:
+    """
+    将上传的Excel文件流式转换为SQL文本
+    
+    逐个工作表、逐批读取数据并发送SQL文本，首字节时间和服务端内存占用与文件大小无关。
+    仅支持xlsx/xlsm文件。转换中途出错时，以SQL注释的形式在输出末尾给出错误信息。
+    
+    参数:
+        与/convert相同，另外:
+        batch_size: 每批读取的行数(可选，默认为10000)
+        gzip: 是否使用gzip压缩响应(可选，默认为false)
+    
+    返回:
+        text/plain格式的SQL文本
+    """
+    header_row = 0 if header_row is None else int(header_row)
+    data_start_row = 1 if data_start_row is None else int(data_start_row)
+    valid_column_start = 0 if valid_column_start is None else int(valid_column_start)
+    
+    try:
+        # 直接读取上传的临时文件，不再另存一份
+        parser = await run_in_threadpool(ExcelParser, file.file, inference=inference)
+        if not parser.can_stream():
+            raise ValueError(f"流式转换仅支持xlsx/xlsm文件: {file.filename}")
+        generator = SQLGenerator(
+            dialect=dialect,
+            table_prefix=table_prefix,
+            rows_per_insert=rows_per_insert,
+            max_insert_bytes=max_insert_bytes,
+            output_format=output_format
+        )
+        sheet_names = parser.get_sheet_names()
+        if sheet:
+            if sheet not in sheet_names:
+                raise ValueError(f"找不到工作表: {sheet}")
+            sheet_names = [sheet]
+        if batch_size < 1:
+            raise ValueError(f"批大小必须为正整数: {batch_size}")
+    except Exception as e:
+        print(f"转换Excel到SQL时出错: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    chunks = _iter_sql_stream(
+        parser,
+        generator,
+        sheet_names,
+        table_prefix=table_prefix,
+        header_row=header_row,
+        data_start_row=data_start_row,
+        valid_column_start=valid_column_start,
+        valid_column_end=valid_column_end,
+        batch_size=batch_size
+    )
+    headers = {}
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    # 同步生成器由Starlette在线程池中迭代，不阻塞事件循环
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8", headers=headers)
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    dialect: str = Form("mysql"),
+    sheet: str = Form(None),
+    table_prefix: str = Form(None),
+    header_row: int = Form(None),
+    data_start_row: int = Form(None),
+    valid_column_start: int = Form(None),
+    valid_column_end: int = Form(None),
+    inference: str = Form("full"),
+    rows_per_insert: int = Form(None),
+    max_insert_bytes: int = Form(None),
+    output_format: str = Form("insert"),
+    batch_size: int = Form(10000)
+) -> Dict[str, Any]:
+    """
+    创建后台转换任务
+    
+    上传文件保存后立即返回任务ID，转换在后台执行，不需要保持连接。
+    
+    参数:
+        与/convert/stream相同（不支持gzip）
+    
+    返回:
+        任务信息，见GET /jobs/{job_id}
+    """
+    # 任务在请求结束后执行，需要将上传文件保存到任务目录
+    job = job_manager.create(file.filename)
+    try:
+        with open(job.source_path, "wb") as f:
+            await _scan_upload(file, on_chunk=f.write)
+    except HTTPException:
+        job_manager.discard(job)
+        raise
+    
+    job_manager.start(
+        job,
+        dialect=dialect,
+        sheet_names=[sheet] if sheet else None,
+        table_prefix=table_prefix,
+        header_row=0 if header_row is None else int(header_row),
+        data_start_row=1 if data_start_row is None else int(data_start_row),
+        valid_column_start=0 if valid_column_start is None else int(valid_column_start),
+        valid_column_end=valid_column_end,
+        inference=inference,
+        rows_per_insert=rows_per_insert,
+        max_insert_bytes=max_insert_bytes,
+        output_format=output_format,
+        batch_size=batch_size
+    )
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Dict[str, Any]:
+    """
+    查询后台转换任务的状态和进度
+    
+    返回:
+        {"job_id", "filename", "status": queued/running/done/failed, "error",
+         "sheets_total", "sheets_done", "rows_emitted", "created_at", "finished_at"}
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在或已过期: {job_id}")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str) -> FileResponse:
+    """
+    下载后台转换任务生成的SQL文件
+    
+    任务未完成或失败时返回409。
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在或已过期: {job_id}")
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=409, detail=f"任务失败: {job.error}")
+    if job.status != JOB_DONE:
+        raise HTTPException(status_code=409, detail=f"任务尚未完成: {job.status}")
+    return FileResponse(
+        job.result_path,
+        media_type="text/plain; charset=utf-8",
+        filename=f"{Path(job.filename).stem}.sql"
+    )
 
+def _with_timings(response, content, profiler):
+    """在响应内容中加入各阶段的耗时，并设置Server-Timing响应头
+    
+    Args:
+        response (Response): 响应对象
+        content (dict): 响应内容
+        profiler (Profiler): 本次请求的性能统计
+        
+    Returns:
+        dict: 加入timings后的响应内容
+    """
+    timings = profiler.report()
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={stats['seconds'] * 1000:.1f}" for name, stats in timings["stages"].items() if stats["calls"]
+    )
+    content["timings"] = timings
+    return content
+
+def _iter_sql_stream(parser, generator, sheet_names, **options):
+    """逐段产出UTF-8编码的SQL文本
+    
+    Args:
+        parser (ExcelParser): Excel解析器
+        generator (SQLGenerator): SQL生成器
+        sheet_names (list): 要处理的工作表名称
+        **options: 传给iter_workbook_sql的参数
+        
+    Yields:
+        bytes: 不少于STREAM_CHUNK_SIZE字节的SQL文本，最后一块可能更短
+    """
+    buffer = []
+    buffer_size = 0
+    try:
+        for chunk in iter_workbook_sql(parser, generator, sheet_names, **options):
+            buffer.append(chunk)
+            buffer_size += len(chunk)
+            if buffer_size >= STREAM_CHUNK_SIZE:
+                yield "".join(buffer).encode("utf-8")
+                buffer = []
+                buffer_size = 0
+        if buffer:
+            yield "".join(buffer).encode("utf-8")
+    except Exception as e:
+        # 响应头已经发出，只能在输出中报告错误
+        print(f"转换Excel到SQL时出错: {e}")
+        yield ("".join(buffer) + f"\n\n-- 转换出错: {e}\n").encode("utf-8")
+
+def _gzip_chunks(chunks):
+    """以gzip格式压缩字节流，每块数据都会刷新，客户端可以边接收边解压
+    
+    Args:
+        chunks (iterable): 未压缩的字节块
+        
+    Yields:
+        bytes: 压缩后的字节块
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,5 @@
+"""
+Chat-Excel性能基准
+
+包含合成工作簿生成器和分阶段计时的基准脚本
+"""
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分阶段性能基准
+
+生成合成工作簿，分别计时打开工作簿、parse_sheet、_infer_column_types、_handle_null_values，
+以及每种方言的generate_create_table和generate_insert_data，结果写入JSON并与基线比较。
+
+在仓库根目录运行：python -m benchmarks.run_benchmarks
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import numpy as np
+import pandas as pd
+
+from core.excel_parser import ExcelParser
+from core.sql_generator import SQLGenerator
+from benchmarks.synthetic import generate_workbook, DEFAULT_TYPE_MIX
+
+# 参与基准的SQL方言
+DIALECTS = ('mysql', 'sqlite', 'postgresql')
+
+# 默认的基线文件
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+# 默认允许的性能退化比例
+DEFAULT_TOLERANCE = 0.25
+
+# 耗时低于该秒数的阶段只报告、不判定退化，避免计时噪声
+MIN_COMPARE_SECONDS = 0.005
+
+
+def _best_of(repeat, fn, setup=None):
+    """多次执行并返回最短耗时
+
+    Args:
+        repeat (int): 执行次数
+        fn (callable): 被计时的函数，参数为setup的返回值
+        setup (callable, optional): 每次执行前调用、不计入耗时的准备函数
+
+    Returns:
+        tuple: (最短耗时秒数, 最后一次的返回值)
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        result = fn(arg) if setup is not None else fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _open_parser(excel_file):
+    """创建解析器并打开工作簿（ExcelParser在第一次读取数据时才打开工作簿）"""
+    parser = ExcelParser(excel_file)
+    parser.excel
+    return parser
+
+
+def _prepare_frame(parser, sheet_name):
+    """按parse_sheet的方式准备推断类型前的数据（表头为第一行，数据从第二行开始）"""
+    df_raw = pd.read_excel(parser.excel, sheet_name=sheet_name, header=None)
+    data_df = df_raw.iloc[1:].copy()
+    data_df.columns = parser._build_headers(df_raw.iloc[0].tolist())
+    return data_df.infer_objects()
+
+
+def run_benchmarks(excel_file, repeat=5, dialects=DIALECTS):
+    """分阶段计时
+
+    每个阶段执行repeat次取最短耗时；多个工作表的阶段耗时相加。
+
+    Args:
+        excel_file (str): Excel文件路径
+        repeat (int, optional): 每个阶段的执行次数，默认为5
+        dialects (tuple, optional): 参与计时的SQL方言
+
+    Returns:
+        dict: 阶段名称到耗时秒数的映射
+    """
+    stages = {}
+    open_seconds, parser = _best_of(repeat, lambda: _open_parser(excel_file))
+    stages['open'] = open_seconds
+
+    generators = {dialect: SQLGenerator(dialect=dialect) for dialect in dialects}
+    for sheet_name in parser.get_sheet_names():
+        elapsed, sheet_data = _best_of(repeat, lambda: parser.parse_sheet(sheet_name))
+        _add(stages, 'parse_sheet', elapsed)
+
+        data_df = _prepare_frame(parser, sheet_name)
+        elapsed, column_types = _best_of(repeat, lambda: parser._infer_column_types(data_df))
+        _add(stages, '_infer_column_types', elapsed)
+
+        elapsed, _ = _best_of(repeat, lambda df: parser._handle_null_values(df, column_types), setup=data_df.copy)
+        _add(stages, '_handle_null_values', elapsed)
+
+        for dialect, generator in generators.items():
+            elapsed, _ = _best_of(repeat, lambda: generator.generate_create_table(sheet_name, sheet_data))
+            _add(stages, f'generate_create_table.{dialect}', elapsed)
+            elapsed, _ = _best_of(repeat, lambda: generator.generate_insert_data(sheet_name, sheet_data))
+            _add(stages, f'generate_insert_data.{dialect}', elapsed)
+    return stages
+
+
+def _add(stages, name, seconds):
+    stages[name] = stages.get(name, 0.0) + seconds
+
+
+def compare_with_baseline(result, baseline, tolerance=DEFAULT_TOLERANCE):
+    """与基线比较各阶段耗时
+
+    Args:
+        result (dict): 本次结果，见main输出的JSON
+        baseline (dict): 基线结果
+        tolerance (float, optional): 允许的退化比例，默认为0.25（慢25%以内不算退化）
+
+    Returns:
+        list: (阶段名称, 基线耗时, 本次耗时, 比值, 是否退化)元组
+    """
+    if result['params'] != baseline.get('params'):
+        raise ValueError(f"基线的生成参数与本次不同，无法比较: {baseline.get('params')}")
+
+    rows = []
+    for stage, seconds in result['stages'].items():
+        base_seconds = baseline['stages'].get(stage)
+        if base_seconds is None:
+            continue
+        ratio = seconds / base_seconds if base_seconds else float('inf')
+        regressed = max(seconds, base_seconds) >= MIN_COMPARE_SECONDS and ratio > 1 + tolerance
+        rows.append((stage, base_seconds, seconds, ratio, regressed))
+    return rows
+
+
+@click.command()
+@click.option('--rows', type=click.IntRange(min=1), default=10000, help='每个工作表的行数')
+@click.option('--columns', type=click.IntRange(min=1), default=10, help='每个工作表的列数')
+@click.option('--type-mix', default=DEFAULT_TYPE_MIX, help='列类型组成，如 int:2,float,text,date,datetime,bool')
+@click.option('--null-ratio', type=click.FloatRange(min=0, max=1, max_open=True), default=0.1, help='每列空值的比例')
+@click.option('--string-length', type=click.IntRange(min=1), default=20, help='文本列的字符串长度')
+@click.option('--sheets', type=click.IntRange(min=1), default=1, help='工作表数')
+@click.option('--repeat', type=click.IntRange(min=1), default=5, help='每个阶段的执行次数，取最短耗时')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='结果JSON的保存路径，默认输出到控制台')
+@click.option('--baseline', type=click.Path(dir_okay=False), default=str(DEFAULT_BASELINE), help='基线JSON的路径')
+@click.option('--tolerance', type=click.FloatRange(min=0), default=DEFAULT_TOLERANCE, help='允许的退化比例')
+@click.option('--update-baseline', is_flag=True, help='用本次结果覆盖基线')
+def main(rows, columns, type_mix, null_ratio, string_length, sheets, repeat, output, baseline, tolerance, update_baseline):
+    """运行分阶段性能基准，有阶段退化时以状态码1退出"""
+    params = {
+        'rows': rows,
+        'columns': columns,
+        'type_mix': type_mix,
+        'null_ratio': null_ratio,
+        'string_length': string_length,
+        'sheets': sheets
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_file = Path(temp_dir) / 'benchmark.xlsx'
+        generate_workbook(excel_file, **params)
+        stages = run_benchmarks(excel_file, repeat=repeat)
+
+    result = {
+        'params': params,
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform()
+        },
+        'stages': stages
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if output:
+        Path(output).write_text(text + '\n', encoding='utf-8')
+        click.echo(f"结果已保存到 {output}")
+    else:
+        click.echo(text)
+
+    baseline_path = Path(baseline)
+    if update_baseline:
+        baseline_path.write_text(text + '\n', encoding='utf-8')
+        click.echo(f"基线已更新: {baseline_path}")
+        return
+    if not baseline_path.exists():
+        click.echo(f"找不到基线文件 {baseline_path}，使用 --update-baseline 创建", err=True)
+        return
+
+    rows_compared = compare_with_baseline(result, json.loads(baseline_path.read_text(encoding='utf-8')), tolerance)
+    regressions = 0
+    for stage, base_seconds, seconds, ratio, regressed in rows_compared:
+        regressions += regressed
+        mark = '  <-- 退化' if regressed else ''
+        click.echo(f"{stage:<36} 基线 {base_seconds * 1000:10.2f}ms  本次 {seconds * 1000:10.2f}ms  {ratio:6.2f}x{mark}",
+                   err=True)
+    if regressions:
+        click.echo(f"{regressions} 个阶段比基线慢 {tolerance:.0%} 以上", err=True)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
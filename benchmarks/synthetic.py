@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成工作簿生成模块
+
+按行数、列数、列类型组成、空值比例、字符串长度和工作表数生成测试用的xlsx文件。
+"""
+
+import string
+
+import numpy as np
+import pandas as pd
+
+# 支持的列类型
+COLUMN_KINDS = ('int', 'float', 'text', 'date', 'datetime', 'bool')
+
+# 默认的列类型组成
+DEFAULT_TYPE_MIX = 'int,float,text,date,bool'
+
+
+def parse_type_mix(type_mix):
+    """解析列类型组成
+
+    Args:
+        type_mix (str): 逗号分隔的列类型，可以用冒号指定权重，如'int:2,text:1'
+
+    Returns:
+        list: (列类型, 权重)元组
+    """
+    mix = []
+    for item in str(type_mix).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        kind, _, weight = item.partition(':')
+        kind = kind.strip().lower()
+        if kind not in COLUMN_KINDS:
+            raise ValueError(f"不支持的列类型: {kind}，可选值为 {', '.join(COLUMN_KINDS)}")
+        weight = int(weight) if weight else 1
+        if weight < 1:
+            raise ValueError(f"列类型权重必须为正整数: {item}")
+        mix.append((kind, weight))
+    if not mix:
+        raise ValueError(f"列类型组成不能为空: {type_mix}")
+    return mix
+
+
+def column_kinds(columns, type_mix=DEFAULT_TYPE_MIX):
+    """按权重依次为每列分配类型
+
+    Args:
+        columns (int): 列数
+        type_mix (str, optional): 列类型组成，见parse_type_mix
+
+    Returns:
+        list: 每列的类型
+    """
+    cycle = [kind for kind, weight in parse_type_mix(type_mix) for _ in range(weight)]
+    return [cycle[i % len(cycle)] for i in range(columns)]
+
+
+def generate_frame(rows, columns, type_mix=DEFAULT_TYPE_MIX, null_ratio=0.1, string_length=20, seed=0):
+    """生成一个工作表的数据
+
+    Args:
+        rows (int): 行数
+        columns (int): 列数
+        type_mix (str, optional): 列类型组成，见parse_type_mix
+        null_ratio (float, optional): 每列空值的比例，默认为0.1
+        string_length (int, optional): 文本列的字符串长度，默认为20
+        seed (int, optional): 随机数种子，默认为0
+
+    Returns:
+        DataFrame: 生成的数据，列名为"列类型_序号"
+    """
+    if not 0 <= null_ratio < 1:
+        raise ValueError(f"空值比例必须在0到1之间: {null_ratio}")
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list(string.ascii_letters + string.digits + '中文测试'))
+
+    data = {}
+    for idx, kind in enumerate(column_kinds(columns, type_mix)):
+        if kind == 'int':
+            values = pd.Series(rng.integers(-100000, 100000, rows))
+        elif kind == 'float':
+            values = pd.Series(np.round(rng.normal(0, 1000, rows), 2))
+        elif kind == 'text':
+            chars = alphabet[rng.integers(0, len(alphabet), (rows, string_length))]
+            values = pd.Series(chars.view(f'<U{string_length}').ravel() if rows else [], dtype=object)
+        elif kind == 'date':
+            values = pd.Series(pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 10000, rows), unit='D'))
+        elif kind == 'datetime':
+            values = pd.Series(pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 10 ** 9, rows), unit='s'))
+        else:
+            values = pd.Series(rng.integers(0, 2, rows).astype(bool))
+
+        if null_ratio:
+            values = values.astype(object) if kind in ('int', 'bool') else values
+            values[rng.random(rows) < null_ratio] = None
+        data[f"{kind}_{idx + 1}"] = values
+    return pd.DataFrame(data)
+
+
+def generate_workbook(path, rows=10000, columns=10, type_mix=DEFAULT_TYPE_MIX, null_ratio=0.1, string_length=20,
+                      sheets=1, seed=0):
+    """生成合成工作簿
+
+    Args:
+        path (str): 输出的xlsx文件路径
+        rows (int, optional): 每个工作表的行数，默认为10000
+        columns (int, optional): 每个工作表的列数，默认为10
+        type_mix (str, optional): 列类型组成，见parse_type_mix
+        null_ratio (float, optional): 每列空值的比例，默认为0.1
+        string_length (int, optional): 文本列的字符串长度，默认为20
+        sheets (int, optional): 工作表数，默认为1
+        seed (int, optional): 随机数种子，默认为0
+
+    Returns:
+        list: 工作表名称
+    """
+    sheet_names = [f"Sheet{i + 1}" for i in range(sheets)]
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for idx, sheet_name in enumerate(sheet_names):
+            frame = generate_frame(rows, columns, type_mix, null_ratio, string_length, seed=seed + idx)
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+    return sheet_names
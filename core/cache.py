@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+转换结果缓存模块
+
+ResultCache以上传文件内容的SHA-256和全部转换参数为键缓存SQL语句，
+支持内存中的LRU缓存和按总大小淘汰的磁盘缓存。
+SheetCache在磁盘上缓存解析后的工作表数据，更换方言、表名前缀或输出格式时不需要重新解析Excel文件。
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 内存中默认缓存的结果数
+DEFAULT_MAX_ENTRIES = 128
+
+# 磁盘缓存默认的总大小上限（字节）
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+# 工作表缓存的存储格式版本，格式变化时旧的缓存自然失效
+SHEET_CACHE_VERSION = 1
+
+
+def cache_key(content, **params):
+    """计算缓存键
+
+    Args:
+        content (bytes): 上传文件的内容，也可以是已经逐块写入文件内容的hashlib.sha256对象
+        **params: 转换参数，如dialect、sheet、table_prefix等
+
+    Returns:
+        str: 十六进制的SHA-256摘要
+    """
+    digest = content.copy() if hasattr(content, 'hexdigest') else hashlib.sha256(content)
+    digest.update(b'\0')
+    digest.update(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """转换结果缓存
+
+    先查内存中的LRU缓存，未命中时再查磁盘缓存（如果配置了cache_dir），
+    磁盘命中的结果会放回内存。磁盘缓存按文件的最近使用时间淘汰最久未使用的结果。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        """初始化缓存
+
+        Args:
+            max_entries (int, optional): 内存中最多缓存的结果数，默认为128；为0时不使用内存缓存
+            cache_dir (str, optional): 磁盘缓存目录，默认为None表示不使用磁盘缓存
+            max_disk_bytes (int, optional): 磁盘缓存的总大小上限，默认为1GB
+        """
+        self.max_entries = int(max_entries)
+        if self.max_entries < 0:
+            raise ValueError(f"缓存条目数不能为负数: {max_entries}")
+        self.max_disk_bytes = int(max_disk_bytes)
+        if self.max_disk_bytes < 1:
+            raise ValueError(f"磁盘缓存大小上限必须为正整数: {max_disk_bytes}")
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """查询缓存
+
+        Args:
+            key (str): 缓存键，见cache_key
+
+        Returns:
+            list: 缓存的SQL语句，未命中时返回None
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """写入缓存
+
+        Args:
+            key (str): 缓存键
+            value (list): SQL语句列表
+        """
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def stats(self):
+        """返回缓存统计
+
+        Returns:
+            dict: 命中数、未命中数、内存中的条目数和磁盘缓存占用的字节数
+        """
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+        stats['disk_bytes'] = sum(size for _, size, _ in self._disk_files()) if self.cache_dir is not None else 0
+        return stats
+
+    def _remember(self, key, value):
+        """放入内存缓存并淘汰最久未使用的条目，调用方需持有锁"""
+        if self.max_entries == 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        """缓存键对应的磁盘文件路径"""
+        return self.cache_dir / f"{key}.json"
+
+    def _read_disk(self, key):
+        """读取磁盘缓存，命中时更新文件的修改时间作为最近使用时间"""
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def _write_disk(self, key, value):
+        """写入磁盘缓存，总大小超过上限时删除最久未使用的文件"""
+        if self.cache_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def _disk_files(self):
+        """列出磁盘缓存文件
+
+        Returns:
+            list: (路径, 字节数, 最近使用时间)元组
+        """
+        files = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict_disk(self):
+        """按最近使用时间从旧到新删除文件，直到总大小不超过上限"""
+        _evict_oldest(self._disk_files(), self.max_disk_bytes, lambda path: path.unlink())
+
+
+class SheetCache:
+    """解析后的工作表的磁盘缓存
+
+    每个条目是一个目录：meta.json保存表头、列类型和键列，每列一个文件。
+    数值、布尔和日期列保存为.npy，命中时以内存映射方式加载，不需要读入内存；
+    其他列（文本、含None的object列）用pickle保存。
+    条目按最近使用时间淘汰，总大小不超过上限。只保存路径和计数，可以传给其他进程使用。
+    """
+
+    def __init__(self, cache_dir, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        """初始化工作表缓存
+
+        Args:
+            cache_dir (str): 缓存目录
+            max_disk_bytes (int, optional): 缓存的总大小上限，默认为1GB
+        """
+        self.max_disk_bytes = int(max_disk_bytes)
+        if self.max_disk_bytes < 1:
+            raise ValueError(f"磁盘缓存大小上限必须为正整数: {max_disk_bytes}")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(fingerprint, sheet_name, **params):
+        """计算工作表的缓存键
+
+        Args:
+            fingerprint (str): 文件内容的SHA-256摘要
+            sheet_name (str): 工作表名称
+            **params: 影响解析结果的参数，如表头行、数据起始行、列范围和类型推断策略
+
+        Returns:
+            str: 十六进制的SHA-256摘要
+        """
+        return cache_key(fingerprint.encode('ascii'), sheet=sheet_name, version=SHEET_CACHE_VERSION, **params)
+
+    def get(self, key):
+        """查询缓存
+
+        Args:
+            key (str): 缓存键，见SheetCache.key
+
+        Returns:
+            dict: 工作表数据，结构同ExcelParser.parse_sheet；未命中时返回None
+        """
+        entry = self.cache_dir / key
+        try:
+            with open(entry / 'meta.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            columns = {}
+            for idx, header in enumerate(meta['headers']):
+                if meta['formats'][idx] == 'npy':
+                    columns[header] = np.load(entry / f"{idx}.npy", mmap_mode='r')
+                else:
+                    with open(entry / f"{idx}.pkl", 'rb') as f:
+                        columns[header] = pickle.load(f)
+            os.utime(entry / 'meta.json')
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # copy=False时每列单独成块，内存映射的数组不会被复制合并
+        frame = pd.DataFrame(columns, columns=meta['headers'], index=pd.RangeIndex(meta['rows']), copy=False)
+        return {
+            'headers': meta['headers'],
+            'types': meta['types'],
+            'key_columns': meta['key_columns'],
+            'data': frame
+        }
+
+    def put(self, key, sheet_data):
+        """写入缓存，总大小超过上限时删除最久未使用的条目
+
+        Args:
+            key (str): 缓存键
+            sheet_data (dict): ExcelParser.parse_sheet的结果
+        """
+        data = sheet_data['data']
+        frame = data if isinstance(data, pd.DataFrame) else data.frame
+        headers = list(sheet_data['headers'])
+
+        entry = self.cache_dir / key
+        tmp_entry = self.cache_dir / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_entry.mkdir()
+        try:
+            formats = []
+            for idx, header in enumerate(headers):
+                values = frame[header]
+                if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufcmM':
+                    np.save(tmp_entry / f"{idx}.npy", values.to_numpy())
+                    formats.append('npy')
+                else:
+                    with open(tmp_entry / f"{idx}.pkl", 'wb') as f:
+                        pickle.dump(values.reset_index(drop=True), f, protocol=pickle.HIGHEST_PROTOCOL)
+                    formats.append('pickle')
+            meta = {
+                'headers': headers,
+                'types': sheet_data['types'],
+                'key_columns': sheet_data.get('key_columns', []),
+                'rows': len(frame),
+                'formats': formats
+            }
+            with open(tmp_entry / 'meta.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            # 目录整体改名，其他进程不会读到写了一半的条目；已有相同的条目时保留已有的
+            os.rename(tmp_entry, entry)
+        except OSError:
+            if not entry.exists():
+                raise
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        _evict_oldest(self._entries(), self.max_disk_bytes, lambda path: shutil.rmtree(path))
+
+    def stats(self):
+        """返回缓存统计
+
+        Returns:
+            dict: 命中数、未命中数、条目数和占用的字节数
+        """
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'disk_bytes': sum(size for _, size, _ in entries)
+        }
+
+    def _entries(self):
+        """列出缓存条目
+
+        Returns:
+            list: (条目目录, 字节数, 最近使用时间)元组
+        """
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix == '.tmp' or not path.is_dir():
+                continue
+            try:
+                size = sum(file.stat().st_size for file in path.iterdir())
+                last_used = (path / 'meta.json').stat().st_mtime
+            except OSError:
+                continue
+            entries.append((path, size, last_used))
+        return entries
+
+
+def _evict_oldest(items, max_bytes, remove):
+    """按最近使用时间从旧到新删除，直到总大小不超过上限
+
+    Args:
+        items (list): (路径, 字节数, 最近使用时间)元组
+        max_bytes (int): 总大小上限
+        remove (callable): 删除一个路径的函数
+    """
+    items = sorted(items, key=lambda item: item[2])
+    total_bytes = sum(size for _, size, _ in items)
+    for path, size, _ in items:
+        if total_bytes <= max_bytes:
+            break
+        try:
+            remove(path)
+        except OSError:
+            continue
+        total_bytes -= size
@@ -13,13 +13,34 @@ import pandas as pd
 import click
 from pathlib import Path
 from dotenv import load_dotenv
+from openpyxl.utils import column_index_from_string
 
 from excel_parser import ExcelParser
 from sql_generator import SQLGenerator
+from pipeline import convert_workbook, iter_workbook_sql
+from loader import SQLiteLoader
+from profiling import Profiler
+from cache import SheetCache, DEFAULT_MAX_DISK_BYTES
+from diff import diff_workbook, load_manifest, new_manifest, save_manifest
 
 # 加载环境变量
 load_dotenv()
 
+def _column_index(column):
+    """将列名（如'A'）转换为从0开始的列索引
+    
+    Args:
+        column (str): 列名，也可以是从1开始的列号
+        
+    Returns:
+        int: 列索引，column为空时返回None
+    """
+    if column is None:
+        return None
+    if str(column).isdigit():
+        return int(column) - 1
+    return column_index_from_string(str(column).upper()) - 1
+
 @click.command()
 @click.argument('excel_file', type=click.Path(exists=True))
 @click.option('--output', '-o', type=click.Path(), help='输出SQL文件的路径')
@@ -30,55 +51,199 @@ load_dotenv()
 @click.option('--data-start-row', '-dr', type=int, default=2, help='数据起始行索引，从2开始')
 @click.option('--valid-column-start', '-cs', type=str, default='A', help='有效列起始列名，从A列开始')
 @click.option('--valid-column-end', '-ce', type=str, help='有效列结束列名，默认为None表示所有列')
-def main(excel_file, output, dialect, sheet, table_prefix, header_row, data_start_row, valid_column_start, valid_column_end):
+@click.option('--stream', is_flag=True, help='流式模式：边解析边输出，内存占用与文件大小无关（仅支持xlsx）')
+@click.option('--batch-size', type=click.IntRange(min=1), default=10000, help='流式模式下每批读取的行数')
+@click.option('--inference', default='full', help="类型推断策略：full（默认）、sample 或 sample(n)、progressive")
+@click.option('--jobs', '-j', type=click.IntRange(min=0), default=1, help='并行转换工作表的进程数，0表示使用全部CPU核心')
+@click.option('--rows-per-insert', type=click.IntRange(min=1), help='每条INSERT语句最多包含的行数，默认为500')
+@click.option('--max-insert-bytes', type=click.IntRange(min=1), help='每条INSERT语句最多占用的字节数，默认SQLite为1000000，其他方言不限制')
+@click.option('--format', '-f', 'output_format', type=click.Choice(['insert', 'copy', 'load']), default='insert',
+              help='数据输出格式：insert为INSERT语句，copy为PostgreSQL的COPY FROM STDIN（仅postgresql），load为MySQL的LOAD DATA加TSV数据文件（仅mysql）')
+@click.option('--data-dir', type=click.Path(file_okay=False), help='load格式下TSV数据文件的输出目录，默认为输出SQL文件所在目录或当前目录')
+@click.option('--load-into', help='直接导入数据库而不输出SQL，如 sqlite:///输出.db')
+@click.option('--manifest', type=click.Path(dir_okay=False), help='增量转换：与该清单记录的上一次转换比较，只输出变化的部分；文件不存在时全量转换')
+@click.option('--save-manifest', 'manifest_output', type=click.Path(dir_okay=False), help='保存本次转换的清单，供下一次增量转换使用')
+@click.option('--key-columns', help='键列，多个列以逗号分隔：增量转换时用于对应新旧行，不指定时按行内容比较；upsert时作为主键，不指定时自动检测')
+@click.option('--upsert', is_flag=True, help='生成upsert：建表语句带主键，已存在的行更新而不是重复插入，可以重复导入（不支持copy格式）')
+@click.option('--sheet-cache', type=click.Path(file_okay=False), help='解析结果的缓存目录：同一文件以相同的解析参数再次转换时（如更换方言）不再解析Excel')
+@click.option('--sheet-cache-max-bytes', type=click.IntRange(min=1), default=DEFAULT_MAX_DISK_BYTES, help='解析结果缓存的总大小上限（字节），超过时删除最久未使用的缓存，默认为1GB')
+@click.option('--profile', is_flag=True, help='转换结束后输出各阶段的耗时、行数、字节数和峰值内存')
+@click.option('--profile-stage', type=click.Choice(['open', 'read', 'infer_types', 'null_values', 'format']),
+              help='使用cProfile分析指定阶段（多进程转换时只分析主进程），结果保存到--profile-output')
+@click.option('--profile-output', type=click.Path(dir_okay=False), help='cProfile结果的保存路径，默认为“阶段名.prof”')
+def main(excel_file, output, dialect, sheet, table_prefix, header_row, data_start_row, valid_column_start, valid_column_end, stream, batch_size, inference, jobs, rows_per_insert, max_insert_bytes, output_format, data_dir, load_into, manifest, manifest_output, key_columns, upsert, sheet_cache, sheet_cache_max_bytes, profile, profile_stage, profile_output):
     """将Excel文件转换为SQL库表。
 
     EXCEL_FILE: Excel文件的路径
     """
     try:
-        # 创建解析器和生成器
-        parser = ExcelParser(excel_file)
-        generator = SQLGenerator(dialect=dialect, table_prefix=table_prefix)
+        # 命令行中的行号从1开始、列使用列名，解析器使用从0开始的索引
+        header_row = header_row - 1
+        data_start_row = data_start_row - 1
+        valid_column_start = _column_index(valid_column_start)
+        valid_column_end = _column_index(valid_column_end)
         
-        # 解析Excel文件
-        if sheet:
-            sheets_data = {sheet: parser.parse_sheet(
-                sheet, 
-                header_row=header_row, 
-                data_start_row=data_start_row, 
-                valid_column_start=valid_column_start, 
-                valid_column_end=valid_column_end
-            )}
-        else:
-            sheets_data = parser.parse_all_sheets(
-                header_row=header_row, 
-                data_start_row=data_start_row, 
-                valid_column_start=valid_column_start, 
+        key_columns = [column.strip() for column in key_columns.split(',')] if key_columns else None
+        
+        if sheet_cache:
+            sheet_cache = SheetCache(sheet_cache, max_disk_bytes=sheet_cache_max_bytes)
+        
+        if output_format == 'load' and data_dir is None:
+            data_dir = Path(output).parent if output else Path.cwd()
+        
+        # 性能统计：--profile记录各阶段的耗时、计数和峰值内存，--profile-stage用cProfile分析指定阶段
+        profiler = None
+        if profile or profile_stage:
+            profiler = Profiler(trace_memory=profile, cprofile_stage=profile_stage)
+        
+        if load_into:
+            # 直接导入数据库：按sqlite方言建表，参数化批量写入
+            parser = ExcelParser(excel_file, inference=inference, profiler=profiler, sheet_cache=sheet_cache)
+            generator = SQLGenerator(dialect='sqlite', table_prefix=table_prefix, upsert=upsert, key_columns=key_columns,
+                                     profiler=profiler)
+            loader = SQLiteLoader(load_into)
+            parse_options = {
+                'header_row': header_row,
+                'data_start_row': data_start_row,
+                'valid_column_start': valid_column_start,
+                'valid_column_end': valid_column_end
+            }
+            sheet_names = [sheet] if sheet else parser.get_sheet_names()
+            
+            def iter_sheets():
+                for sheet_name in sheet_names:
+                    if stream:
+                        sheet_data = parser.stream_sheet(sheet_name, batch_size=batch_size, **parse_options)
+                    else:
+                        sheet_data = parser.parse_sheet(sheet_name, **parse_options)
+                    yield f"{table_prefix or ''}{sheet_name}", sheet_data
+            
+            row_counts = loader.load_sheets(generator, iter_sheets())
+            for sheet_name, row_count in zip(sheet_names, row_counts):
+                click.echo(f"工作表 {sheet_name} 已导入 {row_count} 行")
+            click.echo(f"数据已导入 {load_into}")
+            click.echo("转换完成！")
+        
+        elif manifest or manifest_output:
+            # 增量转换：与上一次的清单比较，只输出变化的部分，并保存本次的清单
+            if stream:
+                raise ValueError("增量转换不支持流式模式")
+            parser = ExcelParser(excel_file, inference=inference, profiler=profiler, sheet_cache=sheet_cache)
+            generator = SQLGenerator(
+                dialect=dialect,
+                table_prefix=table_prefix,
+                rows_per_insert=rows_per_insert,
+                max_insert_bytes=max_insert_bytes,
+                output_format=output_format,
+                upsert=upsert,
+                key_columns=key_columns,
+                profiler=profiler
+            )
+            sql_parts, updated_manifest = diff_workbook(
+                parser,
+                generator,
+                [sheet] if sheet else parser.get_sheet_names(),
+                load_manifest(manifest, dialect) if manifest else new_manifest(dialect),
+                key_columns=key_columns,
+                table_prefix=table_prefix,
+                header_row=header_row,
+                data_start_row=data_start_row,
+                valid_column_start=valid_column_start,
                 valid_column_end=valid_column_end
             )
+            all_sql = '\n\n'.join(sql_parts)
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(all_sql)
+                click.echo(f"SQL已保存到 {output}")
+            else:
+                click.echo(all_sql)
+            if manifest_output:
+                save_manifest(updated_manifest, manifest_output)
+                click.echo(f"清单已保存到 {manifest_output}")
+            click.echo("转换完成！")
         
-        # 生成SQL语句
-        sql_statements = []
-        for sheet_name, data in sheets_data.items():
-            table_name = f"{table_prefix or ''}{sheet_name}"
-            create_table = generator.generate_create_table(table_name, data)
-            insert_data = generator.generate_insert_data(table_name, data)
+        elif stream:
+            # 创建解析器和生成器
+            parser = ExcelParser(excel_file, inference=inference, profiler=profiler)
+            generator = SQLGenerator(
+                dialect=dialect,
+                table_prefix=table_prefix,
+                rows_per_insert=rows_per_insert,
+                max_insert_bytes=max_insert_bytes,
+                output_format=output_format,
+                data_dir=data_dir,
+                upsert=upsert,
+                key_columns=key_columns,
+                profiler=profiler
+            )
             
-            sql_statements.append(create_table)
-            sql_statements.append(insert_data)
-        
-        # 合并所有SQL语句
-        all_sql = '\n\n'.join(sql_statements)
+            chunks = iter_workbook_sql(
+                parser,
+                generator,
+                [sheet] if sheet else parser.get_sheet_names(),
+                table_prefix=table_prefix,
+                header_row=header_row,
+                data_start_row=data_start_row,
+                valid_column_start=valid_column_start,
+                valid_column_end=valid_column_end,
+                batch_size=batch_size
+            )
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+                click.echo(f"SQL已保存到 {output}")
+            else:
+                for chunk in chunks:
+                    click.echo(chunk, nl=False)
+                click.echo()
+            click.echo("转换完成！")
         
-        # 输出SQL语句
-        if output:
-            with open(output, 'w', encoding='utf-8') as f:
-                f.write(all_sql)
-            click.echo(f"SQL已保存到 {output}")
         else:
-            click.echo(all_sql)
+            # 解析Excel文件并生成SQL语句
+            sql_statements = convert_workbook(
+                excel_file,
+                dialect=dialect,
+                sheet_names=[sheet] if sheet else None,
+                table_prefix=table_prefix,
+                header_row=header_row,
+                data_start_row=data_start_row,
+                valid_column_start=valid_column_start,
+                valid_column_end=valid_column_end,
+                inference=inference,
+                jobs=jobs,
+                rows_per_insert=rows_per_insert,
+                max_insert_bytes=max_insert_bytes,
+                output_format=output_format,
+                data_dir=data_dir,
+                upsert=upsert,
+                key_columns=key_columns,
+                sheet_cache=sheet_cache,
+                profiler=profiler
+            )
             
-        click.echo("转换完成！")
+            # 合并所有SQL语句
+            all_sql = '\n\n'.join(sql_statements)
+            
+            # 输出SQL语句
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(all_sql)
+                click.echo(f"SQL已保存到 {output}")
+            else:
+                click.echo(all_sql)
+                
+            click.echo("转换完成！")
+        
+        if profiler is not None:
+            profiler.close()
+            if profile:
+                click.echo(profiler.format_report(), err=True)
+            if profile_stage:
+                profile_output = profile_output or f"{profile_stage}.prof"
+                profiler.dump_cprofile(profile_output)
+                click.echo(f"阶段 {profile_stage} 的cProfile结果已保存到 {profile_output}", err=True)
         
     except Exception as e:
         import traceback
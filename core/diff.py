@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+增量转换模块
+
+与上一次转换的清单（每个表的列、列类型和每行内容的哈希）比较，只输出变化的部分：
+新增的行生成INSERT，修改的行生成UPDATE，删除的行生成DELETE，列类型放宽时生成ALTER TABLE。
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 清单格式的版本，版本2起行哈希按与列类型无关的规范值计算
+MANIFEST_VERSION = 2
+
+# 规范值中日期时间的格式
+CANONICAL_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# 整数类型的取值范围，用于将列类型还原为类型特征
+INT_RANGES = {
+    'TINYINT UNSIGNED': (0, 255),
+    'SMALLINT UNSIGNED': (0, 65535),
+    'INT UNSIGNED': (0, 4294967295),
+    'BIGINT UNSIGNED': (0, 2 ** 64 - 1),
+    'TINYINT': (-128, 127),
+    'SMALLINT': (-32768, 32767),
+    'INT': (-2147483648, 2147483647),
+    'BIGINT': (-2 ** 63, 2 ** 63 - 1)
+}
+
+
+def new_manifest(dialect):
+    """创建空清单，与空清单比较相当于全量转换
+
+    Args:
+        dialect (str): SQL方言
+
+    Returns:
+        dict: 清单
+    """
+    return {'version': MANIFEST_VERSION, 'dialect': dialect, 'sheets': {}}
+
+
+def load_manifest(path, dialect):
+    """读取上一次转换的清单
+
+    Args:
+        path (str): 清单文件路径，文件不存在时返回空清单
+        dialect (str): 本次转换的SQL方言，需要与清单一致
+
+    Returns:
+        dict: 清单
+    """
+    path = Path(path)
+    if not path.exists():
+        return new_manifest(dialect)
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"不支持的清单版本: {manifest.get('version')}")
+    if manifest.get('dialect') != dialect:
+        raise ValueError(f"清单的SQL方言为 {manifest.get('dialect')}，与本次转换的 {dialect} 不同，需要全量转换")
+    return manifest
+
+
+def save_manifest(manifest, path):
+    """写入清单，先写临时文件再替换，中途失败不会留下不完整的清单
+
+    Args:
+        manifest (dict): 清单
+        path (str): 清单文件路径
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def widen_type(parser, old_type, new_type):
+    """返回能同时容纳两种类型数据的列类型
+
+    两种类型先还原为类型特征，按ExcelParser合并批次的规则合并，结果不会比任何一方窄，
+    例如TINYINT与INT UNSIGNED合并为BIGINT，INT与DECIMAL(20,2)合并为DECIMAL(20,2)，数值与文本合并为文本。
+
+    Args:
+        parser (ExcelParser): Excel解析器
+        old_type (str): 上一次转换的列类型
+        new_type (str): 本次推断的列类型
+
+    Returns:
+        str: 合并后的列类型
+    """
+    if old_type == new_type:
+        return old_type
+    profile = parser._merge_profiles(_type_to_profile(old_type), _type_to_profile(new_type))
+    return parser._profile_to_type(profile)
+
+
+def _type_to_profile(sql_type):
+    """将列类型还原为类型特征，取该类型能容纳的最大范围"""
+    if sql_type in INT_RANGES:
+        min_val, max_val = INT_RANGES[sql_type]
+        return {'kind': 'int', 'min': min_val, 'max': max_val}
+    match = re.fullmatch(r'DECIMAL\((\d+),(\d+)\)', sql_type)
+    if match:
+        return {'kind': 'float', 'decimals': int(match.group(2))}
+    if sql_type in ('DATE', 'DATETIME'):
+        return {'kind': 'datetime', 'has_time': sql_type == 'DATETIME'}
+    if sql_type == 'BOOLEAN':
+        return {'kind': 'bool'}
+    match = re.fullmatch(r'VARCHAR\((\d+)\)', sql_type)
+    # TEXT按超过VARCHAR上限的长度处理
+    return {'kind': 'text', 'max_length': int(match.group(1)) if match else 256}
+
+
+def diff_sheet(parser, generator, table_name, sheet_data, previous=None, key_columns=None):
+    """比较一个工作表与上一次转换的清单，生成变化部分的SQL
+
+    指定键列时按键值对应新旧行：新键插入，内容变化的行按键更新，消失的键删除。
+    不指定键列时按行内容的哈希比较：只有新增的行时插入新增的行，
+    有行被修改或删除时无法定位旧行，清空表后重新插入所有行。
+    列按上一次的顺序排列，新增的列追加在后面；列类型只会放宽，不会收窄。
+
+    Args:
+        parser (ExcelParser): Excel解析器
+        generator (SQLGenerator): SQL生成器，输出格式需要为insert
+        table_name (str): 表名
+        sheet_data (dict): 工作表数据，见ExcelParser.parse_sheet
+        previous (dict, optional): 该表在上一次清单中的记录，为None时表示新表
+        key_columns (list, optional): 键列名，键值需要非空且不重复
+
+    Returns:
+        tuple: (SQL文本列表, 该表在新清单中的记录)
+    """
+    key_columns = list(key_columns or [])
+    headers = list(sheet_data['headers'])
+    types = dict(sheet_data['types'])
+    frame = _to_frame(sheet_data['data'], headers)
+
+    missing = [column for column in key_columns if column not in headers]
+    if missing:
+        raise ValueError(f"表 {table_name} 中找不到键列: {', '.join(missing)}")
+
+    schema_sql = []
+    if previous is not None:
+        if previous['key_columns'] != key_columns:
+            raise ValueError(f"表 {table_name} 的键列与上一次转换不同（{previous['key_columns']}），需要全量转换")
+        removed_columns = [column for column in previous['headers'] if column not in headers]
+        if removed_columns:
+            raise ValueError(f"表 {table_name} 删除了列 {', '.join(removed_columns)}，需要全量转换")
+
+        # 列类型只放宽：新推断的类型较窄时沿用上一次的类型，数据按放宽后的类型重新处理空值
+        retyped = {}
+        for column in previous['headers']:
+            old_type = previous['types'][column]
+            widened = widen_type(parser, old_type, types[column])
+            if widened != old_type:
+                if column in key_columns:
+                    raise ValueError(f"表 {table_name} 的键列 {column} 类型由 {old_type} 变为 {widened}，需要全量转换")
+                # 映射到方言后相同的类型（如SQLite的各种整数）不需要修改
+                if generator._map_type(widened) != generator._map_type(old_type):
+                    schema_sql.append(generator.generate_alter_column_type(table_name, column, widened))
+            if widened != types[column]:
+                retyped[column] = widened
+                types[column] = widened
+
+        added_columns = [column for column in headers if column not in previous['types']]
+        for column in added_columns:
+            schema_sql.append(generator.generate_add_column(table_name, column, types[column]))
+
+        headers = previous['headers'] + added_columns
+        frame = frame[headers]
+        if retyped:
+            frame = parser._handle_null_values(frame.copy(), retyped)
+
+    rows, insert_positions, update_sql = _compare_rows(
+        generator, table_name, frame, headers, types, key_columns,
+        None if previous is None else previous['rows']
+    )
+    entry = {'headers': headers, 'types': types, 'key_columns': key_columns, 'rows': rows}
+
+    if previous is None:
+        # 新表与全量转换的输出一致
+        sheet_data = dict(sheet_data, headers=headers, types=types, data=frame)
+        return [generator.generate_create_table(table_name, sheet_data), generator.generate_insert_data(table_name, sheet_data)], entry
+
+    delete_sql = []
+    if key_columns:
+        removed_keys = [key for key in previous['rows'] if key not in rows]
+        delete_sql.extend(generator.iter_delete(table_name, key_columns, [_split_key(key, len(key_columns)) for key in removed_keys]))
+    elif insert_positions is None:
+        # 无键列且有行被修改或删除：清空后重新插入
+        delete_sql.append(generator.generate_delete_all(table_name))
+        insert_positions = range(len(frame))
+
+    insert_sql = []
+    if len(insert_positions):
+        insert_data = dict(sheet_data, headers=headers, types=types, data=frame.iloc[list(insert_positions)])
+        insert_sql.extend(generator.iter_insert_data(table_name, insert_data))
+
+    statements = schema_sql + delete_sql + update_sql + insert_sql
+    if not statements:
+        return [f"-- 表 {generator._prefixed_table_name(table_name)} 没有变化"], entry
+    return ["\n".join(statements)], entry
+
+
+def diff_workbook(parser, generator, sheet_names, manifest, key_columns=None, table_prefix=None, header_row=0,
+                  data_start_row=1, valid_column_start=0, valid_column_end=None):
+    """逐个工作表与上一次转换的清单比较，生成变化部分的SQL
+
+    没有处理的工作表在新清单中保留上一次的记录。
+
+    Args:
+        parser (ExcelParser): Excel解析器
+        generator (SQLGenerator): SQL生成器，输出格式需要为insert
+        sheet_names (list): 要处理的工作表名称
+        manifest (dict): 上一次转换的清单，见load_manifest
+        key_columns (list, optional): 键列名，所有工作表使用相同的键列
+        table_prefix (str, optional): 表名前缀
+        header_row (int, optional): 表头所在行索引，默认为0（第一行）
+        data_start_row (int, optional): 数据开始行索引，默认为1（第二行）
+        valid_column_start (int, optional): 有效列起始索引，默认为0（第一列）
+        valid_column_end (int, optional): 有效列结束索引，默认为None（表示所有列）
+
+    Returns:
+        tuple: (SQL文本列表, 新的清单)
+    """
+    if manifest['dialect'] != generator.dialect:
+        raise ValueError(f"清单的SQL方言为 {manifest['dialect']}，与本次转换的 {generator.dialect} 不同，需要全量转换")
+    if generator.output_format != 'insert':
+        raise ValueError(f"增量转换只支持insert输出格式: {generator.output_format}")
+
+    updated = new_manifest(generator.dialect)
+    updated['sheets'] = dict(manifest['sheets'])
+    sql_parts = []
+    for sheet_name in sheet_names:
+        sheet_data = parser.parse_sheet(
+            sheet_name,
+            header_row=header_row,
+            data_start_row=data_start_row,
+            valid_column_start=valid_column_start,
+            valid_column_end=valid_column_end
+        )
+        table_name = f"{table_prefix or ''}{sheet_name}"
+        parts, entry = diff_sheet(parser, generator, table_name, sheet_data, manifest['sheets'].get(table_name), key_columns)
+        sql_parts.extend(parts)
+        updated['sheets'][table_name] = entry
+    return sql_parts, updated
+
+
+def _compare_rows(generator, table_name, frame, headers, types, key_columns, previous_rows):
+    """按块计算每行的哈希并与上一次的记录比较
+
+    哈希按与列类型无关的规范值计算（见_canonical_column），列类型放宽时未修改的行哈希不变；
+    只格式化键列和需要更新的行。
+
+    Args:
+        generator (SQLGenerator): SQL生成器
+        table_name (str): 表名
+        frame (DataFrame): 数据
+        headers (list): 列名
+        types (dict): 列类型
+        key_columns (list): 键列名，为空时按行内容比较
+        previous_rows: 上一次的记录，有键列时为键到哈希的映射，否则为哈希列表；新表为None
+
+    Returns:
+        tuple: (本次的记录, 需要插入的行位置, UPDATE语句列表)；
+            无键列且有行被修改或删除时，需要插入的行位置为None
+    """
+    key_indexes = [headers.index(column) for column in key_columns]
+    rows = {} if key_columns else []
+    insert_positions = []
+    update_sql = []
+
+    offset = 0
+    for chunk in generator._iter_frames(frame, headers):
+        hashes = _hash_rows([_canonical_column(chunk[header]) for header in headers], len(chunk))
+        if not key_columns:
+            rows.extend(hashes)
+            offset += len(chunk)
+            continue
+
+        key_values = [generator._format_column(chunk[column], types[column]) for column in key_columns]
+        for column, values in zip(key_columns, key_values):
+            if 'NULL' in values:
+                raise ValueError(f"表 {table_name} 的键列 {column} 有空值")
+        changed = []
+        for row_idx, row_hash in enumerate(hashes):
+            key = _join_key([values[row_idx] for values in key_values])
+            if key in rows:
+                raise ValueError(f"表 {table_name} 的键列 {', '.join(key_columns)} 有重复值: {key}")
+            rows[key] = row_hash
+            if previous_rows is None:
+                continue
+            old_hash = previous_rows.get(key)
+            if old_hash is None:
+                insert_positions.append(offset + row_idx)
+            elif old_hash != row_hash:
+                changed.append(row_idx)
+
+        if changed:
+            changed_rows = chunk.iloc[changed]
+            columns = [generator._format_column(changed_rows[header], types[header]) for header in headers]
+            for row_idx in range(len(changed)):
+                assignments = [(header, columns[idx][row_idx]) for idx, header in enumerate(headers) if idx not in key_indexes]
+                conditions = [(headers[idx], columns[idx][row_idx]) for idx in key_indexes]
+                update_sql.append(generator.generate_update(table_name, assignments, conditions))
+        offset += len(chunk)
+
+    if key_columns or previous_rows is None:
+        return rows, insert_positions, update_sql
+
+    # 无键列：旧行都还在时只插入多出的行，否则返回None表示需要重建
+    remaining = Counter(previous_rows)
+    remaining.subtract(rows)
+    if any(count > 0 for count in remaining.values()):
+        return rows, None, update_sql
+    remaining = Counter(previous_rows)
+    for position, row_hash in enumerate(rows):
+        if remaining[row_hash] > 0:
+            remaining[row_hash] -= 1
+        else:
+            insert_positions.append(position)
+    return rows, insert_positions, update_sql
+
+
+def _canonical_column(values):
+    """将一列值转换为与列类型无关的规范字符串，用于计算行哈希
+
+    列类型放宽后同一个值的规范字符串不变：整数值的浮点数与整数相同（1.0与1均为'1'），
+    日期时间统一精确到微秒，空值与空字符串相同（文本列的空值处理为空字符串），
+    布尔值和其他值使用str()。
+
+    Args:
+        values (Series): 列数据
+
+    Returns:
+        ndarray: 规范字符串
+    """
+    null_mask = values.isna().to_numpy()
+    non_null = values[~null_mask]
+
+    if pd.api.types.is_bool_dtype(non_null):
+        canonical = np.where(non_null.to_numpy(dtype=bool), 'True', 'False')
+    elif pd.api.types.is_integer_dtype(non_null):
+        canonical = non_null.to_numpy().astype(str)
+    elif pd.api.types.is_float_dtype(non_null):
+        array = non_null.to_numpy(dtype=np.float64)
+        canonical = array.astype(str).astype(object)
+        integral = np.isfinite(array) & (np.abs(array) < 2 ** 63) & (array == np.trunc(array))
+        canonical[integral] = array[integral].astype(np.int64).astype(str)
+    elif pd.api.types.is_datetime64_any_dtype(non_null):
+        canonical = non_null.dt.strftime(CANONICAL_DATETIME_FORMAT).to_numpy()
+    else:
+        canonical = [_canonical_value(value) for value in non_null.tolist()]
+
+    result = np.full(len(values), '', dtype=object)
+    result[~null_mask] = canonical
+    return result
+
+
+def _canonical_value(value):
+    """单个非空值的规范字符串，规则与_canonical_column一致"""
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if math.isfinite(value) and abs(value) < 2 ** 63 and value.is_integer():
+            return str(int(value))
+        return repr(value)
+    if isinstance(value, datetime):
+        return value.strftime(CANONICAL_DATETIME_FORMAT)
+    return str(value)
+
+
+def _hash_rows(columns, row_count):
+    """计算每行规范值的64位哈希
+
+    Args:
+        columns (list): 每列的规范值
+        row_count (int): 行数
+
+    Returns:
+        list: 每行的哈希（整数）
+    """
+    if not columns:
+        return [0] * row_count
+    frame = pd.DataFrame({idx: values for idx, values in enumerate(columns)})
+    return pd.util.hash_pandas_object(frame, index=False).tolist()
+
+
+def _join_key(values):
+    """将一行键列的已格式化的值转换为清单中的键，单个键列时直接使用该值"""
+    return values[0] if len(values) == 1 else json.dumps(values, ensure_ascii=False)
+
+
+def _split_key(key, key_count):
+    """_join_key的逆操作"""
+    return (key,) if key_count == 1 else tuple(json.loads(key))
+
+
+def _to_frame(data, headers):
+    """将工作表数据转换为DataFrame，按列存储的数据直接使用"""
+    frame = data if isinstance(data, pd.DataFrame) else getattr(data, 'frame', None)
+    if frame is not None:
+        return frame
+    return pd.DataFrame.from_records(list(data), columns=headers)
@@ -9,37 +9,375 @@ Excel解析模块
 
 import pandas as pd
 import numpy as np
+import hashlib
+import io
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from collections.abc import Mapping
+from contextlib import contextmanager
 from pathlib import Path
+from openpyxl import load_workbook
+from openpyxl.utils import range_boundaries
 import re
 
+try:
+    from .profiling import NULL_PROFILER
+except ImportError:
+    # 直接运行core/chat_excel.py时，core目录位于sys.path中
+    from profiling import NULL_PROFILER
+
+# 与pandas.read_excel默认的na_values一致，流式读取时这些字符串同样视为空值
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+
+# 抽样推断的默认样本量
+DEFAULT_SAMPLE_SIZE = 10000
+
+# 渐进式推断每次扫描的行数
+PROGRESSIVE_CHUNK_SIZE = 65536
+
+# 查找工作表dimension元素时最多读取的字节数，dimension位于sheetData之前，通常在开头几百字节内
+DIMENSION_SCAN_BYTES = 1024 * 1024
+
+# 工作表关系的类型后缀，workbook.xml中的图表页（chartsheet）不是工作表
+WORKSHEET_REL_SUFFIX = '/worksheet'
+
+class RowView(Mapping):
+    """ColumnarData中一行数据的只读视图
+    
+    可以像字典一样按列名取值，值与DataFrame.to_dict('records')的结果一致，
+    但不会为每一行创建字典。
+    """
+    
+    __slots__ = ('_columns', '_index')
+    
+    def __init__(self, columns, index):
+        """初始化行视图
+        
+        Args:
+            columns (dict): 列名到列数组的映射
+            index (int): 行位置
+        """
+        self._columns = columns
+        self._index = index
+    
+    def __getitem__(self, column):
+        value = self._columns[column][self._index]
+        # 与to_dict一致，将numpy标量转换为Python原生类型
+        return value.item() if isinstance(value, np.generic) else value
+    
+    def __iter__(self):
+        return iter(self._columns)
+    
+    def __len__(self):
+        return len(self._columns)
+    
+    def __repr__(self):
+        return repr(dict(self))
+
+class ColumnarData:
+    """按列存储的工作表数据
+    
+    以DataFrame保存解析结果，SQLGenerator直接按列读取；需要逐行访问时返回RowView，
+    兼容原先列表加字典的用法（len、迭代、按位置取行、row.get(列名)）。
+    """
+    
+    __slots__ = ('frame', '_columns')
+    
+    def __init__(self, frame):
+        """初始化按列存储的数据
+        
+        Args:
+            frame (DataFrame): 数据，列名为表头
+        """
+        self.frame = frame.reset_index(drop=True)
+        self._columns = {column: self.frame[column].array for column in self.frame.columns}
+    
+    def __len__(self):
+        return len(self.frame)
+    
+    def __iter__(self):
+        for index in range(len(self.frame)):
+            yield RowView(self._columns, index)
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.frame)
+        if not 0 <= index < len(self.frame):
+            raise IndexError(f"行索引超出范围: {index}")
+        return RowView(self._columns, index)
+    
+    def __eq__(self, other):
+        if isinstance(other, ColumnarData):
+            return self.frame.equals(other.frame)
+        if isinstance(other, list):
+            return self.to_records() == other
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"ColumnarData({len(self.frame)} rows, {len(self._columns)} columns)"
+    
+    def to_records(self):
+        """转换为字典列表
+        
+        Returns:
+            list: 每行一个字典
+        """
+        return self.frame.to_dict('records')
+
 class ExcelParser:
     """Excel文件解析器
     
     用于读取Excel文件并解析其中的数据结构，包括表头、数据类型等信息。
     """
     
-    def __init__(self, excel_file):
+    def __init__(self, excel_file, inference='full', profiler=None, sheet_cache=None):
         """初始化Excel解析器
         
         Args:
-            excel_file (str): Excel文件路径
+            excel_file (str): Excel文件路径，也可以是文件内容（bytes、bytearray、memoryview）
+                或支持read和seek的二进制文件对象（如上传文件的SpooledTemporaryFile），不需要先写入磁盘
+            inference (str, optional): 类型推断策略，支持以下取值：
+                'full'：扫描所有非空值（默认）；
+                'sample' 或 'sample(n)'：每列分层抽取n个值推断类型，再对整列做一次数组检查放宽类型，比full快；
+                'progressive'：分块扫描，列类型确定为TEXT、BIGINT等无法再变化的类型后停止扫描该列
+            profiler (Profiler, optional): 性能统计，记录open、read、infer_types、null_values阶段，默认不统计
+            sheet_cache (SheetCache, optional): 解析结果的磁盘缓存，parse_sheet和parse_all_sheets命中时不再读取工作表，
+                记录为cache阶段；默认不缓存
         """
-        self.excel_file = Path(excel_file)
-        if not self.excel_file.exists():
-            raise FileNotFoundError(f"找不到Excel文件: {excel_file}")
+        if isinstance(excel_file, (bytes, bytearray, memoryview)):
+            # bytes直接共享内存，bytearray和memoryview会复制一次
+            self.excel_file = None
+            self.source = io.BytesIO(excel_file)
+        elif hasattr(excel_file, 'read'):
+            self.excel_file = None
+            self.source = excel_file
+            self.source.seek(0)
+        else:
+            self.excel_file = Path(excel_file)
+            if not self.excel_file.exists():
+                raise FileNotFoundError(f"找不到Excel文件: {excel_file}")
+            self.source = self.excel_file
         
-        # 读取Excel文件
-        self.excel = pd.ExcelFile(self.excel_file)
+        self.inference, self.sample_size = self._parse_inference(inference)
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.sheet_cache = sheet_cache
+        self._fingerprint = None
+        self._excel = None
+        self._workbook_sheets = None
+    
+    @property
+    def excel(self):
+        """pandas.ExcelFile，第一次读取数据时才打开工作簿，记录为open阶段"""
+        if self._excel is None:
+            with self.profiler.stage('open', bytes=self._source_size()):
+                self._excel = pd.ExcelFile(self.source)
+        return self._excel
+    
+    def _source_size(self):
+        """返回文件的字节数，无法获取时返回0"""
+        if self.excel_file is not None:
+            return self.excel_file.stat().st_size
+        if isinstance(self.source, io.BytesIO):
+            return self.source.getbuffer().nbytes
+        return 0
+    
+    def fingerprint(self):
+        """计算文件内容的SHA-256摘要，作为工作表缓存键的一部分
+        
+        Returns:
+            str: 十六进制的摘要，同一个解析器只计算一次
+        """
+        if self._fingerprint is not None:
+            return self._fingerprint
+        
+        digest = hashlib.sha256()
+        if isinstance(self.source, io.BytesIO):
+            digest.update(self.source.getbuffer())
+        elif self.excel_file is not None:
+            with open(self.excel_file, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        else:
+            position = self.source.tell()
+            self.source.seek(0)
+            for block in iter(lambda: self.source.read(1024 * 1024), b''):
+                digest.update(block)
+            self.source.seek(position)
+        self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+    
+    def can_stream(self):
+        """判断文件能否逐批读取（stream_sheet、iter_sheet）
+        
+        文件路径按扩展名判断，文件内容和文件对象按是否为xlsx/xlsm的zip结构判断。
+        
+        Returns:
+            bool: 是否为xlsx/xlsm文件
+        """
+        if self.excel_file is not None:
+            return self.excel_file.suffix.lower() in ('.xlsx', '.xlsm')
+        
+        position = self.source.tell()
+        try:
+            self.source.seek(0)
+            with zipfile.ZipFile(self.source) as archive:
+                return 'xl/workbook.xml' in archive.namelist()
+        except zipfile.BadZipFile:
+            return False
+        finally:
+            self.source.seek(position)
     
     def get_sheet_names(self):
         """获取所有工作表名称
         
+        xlsx/xlsm文件只读取workbook.xml，不打开整个工作簿。
+        
         Returns:
             list: 工作表名称列表
         """
+        if self.can_stream():
+            return [name for name, _ in self._read_workbook_sheets()]
         return self.excel.sheet_names
     
-    def parse_sheet(self, sheet_name, header_row, data_start_row, valid_column_start, valid_column_end=None):
+    def get_sheet_info(self, preview_rows=0):
+        """获取各工作表的元数据，用于选择表头行等交互
+        
+        xlsx/xlsm文件的行数和列数来自工作表开头的dimension元素，只读取workbook.xml和每个工作表的开头；
+        文件没有记录dimension时行数和列数为None。预览行通过只读模式读取，不解析整个工作表。
+        其他格式没有行数和列数，预览需要读取工作表。
+        
+        Args:
+            preview_rows (int, optional): 每个工作表预览的行数，默认为0（不预览）
+            
+        Returns:
+            list: 每个工作表一个字典，包含name、rows（最后一行的行号）、columns（最后一列的列号），
+                preview_rows大于0时另有preview（原始单元格值的二维列表，从第一行开始）
+        """
+        if preview_rows < 0:
+            raise ValueError(f"预览行数不能为负数: {preview_rows}")
+        
+        if not self.can_stream():
+            sheets = [{'name': name, 'rows': None, 'columns': None} for name in self.excel.sheet_names]
+        else:
+            sheets = []
+            with self._open_archive() as archive:
+                for name, path in self._read_workbook_sheets():
+                    rows, columns = self._read_dimension(archive, path)
+                    sheets.append({'name': name, 'rows': rows, 'columns': columns})
+        
+        if preview_rows:
+            for sheet in sheets:
+                sheet['preview'] = self.preview_sheet(sheet['name'], preview_rows)
+        return sheets
+    
+    def preview_sheet(self, sheet_name, rows=10):
+        """读取工作表的前几行原始数据，不推断类型、不处理表头
+        
+        Args:
+            sheet_name (str): 工作表名称
+            rows (int, optional): 读取的行数，默认为10
+            
+        Returns:
+            list: 每行一个单元格值列表，各行补齐为相同的列数
+        """
+        if rows < 1:
+            raise ValueError(f"预览行数必须为正整数: {rows}")
+        
+        if self.can_stream():
+            workbook = load_workbook(self.source, read_only=True, data_only=True)
+            try:
+                if sheet_name not in workbook.sheetnames:
+                    raise ValueError(f"找不到工作表: {sheet_name}")
+                preview = [self._trim_row(row) for row in workbook[sheet_name].iter_rows(max_row=rows, values_only=True)]
+            finally:
+                workbook.close()
+        else:
+            df_raw = pd.read_excel(self.excel, sheet_name=sheet_name, header=None, nrows=rows)
+            preview = [self._trim_row(row) for row in df_raw.astype(object).where(df_raw.notna(), None).itertuples(index=False)]
+        
+        width = max((len(row) for row in preview), default=0)
+        return [row + [None] * (width - len(row)) for row in preview]
+    
+    @contextmanager
+    def _open_archive(self):
+        """以zip方式打开xlsx/xlsm文件，文件对象在结束后恢复原来的读取位置"""
+        if self.excel_file is not None:
+            with zipfile.ZipFile(self.excel_file) as archive:
+                yield archive
+            return
+        
+        position = self.source.tell()
+        try:
+            self.source.seek(0)
+            with zipfile.ZipFile(self.source) as archive:
+                yield archive
+        finally:
+            self.source.seek(position)
+    
+    def _read_workbook_sheets(self):
+        """读取workbook.xml中的工作表名称和对应的xml文件路径
+        
+        Returns:
+            list: (工作表名称, zip中的工作表xml路径)元组，按工作簿中的顺序排列
+        """
+        if self._workbook_sheets is not None:
+            return self._workbook_sheets
+        
+        with self._open_archive() as archive:
+            workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+            relationships = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        
+        # 按本地名称匹配元素和属性，兼容Transitional和Strict两种命名空间
+        targets = {}
+        for relationship in relationships:
+            if relationship.get('Type', '').endswith(WORKSHEET_REL_SUFFIX):
+                target = relationship.get('Target', '')
+                path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+                targets[relationship.get('Id')] = path
+        
+        sheets = []
+        for element in workbook.iter():
+            if element.tag.rsplit('}', 1)[-1] != 'sheet':
+                continue
+            rel_id = next((value for key, value in element.attrib.items() if key.rsplit('}', 1)[-1] == 'id'), None)
+            if rel_id in targets:
+                sheets.append((element.get('name'), targets[rel_id]))
+        self._workbook_sheets = sheets
+        return sheets
+    
+    def _read_dimension(self, archive, path):
+        """从工作表xml开头的dimension元素读取使用区域的最后一行和最后一列
+        
+        Args:
+            archive (ZipFile): 打开的xlsx文件
+            path (str): 工作表xml在zip中的路径
+            
+        Returns:
+            tuple: (最后一行的行号, 最后一列的列号)，没有dimension元素时为(None, None)
+        """
+        head = b''
+        with archive.open(path) as f:
+            while len(head) < DIMENSION_SCAN_BYTES:
+                block = f.read(65536)
+                if not block:
+                    break
+                head += block
+                match = re.search(rb'<(?:\w+:)?dimension\s+ref="([^"]+)"', head)
+                if match:
+                    # 只有一个单元格时ref为"A1"，没有数据的工作表也记录为"A1"
+                    min_col, min_row, max_col, max_row = range_boundaries(match.group(1).decode('ascii'))
+                    return max_row, max_col
+                if re.search(rb'<(?:\w+:)?sheetData[\s>/]', head):
+                    break
+        return None, None
+    
+    def parse_sheet(self, sheet_name, header_row=0, data_start_row=1, valid_column_start=0, valid_column_end=None):
         """解析指定的工作表
         
         Args:
@@ -50,11 +388,69 @@ class ExcelParser:
             valid_column_end (int, optional): 有效列结束索引，默认为None（表示所有列）
             
         Returns:
-            dict: 包含表头、数据类型和数据的字典
+            dict: 包含表头、数据类型、自动检测的键列（见_detect_key_columns）和数据（ColumnarData）的字典
         """
-        # 读取整个工作表数据，不指定header
-        df_raw = pd.read_excel(self.excel, sheet_name=sheet_name, header=None)
+        window = (header_row, data_start_row, valid_column_start, valid_column_end)
+        cached = self._get_cached_sheet(sheet_name, window)
+        if cached is not None:
+            return cached
         
+        # 读取整个工作表数据，不指定header；先打开工作簿，open阶段不计入read阶段
+        excel = self.excel
+        with self.profiler.stage('read'):
+            df_raw = pd.read_excel(excel, sheet_name=sheet_name, header=None)
+        self.profiler.count('read', rows=len(df_raw))
+        
+        result = self._parse_raw_sheet(df_raw, header_row, data_start_row, valid_column_start, valid_column_end)
+        self._put_cached_sheet(sheet_name, window, result)
+        return result
+    
+    def _sheet_cache_key(self, sheet_name, window):
+        """工作表缓存键：文件内容、工作表名称、解析范围和类型推断策略"""
+        header_row, data_start_row, valid_column_start, valid_column_end = window
+        return self.sheet_cache.key(
+            self.fingerprint(),
+            sheet_name,
+            header_row=header_row,
+            data_start_row=data_start_row,
+            valid_column_start=valid_column_start,
+            valid_column_end=valid_column_end,
+            inference=self.inference,
+            sample_size=self.sample_size
+        )
+    
+    def _get_cached_sheet(self, sheet_name, window):
+        """从工作表缓存读取解析结果，未配置缓存或未命中时返回None"""
+        if self.sheet_cache is None:
+            return None
+        with self.profiler.stage('cache'):
+            cached = self.sheet_cache.get(self._sheet_cache_key(sheet_name, window))
+        if cached is None:
+            return None
+        self.profiler.count('cache', rows=len(cached['data']))
+        cached['data'] = ColumnarData(cached['data'])
+        return cached
+    
+    def _put_cached_sheet(self, sheet_name, window, sheet_data):
+        """将解析结果写入工作表缓存"""
+        if self.sheet_cache is None:
+            return
+        with self.profiler.stage('cache'):
+            self.sheet_cache.put(self._sheet_cache_key(sheet_name, window), sheet_data)
+    
+    def _parse_raw_sheet(self, df_raw, header_row, data_start_row, valid_column_start, valid_column_end):
+        """解析已读取的工作表数据
+        
+        Args:
+            df_raw (DataFrame): 不指定header读取的整个工作表
+            header_row (int): 表头所在行索引
+            data_start_row (int): 数据开始行索引
+            valid_column_start (int): 有效列起始索引
+            valid_column_end (int): 有效列结束索引，None表示所有列
+            
+        Returns:
+            dict: 包含表头、数据类型和数据的字典
+        """
         # 将行索引转换为从0开始
         header_row_idx = header_row
         data_start_row_idx = data_start_row
@@ -77,19 +473,7 @@ class ExcelParser:
             headers = headers_row.iloc[valid_column_start:valid_column_end+1].tolist()
         
         # 处理空列名和重复列名
-        headers = [self._handle_empty_column_name(col, idx) for idx, col in enumerate(headers)]
-        
-        # 处理重复列名
-        if len(headers) != len(set(headers)):
-            # 添加数字后缀处理重复列名
-            seen_columns = {}
-            new_headers = []
-            for header in headers:
-                count = seen_columns.get(header, 0)
-                new_header = f"{header}_{count}" if count else header
-                new_headers.append(new_header)
-                seen_columns[header] = count + 1
-            headers = new_headers
+        headers = self._build_headers(headers)
         
         # 提取数据部分
         if valid_column_end is None:
@@ -100,39 +484,241 @@ class ExcelParser:
         # 设置列名
         data_df.columns = headers
         
+        # 整表读取时表头行参与了dtype推断，这里按数据区域重新推断
+        data_df = data_df.infer_objects()
+        
         # 推断数据类型
-        column_types = self._infer_column_types(data_df)
+        with self.profiler.stage('infer_types', rows=len(data_df)):
+            column_types = self._infer_column_types(data_df)
+            key_columns = self._detect_key_columns(data_df, column_types)
         
         # 处理空值
-        data_df = self._handle_null_values(data_df, column_types)
+        with self.profiler.stage('null_values', rows=len(data_df)):
+            data_df = self._handle_null_values(data_df, column_types)
         
         return {
             'headers': headers,
             'types': column_types,
-            'data': data_df.to_dict('records')
+            'key_columns': key_columns,
+            'data': ColumnarData(data_df)
         }
     
-    def parse_all_sheets(self, header_row, data_start_row, valid_column_start, valid_column_end=None):
+    def iter_sheet(self, sheet_name, header_row=0, data_start_row=1, valid_column_start=0, valid_column_end=None, batch_size=10000):
+        """流式读取指定的工作表
+        
+        基于openpyxl只读模式逐行读取，按批次产出数据，内存占用只与批大小有关。
+        未指定结束列时，以表头行的有效宽度作为列范围；没有数据行时产出一个空批次。
+        
+        Args:
+            sheet_name (str): 工作表名称
+            header_row (int, optional): 表头所在行索引，默认为0（第一行）
+            data_start_row (int, optional): 数据开始行索引，默认为1（第二行）
+            valid_column_start (int, optional): 有效列起始索引，默认为0（第一列）
+            valid_column_end (int, optional): 有效列结束索引，默认为None（表示所有列）
+            batch_size (int, optional): 每批行数，默认为10000
+            
+        Yields:
+            DataFrame: 一批数据，列名为处理后的表头
+        """
+        for headers, rows in self._iter_row_batches(sheet_name, header_row, data_start_row, valid_column_start, valid_column_end, batch_size):
+            yield self._rows_to_frame(rows, headers)
+    
+    def stream_sheet(self, sheet_name, header_row=0, data_start_row=1, valid_column_start=0, valid_column_end=None, batch_size=10000):
+        """流式解析指定的工作表
+        
+        只读取一遍工作表：按第一批数据推断列类型后立即返回，调用方可以马上输出建表语句；
+        遍历data时逐批读取，每批先合并类型特征再处理空值并逐行产出，整个过程只在内存中保留一批数据。
+        后续批次放宽列类型时直接修改返回的types（见SQLGenerator.iter_data中的修改列类型语句），
+        类型只会放宽。第一批中全为空值的列先按TEXT建表，出现非空值后再放宽，
+        放宽前的空值写为NULL（整表解析时全为空值的列写为空字符串）。
+        
+        Args:
+            sheet_name (str): 工作表名称
+            header_row (int, optional): 表头所在行索引，默认为0（第一行）
+            data_start_row (int, optional): 数据开始行索引，默认为1（第二行）
+            valid_column_start (int, optional): 有效列起始索引，默认为0（第一列）
+            valid_column_end (int, optional): 有效列结束索引，默认为None（表示所有列）
+            batch_size (int, optional): 每批行数，默认为10000
+            
+        Returns:
+            dict: 与parse_sheet结构相同，其中types为已读取数据的列类型，data为按需产出数据行的迭代器
+        """
+        batches = self.profiler.iter_stage(
+            'read',
+            self._iter_row_batches(sheet_name, header_row, data_start_row, valid_column_start, valid_column_end, batch_size)
+        )
+        # 没有数据行时也会产出一个空批次
+        headers, first_rows = next(batches)
+        profiles = {}
+        column_types = {}
+        
+        # 合并一批数据的类型特征，更新column_types
+        def add_batch(rows):
+            self.profiler.count('read', rows=len(rows))
+            with self.profiler.stage('infer_types', rows=len(rows)):
+                # 已是TEXT的文本列无法再放宽，不再统计；全为空值的列虽然也按TEXT建表，仍可放宽
+                skip_columns = {
+                    column for column, profile in profiles.items()
+                    if profile['kind'] == 'text' and column_types[column] == 'TEXT'
+                }
+                batch_profiles = self._profile_columns(self._rows_to_frame(rows, headers), skip_columns)
+                for column in headers:
+                    if column in skip_columns:
+                        continue
+                    profile = batch_profiles[column]
+                    if column in profiles:
+                        profile = self._merge_profiles(profiles[column], profile)
+                    profiles[column] = profile
+                    column_types[column] = self._profile_to_type(profile)
+        
+        # 按当前的列类型处理一批数据的空值
+        def handle_batch(rows):
+            # 文本列保持object类型，避免整数在仅含数字的批次中变成浮点数
+            text_columns = [column for column, profile in profiles.items() if profile['kind'] == 'text']
+            # 目前全为空值的列以后可能放宽为其他类型，空值保持为NULL
+            empty_columns = [column for column, profile in profiles.items() if profile['kind'] == 'empty']
+            with self.profiler.stage('null_values', rows=len(rows)):
+                batch = self._rows_to_frame(rows, headers, object_columns=text_columns)
+                batch = self._handle_null_values(batch, {
+                    column: dtype for column, dtype in column_types.items() if column not in empty_columns
+                })
+                for column in empty_columns:
+                    batch[column] = self._null_to_none(batch[column])
+                return batch.to_dict('records')
+        
+        def iter_records():
+            nonlocal first_rows
+            records = handle_batch(first_rows)
+            first_rows = None
+            yield from records
+            for _, rows in batches:
+                add_batch(rows)
+                yield from handle_batch(rows)
+        
+        add_batch(first_rows)
+        return {
+            'headers': headers,
+            'types': column_types,
+            'data': iter_records()
+        }
+    
+    def _iter_row_batches(self, sheet_name, header_row, data_start_row, valid_column_start, valid_column_end, batch_size):
+        """逐批读取工作表的数据行
+        
+        Args:
+            sheet_name (str): 工作表名称
+            header_row (int): 表头所在行索引
+            data_start_row (int): 数据开始行索引
+            valid_column_start (int): 有效列起始索引
+            valid_column_end (int): 有效列结束索引，None表示所有列
+            batch_size (int): 每批行数
+            
+        Yields:
+            tuple: (表头列表, 数据行列表)
+        """
+        if valid_column_end is not None and valid_column_end < valid_column_start:
+            raise ValueError(f"结束列索引 {valid_column_end} 在起始列索引 {valid_column_start} 之前")
+        if batch_size < 1:
+            raise ValueError(f"批大小必须为正整数: {batch_size}")
+        if not self.can_stream():
+            name = self.excel_file.name if self.excel_file is not None else type(self.source).__name__
+            raise ValueError(f"流式读取仅支持xlsx/xlsm格式: {name}")
+        
+        workbook = load_workbook(self.source, read_only=True, data_only=True)
+        try:
+            if sheet_name not in workbook.sheetnames:
+                raise ValueError(f"找不到工作表: {sheet_name}")
+            worksheet = workbook[sheet_name]
+            
+            headers = None
+            column_end = None if valid_column_end is None else valid_column_end + 1
+            # 表头之前出现的数据行（数据起始行早于表头行时）
+            early_rows = []
+            # 尚未确定是否位于表尾的空行
+            pending_empty = 0
+            batch = []
+            emitted = False
+            
+            for row_idx, row in enumerate(worksheet.iter_rows(values_only=True)):
+                if row_idx == header_row:
+                    raw_headers = self._trim_row(row)[valid_column_start:column_end]
+                    if column_end is not None:
+                        raw_headers += [None] * (column_end - valid_column_start - len(raw_headers))
+                    headers = self._build_headers(raw_headers)
+                    column_end = valid_column_start + len(headers)
+                    batch.extend(self._fit_row(r, valid_column_start, column_end) for r in early_rows)
+                    early_rows = None
+                
+                if row_idx < data_start_row:
+                    continue
+                
+                row = self._trim_row(row)
+                if headers is None:
+                    early_rows.append(row)
+                    continue
+                
+                # pandas会丢弃表尾的空行，这里延后输出空行以保持一致
+                if not any(value is not None for value in row[valid_column_start:column_end]):
+                    pending_empty += 1
+                    continue
+                if pending_empty:
+                    batch.extend([[None] * len(headers)] * pending_empty)
+                    pending_empty = 0
+                
+                batch.append(self._fit_row(row, valid_column_start, column_end))
+                if len(batch) >= batch_size:
+                    yield headers, batch
+                    emitted = True
+                    batch = []
+            
+            if headers is None:
+                raise ValueError(f"表头行索引 {header_row} 超出了工作表范围")
+            if batch or not emitted:
+                yield headers, batch
+        finally:
+            workbook.close()
+    
+    def parse_all_sheets(self, header_row=0, data_start_row=1, valid_column_start=0, valid_column_end=None, sheet_names=None):
         """解析所有工作表
         
+        所有工作表共用同一个已打开的工作簿（共享字符串和样式只在打开时解析一次），
+        逐个读取并解析，内存中同时只保留一个工作表的原始数据；配置了工作表缓存时只读取未命中的工作表。
+        
         Args:
             header_row (int, optional): 表头所在行索引，默认为0（第一行）
             data_start_row (int, optional): 数据开始行索引，默认为1（第二行）
-            valid_column_start (str, optional): 有效列起始列名，默认为'A'（第一列）
-            valid_column_end (str, optional): 有效列结束列名，默认为None（表示所有列）
+            valid_column_start (int, optional): 有效列起始索引，默认为0（第一列）
+            valid_column_end (int, optional): 有效列结束索引，默认为None（表示所有列）
+            sheet_names (list, optional): 要解析的工作表名称，默认为None（表示所有工作表）
             
         Returns:
             dict: 以工作表名称为键，解析结果为值的字典
         """
-        result = {}
-        for sheet_name in self.get_sheet_names():
-            result[sheet_name] = self.parse_sheet(
-                sheet_name, 
-                header_row=header_row, 
-                data_start_row=data_start_row, 
-                valid_column_start=valid_column_start, 
+        if sheet_names is None:
+            sheet_names = self.get_sheet_names()
+        sheet_names = list(sheet_names)
+        window = (header_row, data_start_row, valid_column_start, valid_column_end)
+        
+        result = {sheet_name: self._get_cached_sheet(sheet_name, window) for sheet_name in sheet_names}
+        missing = [sheet_name for sheet_name in sheet_names if result[sheet_name] is None]
+        if not missing:
+            return result
+        
+        # 先打开工作簿，open阶段不计入read阶段
+        excel = self.excel
+        for sheet_name in missing:
+            with self.profiler.stage('read'):
+                df_raw = pd.read_excel(excel, sheet_name=sheet_name, header=None)
+            self.profiler.count('read', rows=len(df_raw))
+            
+            result[sheet_name] = self._parse_raw_sheet(
+                df_raw,
+                header_row=header_row,
+                data_start_row=data_start_row,
+                valid_column_start=valid_column_start,
                 valid_column_end=valid_column_end
             )
+            self._put_cached_sheet(sheet_name, window, result[sheet_name])
         return result
     
     def _clean_column_name(self, column_name):
@@ -163,92 +749,369 @@ class ExcelParser:
         Returns:
             dict: 列名到SQL类型的映射
         """
-        column_types = {}
+        return {column: self._profile_to_type(profile) for column, profile in self._profile_columns(df).items()}
+    
+    def _detect_key_columns(self, df, column_types):
+        """检测可以作为键的列，用于upsert
         
-        for column in df.columns:
-            # 获取非空值
-            non_null_values = df[column].dropna()
+        按列的顺序取第一个非空且不重复的整数、VARCHAR、DATE或DATETIME列，
+        小数、布尔和TEXT列不适合作为键，不参与检测。
+        
+        Args:
+            df (DataFrame): 处理空值之前的数据
+            column_types (dict): 列名到SQL类型的映射
             
-            if len(non_null_values) == 0:
-                # 如果全是空值，默认为TEXT
-                column_types[column] = 'TEXT'
+        Returns:
+            list: 键列名，没有合适的列时为空列表
+        """
+        if df.empty:
+            return []
+        for column in df.columns:
+            sql_type = column_types[column]
+            if sql_type.startswith(('DECIMAL', 'BOOLEAN', 'TEXT')):
                 continue
+            values = df[column]
+            # 先用便宜的空值检查排除大部分列，再做哈希去重检查
+            if values.notna().all() and values.is_unique:
+                return [column]
+        return []
+    
+    def _profile_columns(self, df, skip_columns=()):
+        """按推断策略统计DataFrame中各列的类型特征
+        
+        Args:
+            df (DataFrame): 待统计的DataFrame
+            skip_columns (set, optional): 不需要统计的列，其特征记为空列
             
-            # 检查是否为整数
-            if pd.api.types.is_integer_dtype(non_null_values):
-                # 检查值的范围确定整数类型
-                max_val = non_null_values.max()
-                min_val = non_null_values.min()
-                
-                if min_val >= 0:
-                    if max_val <= 255:
-                        column_types[column] = 'TINYINT UNSIGNED'
-                    elif max_val <= 65535:
-                        column_types[column] = 'SMALLINT UNSIGNED'
-                    elif max_val <= 4294967295:
-                        column_types[column] = 'INT UNSIGNED'
-                    else:
-                        column_types[column] = 'BIGINT UNSIGNED'
-                else:
-                    if min_val >= -128 and max_val <= 127:
-                        column_types[column] = 'TINYINT'
-                    elif min_val >= -32768 and max_val <= 32767:
-                        column_types[column] = 'SMALLINT'
-                    elif min_val >= -2147483648 and max_val <= 2147483647:
-                        column_types[column] = 'INT'
-                    else:
-                        column_types[column] = 'BIGINT'
-            
-            # 检查是否为浮点数
-            elif pd.api.types.is_float_dtype(non_null_values):
-                # 检查精度
-                max_decimals = 0
-                for val in non_null_values:
-                    if isinstance(val, (float, np.float64, np.float32)) and not np.isnan(val):
-                        decimals = len(str(val).split('.')[-1])
-                        max_decimals = max(max_decimals, decimals)
-                
-                if max_decimals > 0:
-                    column_types[column] = f'DECIMAL(20,{min(max_decimals, 10)})'
-                else:
-                    column_types[column] = 'DECIMAL(20,0)'
-            
-            # 检查是否为日期时间
-            elif pd.api.types.is_datetime64_dtype(non_null_values):
-                # 检查是否包含时间信息
-                has_time = False
-                for val in non_null_values:
-                    if pd.notna(val) and (val.hour != 0 or val.minute != 0 or val.second != 0):
-                        has_time = True
-                        break
-                
-                if has_time:
-                    column_types[column] = 'DATETIME'
+        Returns:
+            dict: 列名到类型特征的映射
+        """
+        profiles = {}
+        for column in df.columns:
+            values = df[column]
+            if column in skip_columns:
+                profiles[column] = {'kind': 'empty'}
+            elif self.inference == 'progressive':
+                profiles[column] = self._profile_column_progressive(values)
+            elif self.inference == 'sample':
+                sample = self._sample_values(values)
+                profile = self._profile_column(sample)
+                if len(values) <= self.sample_size:
+                    # 样本就是整列
+                    profiles[column] = profile
+                elif profile['kind'] == 'empty':
+                    # 样本中没有非空值，无法确定类型，退回到全列统计
+                    profiles[column] = self._profile_column(values)
                 else:
-                    column_types[column] = 'DATE'
+                    profiles[column] = self._widen_profile(profile, values)
+            else:
+                profiles[column] = self._profile_column(values)
+        return profiles
+    
+    def _parse_inference(self, inference):
+        """解析类型推断策略
+        
+        Args:
+            inference (str): 推断策略，如'full'、'sample(1000)'、'progressive'
             
-            # 检查是否为布尔值
-            elif pd.api.types.is_bool_dtype(non_null_values):
-                column_types[column] = 'BOOLEAN'
+        Returns:
+            tuple: (策略名称, 样本量)
+        """
+        match = re.fullmatch(r'\s*(full|progressive|sample)\s*(?:\(\s*(\d+)\s*\))?\s*', str(inference).lower())
+        if not match or (match.group(2) and match.group(1) != 'sample'):
+            raise ValueError(f"不支持的类型推断策略: {inference}")
+        
+        sample_size = int(match.group(2)) if match.group(2) else DEFAULT_SAMPLE_SIZE
+        if sample_size < 1:
+            raise ValueError(f"样本量必须为正整数: {inference}")
+        return match.group(1), sample_size
+    
+    def _sample_values(self, values):
+        """分层抽样：将整列等分为sample_size段，每段随机取一个值，再去掉其中的空值
+        
+        使用固定随机种子，保证同一文件的推断结果稳定。不对整列计算空值掩码，
+        空值较多的列得到的样本会少于sample_size。
+        
+        Args:
+            values (Series): 列数据
             
-            # 其他情况作为文本处理
-            else:
-                # 检查文本长度
+        Returns:
+            Series: 样本中的非空值
+        """
+        if len(values) <= self.sample_size:
+            return values.dropna()
+        
+        rng = np.random.default_rng(0)
+        edges = np.linspace(0, len(values), self.sample_size + 1)
+        positions = rng.uniform(edges[:-1], edges[1:]).astype(np.int64)
+        return values.iloc[np.minimum(positions, len(values) - 1)].dropna()
+    
+    def _widen_profile(self, profile, values):
+        """用整列数据放宽抽样得到的类型特征
+        
+        样本取自同一列，dtype与整列相同，类型不会改变，只需纳入样本未覆盖的取值范围、小数位数、
+        时间信息和文本长度。每种类型只对整列的numpy数组或值列表做一次检查，不再完整统计该列。
+        
+        Args:
+            profile (dict): 样本的类型特征
+            values (Series): 整列数据，可以包含空值
+            
+        Returns:
+            dict: 放宽后的类型特征
+        """
+        kind = profile['kind']
+        
+        if kind == 'int':
+            # 整数dtype中没有空值
+            array = values.to_numpy()
+            return {'kind': 'int', 'min': int(array.min()), 'max': int(array.max())}
+        
+        if kind == 'float' and profile['decimals'] < 10:
+            # 只对超出样本小数位数的值重新计算，NaN为空值，不参与检查
+            array = values.to_numpy(dtype=np.float64)
+            scale = 10.0 ** max(profile['decimals'], 1)
+            with np.errstate(invalid='ignore', over='ignore'):
+                scaled = array * scale
+                fits = np.isnan(array) | ((np.abs(scaled) < 2 ** 52) & (np.rint(scaled) / scale == array))
+            if not fits.all():
+                return {'kind': 'float', 'decimals': max(profile['decimals'], self._max_decimals(array[~fits]))}
+            return profile
+        
+        if kind == 'datetime' and not profile['has_time']:
+            # 按整数刻度计算一天内的偏移，不小于1秒时包含时间信息（忽略毫秒）
+            array = values.to_numpy()
+            unit = np.datetime_data(array.dtype)[0]
+            ticks = array[~np.isnat(array)].view(np.int64)
+            day = np.timedelta64(1, 'D') // np.timedelta64(1, unit)
+            second = np.timedelta64(1, 's') // np.timedelta64(1, unit)
+            return {'kind': 'datetime', 'has_time': bool((ticks % day >= second).any())}
+        
+        if kind == 'text' and profile['max_length'] <= 255:
+            # 逐个取字符串长度比.str.len()快，空值和非字符串值不计入
+            max_length = max((len(value) for value in values.tolist() if type(value) is str), default=0)
+            return {'kind': 'text', 'max_length': max(profile['max_length'], max_length)}
+        
+        return profile
+    
+    def _profile_column_progressive(self, values):
+        """分块统计一列数据的类型特征，类型无法再变化时提前结束
+        
+        Args:
+            values (Series): 列数据
+            
+        Returns:
+            dict: 类型特征
+        """
+        profile = {'kind': 'empty'}
+        for start in range(0, len(values), PROGRESSIVE_CHUNK_SIZE):
+            profile = self._merge_profiles(profile, self._profile_column(values.iloc[start:start + PROGRESSIVE_CHUNK_SIZE]))
+            if self._is_final_profile(profile):
+                break
+        return profile
+    
+    def _is_final_profile(self, profile):
+        """判断类型特征对应的SQL类型是否已经无法再变化
+        
+        同一列的数据类型不变时，BIGINT、TEXT、10位小数的DECIMAL、DATETIME和BOOLEAN都不会再被放宽。
+        
+        Args:
+            profile (dict): 类型特征
+            
+        Returns:
+            bool: 是否已经确定
+        """
+        kind = profile['kind']
+        if kind == 'int':
+            return profile['min'] < -2147483648 or (profile['min'] < 0 and profile['max'] > 2147483647)
+        if kind == 'float':
+            return profile['decimals'] >= 10
+        if kind == 'datetime':
+            return profile['has_time']
+        if kind == 'text':
+            return profile['max_length'] > 255
+        return kind == 'bool'
+    
+    def _profile_column(self, values):
+        """统计一列数据的类型特征
+        
+        特征可以跨批次合并（见_merge_profiles），再由_profile_to_type转换为SQL类型。
+        
+        Args:
+            values (Series): 列数据
+            
+        Returns:
+            dict: 类型特征，kind取值为empty/int/float/datetime/bool/text
+        """
+        # 获取非空值
+        non_null_values = values.dropna()
+        
+        if len(non_null_values) == 0:
+            return {'kind': 'empty'}
+        
+        # 检查是否为整数
+        if pd.api.types.is_integer_dtype(non_null_values):
+            return {'kind': 'int', 'min': int(non_null_values.min()), 'max': int(non_null_values.max())}
+        
+        # 检查是否为浮点数
+        elif pd.api.types.is_float_dtype(non_null_values):
+            # 检查精度
+            return {'kind': 'float', 'decimals': self._max_decimals(non_null_values.to_numpy(dtype=np.float64))}
+        
+        # 检查是否为日期时间
+        elif pd.api.types.is_datetime64_dtype(non_null_values):
+            # 检查是否包含时间信息（时、分、秒不全为0，忽略毫秒）
+            has_time = bool((non_null_values.dt.floor('s') != non_null_values.dt.normalize()).any())
+            return {'kind': 'datetime', 'has_time': has_time}
+        
+        # 检查是否为布尔值
+        elif pd.api.types.is_bool_dtype(non_null_values):
+            return {'kind': 'bool'}
+        
+        # 其他情况作为文本处理
+        else:
+            # 检查文本长度，非字符串值不计入
+            try:
+                max_length = non_null_values.str.len().max()
+            except AttributeError:
+                # 列中没有字符串
                 max_length = 0
-                for val in non_null_values:
-                    if isinstance(val, str):
-                        max_length = max(max_length, len(val))
-                
-                if max_length <= 255:
-                    column_types[column] = f'VARCHAR({max(max_length, 50)})'
+            return {'kind': 'text', 'max_length': 0 if pd.isna(max_length) else int(max_length)}
+    
+    def _max_decimals(self, values):
+        """计算浮点数按str()输出时小数部分的最大长度
+        
+        小数位数为使 round(val * 10**k) == val * 10**k 成立的最小k（至少为1，对应'1.0'），
+        按k从小到大批量判定；科学计数法表示的值、超过10位小数的值以及超出精确计算范围的值
+        仍按字符串规则逐个计算。结果大于10时只保证不小于10。
+        
+        Args:
+            values (ndarray): 非空浮点数数组
+            
+        Returns:
+            int: 最大小数位数
+        """
+        abs_values = np.abs(values)
+        # str()在绝对值小于1e-4或不小于1e16时使用科学计数法
+        scientific = ~np.isfinite(values) | (abs_values >= 1e16) | ((abs_values < 1e-4) & (abs_values != 0))
+        
+        remaining = values[~scientific]
+        max_decimals = 0
+        for decimals in range(1, 11):
+            if len(remaining) == 0:
+                break
+            scale = 10.0 ** decimals
+            scaled = remaining * scale
+            # 缩放后超过2**52时取整不再精确，留给字符串规则处理
+            matched = (np.abs(scaled) < 2 ** 52) & (np.rint(scaled) / scale == remaining)
+            if matched.any():
+                max_decimals = decimals
+            remaining = remaining[~matched]
+        
+        for val in np.concatenate([values[scientific], remaining]).tolist():
+            max_decimals = max(max_decimals, len(str(val).split('.')[-1]))
+            if max_decimals >= 10:
+                break
+        
+        return max_decimals
+    
+    def _merge_profiles(self, left, right):
+        """合并同一列在两个批次中的类型特征
+        
+        结果与两批数据拼接后再统计一致：整数与浮点数合并为浮点数，
+        其他不同类型的组合在pandas中为object列，按文本处理。
+        
+        Args:
+            left (dict): 类型特征
+            right (dict): 类型特征
+            
+        Returns:
+            dict: 合并后的类型特征
+        """
+        if left['kind'] == 'empty':
+            return right
+        if right['kind'] == 'empty':
+            return left
+        
+        kinds = {left['kind'], right['kind']}
+        if kinds == {'int'}:
+            return {'kind': 'int', 'min': min(left['min'], right['min']), 'max': max(left['max'], right['max'])}
+        if kinds == {'float'}:
+            return {'kind': 'float', 'decimals': max(left['decimals'], right['decimals'])}
+        if kinds == {'int', 'float'}:
+            # 整数转为浮点数后形如'1.0'，至少有一位小数
+            float_profile = left if left['kind'] == 'float' else right
+            return {'kind': 'float', 'decimals': max(float_profile['decimals'], 1)}
+        if kinds == {'datetime'}:
+            return {'kind': 'datetime', 'has_time': left['has_time'] or right['has_time']}
+        if kinds == {'bool'}:
+            return left
+        
+        # 非字符串值不计入文本长度
+        return {'kind': 'text', 'max_length': max(left.get('max_length', 0), right.get('max_length', 0))}
+    
+    def _profile_to_type(self, profile):
+        """将类型特征转换为SQL类型
+        
+        Args:
+            profile (dict): 类型特征
+            
+        Returns:
+            str: SQL类型
+        """
+        kind = profile['kind']
+        
+        if kind == 'empty':
+            # 如果全是空值，默认为TEXT
+            return 'TEXT'
+        
+        if kind == 'int':
+            # 检查值的范围确定整数类型
+            max_val = profile['max']
+            min_val = profile['min']
+            
+            if min_val >= 0:
+                if max_val <= 255:
+                    return 'TINYINT UNSIGNED'
+                elif max_val <= 65535:
+                    return 'SMALLINT UNSIGNED'
+                elif max_val <= 4294967295:
+                    return 'INT UNSIGNED'
                 else:
-                    column_types[column] = 'TEXT'
+                    return 'BIGINT UNSIGNED'
+            else:
+                if min_val >= -128 and max_val <= 127:
+                    return 'TINYINT'
+                elif min_val >= -32768 and max_val <= 32767:
+                    return 'SMALLINT'
+                elif min_val >= -2147483648 and max_val <= 2147483647:
+                    return 'INT'
+                else:
+                    return 'BIGINT'
+        
+        if kind == 'float':
+            max_decimals = profile['decimals']
+            if max_decimals > 0:
+                return f'DECIMAL(20,{min(max_decimals, 10)})'
+            else:
+                return 'DECIMAL(20,0)'
+        
+        if kind == 'datetime':
+            return 'DATETIME' if profile['has_time'] else 'DATE'
+        
+        if kind == 'bool':
+            return 'BOOLEAN'
         
-        return column_types
+        max_length = profile['max_length']
+        if max_length <= 255:
+            return f'VARCHAR({max(max_length, 50)})'
+        else:
+            return 'TEXT'
     
     def _handle_null_values(self, df, column_types):
         """处理DataFrame中的空值
         
+        每列只计算一次空值掩码，整列替换，不逐个值调用Python函数。
+        
         Args:
             df (DataFrame): 待处理的DataFrame
             column_types (dict): 列类型映射
@@ -256,33 +1119,136 @@ class ExcelParser:
         Returns:
             DataFrame: 处理后的DataFrame
         """
-        # 设置pandas选项以避免FutureWarning
-        pd.set_option('future.no_silent_downcasting', True)
         for column, dtype in column_types.items():
-            # 对于数值类型，将NaN替换为None（SQL中的NULL）
-            if 'INT' in dtype or 'DECIMAL' in dtype:
-                df[column] = df[column].apply(lambda x: None if pd.isna(x) else x)
+            # 对于数值和日期类型，将空值替换为None（SQL中的NULL）
+            if 'INT' in dtype or 'DECIMAL' in dtype or dtype in ['DATE', 'DATETIME']:
+                df[column] = self._null_to_none(df[column])
             
             # 对于字符串类型，将NaN替换为空字符串
             elif 'VARCHAR' in dtype or dtype == 'TEXT':
-                # 使用更安全的方式处理字符串，避免Series的歧义
-                df[column] = df[column].fillna('')
-                # 确保值是字符串类型
-                df[column] = df[column].astype(str)
-            
-            # 对于日期类型，保持NaN
-            elif dtype in ['DATE', 'DATETIME']:
-                df[column] = df[column].apply(lambda x: None if pd.isna(x) else x)
+                df[column] = df[column].fillna('').astype(str)
             
             # 对于布尔类型，将NaN替换为False
-            elif dtype == 'BOOLEAN':
-                # 使用更安全的方式处理布尔值，避免Series的歧义
-                df[column] = df[column].fillna(False)
-                # 确保值是布尔类型
-                df[column] = df[column].astype(bool)
+            elif dtype == 'BOOLEAN' and df[column].dtype != bool:
+                df[column] = self._fill_null(df[column], False).astype(bool)
         
         return df
     
+    def _null_to_none(self, values):
+        """将一列中的空值替换为None，并按剩余的值重新推断dtype
+        
+        数值和日期的numpy dtype本身以NaN、NaT表示空值，无法存放None，直接返回；
+        其他dtype转为object后按空值掩码整体赋值，再推断dtype。
+        结果与逐个值执行 None if pd.isna(x) else x 一致。
+        
+        Args:
+            values (Series): 一列数据
+            
+        Returns:
+            Series: 处理后的数据
+        """
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'iufcbmM':
+            return values
+        return self._fill_null(values, None).infer_objects()
+    
+    def _fill_null(self, values, fill_value):
+        """按空值掩码将一列中的空值替换为fill_value，结果为object类型
+        
+        直接操作numpy数组，不触发pandas的自动降级（downcasting）。
+        
+        Args:
+            values (Series): 一列数据
+            fill_value: 替换空值的值
+            
+        Returns:
+            Series: object类型的数据
+        """
+        mask = values.isna().to_numpy()
+        filled = values.to_numpy(dtype=object, copy=True)
+        filled[mask] = fill_value
+        return pd.Series(filled, index=values.index, name=values.name, dtype=object)
+    
+    def _build_headers(self, raw_headers):
+        """处理表头行中的空列名和重复列名
+        
+        Args:
+            raw_headers (list): 原始表头值
+            
+        Returns:
+            list: 处理后的列名列表
+        """
+        headers = [self._handle_empty_column_name(col, idx) for idx, col in enumerate(raw_headers)]
+        
+        # 处理重复列名
+        if len(headers) != len(set(headers)):
+            # 添加数字后缀处理重复列名
+            seen_columns = {}
+            new_headers = []
+            for header in headers:
+                count = seen_columns.get(header, 0)
+                new_header = f"{header}_{count}" if count else header
+                new_headers.append(new_header)
+                seen_columns[header] = count + 1
+            headers = new_headers
+        
+        return headers
+    
+    def _trim_row(self, row):
+        """按pandas读取Excel的规则转换一行单元格值
+        
+        NA_STRINGS中的字符串视为空值，整数值的浮点数转换为整数，并去掉行尾的空单元格。
+        
+        Args:
+            row (tuple): openpyxl读取的单元格值
+            
+        Returns:
+            list: 转换后的单元格值
+        """
+        values = [
+            None if type(value) is str and value in NA_STRINGS
+            else int(value) if type(value) is float and value.is_integer()
+            else value
+            for value in row
+        ]
+        while values and values[-1] is None:
+            values.pop()
+        return values
+    
+    def _fit_row(self, row, column_start, column_end):
+        """截取有效列范围，并补齐缺失的单元格
+        
+        Args:
+            row (list): 单元格值
+            column_start (int): 有效列起始索引
+            column_end (int): 有效列结束索引（不包含）
+            
+        Returns:
+            list: 与表头等宽的单元格值
+        """
+        values = row[column_start:column_end]
+        return values + [None] * (column_end - column_start - len(values))
+    
+    def _rows_to_frame(self, rows, headers, object_columns=None):
+        """将一批数据行转换为DataFrame
+        
+        Args:
+            rows (list): 数据行列表
+            headers (list): 列名列表
+            object_columns (list, optional): 保持object类型、不做类型推断的列
+            
+        Returns:
+            DataFrame: 数据批次
+        """
+        frame = pd.DataFrame(rows, columns=headers, dtype=object)
+        if not object_columns:
+            return frame.infer_objects()
+        
+        object_columns = set(object_columns)
+        infer_columns = [column for column in headers if column not in object_columns]
+        if infer_columns:
+            frame[infer_columns] = frame[infer_columns].infer_objects()
+        return frame
+    
     def _handle_empty_column_name(self, column_name, idx):
         """处理空列名
         
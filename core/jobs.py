@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+转换任务模块
+
+在后台线程中执行耗时较长的转换，记录进度，并在过期后删除结果文件。
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from .excel_parser import ExcelParser
+    from .sql_generator import SQLGenerator
+    from .pipeline import iter_workbook_sql
+    from .profiling import Profiler
+except ImportError:
+    # 直接运行core/chat_excel.py时，core目录位于sys.path中
+    from excel_parser import ExcelParser
+    from sql_generator import SQLGenerator
+    from pipeline import iter_workbook_sql
+    from profiling import Profiler
+
+# 默认同时执行的任务数
+DEFAULT_JOB_CONCURRENCY = 2
+
+# 任务完成后结果默认保留的秒数
+DEFAULT_JOB_TTL = 3600
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class Job:
+    """一个转换任务"""
+
+    def __init__(self, job_id, filename, work_dir):
+        """初始化任务
+
+        Args:
+            job_id (str): 任务ID
+            filename (str): 上传文件的原始文件名
+            work_dir (Path): 存放上传文件和结果文件的目录
+        """
+        self.id = job_id
+        self.filename = filename
+        self.work_dir = work_dir
+        self.source_path = work_dir / f"source{Path(filename).suffix.lower()}"
+        self.result_path = work_dir / "result.sql"
+        self.status = JOB_QUEUED
+        self.error = None
+        self.sheets_total = None
+        self.sheets_done = 0
+        self.rows_emitted = 0
+        self.profiler = Profiler()
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        """返回任务的状态和进度
+
+        Returns:
+            dict: 可以序列化为JSON的任务信息
+        """
+        return {
+            'job_id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'error': self.error,
+            'sheets_total': self.sheets_total,
+            'sheets_done': self.sheets_done,
+            'rows_emitted': self.rows_emitted,
+            'timings': self.profiler.report()['stages'],
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobManager:
+    """转换任务调度器
+
+    任务在进程内的线程池中按提交顺序执行，最多concurrency个任务同时执行。
+    结束（完成或失败）超过ttl秒的任务及其文件在下次访问调度器时删除。
+    """
+
+    def __init__(self, concurrency=DEFAULT_JOB_CONCURRENCY, ttl=DEFAULT_JOB_TTL, work_dir=None):
+        """初始化调度器
+
+        Args:
+            concurrency (int, optional): 同时执行的任务数，默认为2
+            ttl (float, optional): 任务结束后结果保留的秒数，默认为3600
+            work_dir (str, optional): 存放上传文件和结果文件的目录，默认为新建的临时目录
+        """
+        self.concurrency = int(concurrency)
+        if self.concurrency < 1:
+            raise ValueError(f"同时执行的任务数必须为正整数: {concurrency}")
+        self.ttl = float(ttl)
+        if self.ttl <= 0:
+            raise ValueError(f"任务结果保留时间必须为正数: {ttl}")
+        self.work_dir = Path(work_dir) if work_dir is not None else Path(tempfile.mkdtemp(prefix='chat_excel_jobs_'))
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='chat-excel-job')
+
+    def create(self, filename):
+        """创建任务，调用方随后将上传文件写入job.source_path并调用start
+
+        Args:
+            filename (str): 上传文件的原始文件名
+
+        Returns:
+            Job: 新任务
+        """
+        self.evict_expired()
+        job_id = uuid.uuid4().hex
+        work_dir = self.work_dir / job_id
+        work_dir.mkdir()
+        job = Job(job_id, filename or 'upload.xlsx', work_dir)
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def start(self, job, **options):
+        """将任务加入执行队列
+
+        Args:
+            job (Job): create返回的任务
+            **options: 转换参数，包括dialect、sheet_names、table_prefix、header_row、data_start_row、
+                valid_column_start、valid_column_end、inference、rows_per_insert、max_insert_bytes、
+                output_format和batch_size
+        """
+        self._executor.submit(self._run, job, options)
+
+    def discard(self, job):
+        """删除尚未开始的任务及其文件，用于上传失败的情况
+
+        Args:
+            job (Job): create返回的任务
+        """
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+
+    def get(self, job_id):
+        """查询任务
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            Job: 任务，不存在或已过期时返回None
+        """
+        self.evict_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def evict_expired(self):
+        """删除结束超过ttl秒的任务及其文件"""
+        deadline = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished_at is not None and job.finished_at < deadline
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.work_dir, ignore_errors=True)
+
+    def shutdown(self, wait=True):
+        """停止调度器
+
+        Args:
+            wait (bool, optional): 是否等待已提交的任务完成，默认为True
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _run(self, job, options):
+        """在工作线程中执行任务"""
+        job.status = JOB_RUNNING
+        try:
+            self._convert(job, **options)
+        except Exception as e:
+            job.error = str(e)
+            job.status = JOB_FAILED
+            if job.result_path.exists():
+                os.unlink(job.result_path)
+        else:
+            job.status = JOB_DONE
+        finally:
+            if job.source_path.exists():
+                os.unlink(job.source_path)
+            job.finished_at = time.time()
+
+    def _convert(self, job, dialect='mysql', sheet_names=None, table_prefix=None, header_row=0, data_start_row=1,
+                 valid_column_start=0, valid_column_end=None, inference='full', rows_per_insert=None,
+                 max_insert_bytes=None, output_format='insert', batch_size=10000):
+        """转换任务的上传文件，结果写入job.result_path并更新进度"""
+        parser = ExcelParser(job.source_path, inference=inference, profiler=job.profiler)
+        generator = SQLGenerator(
+            dialect=dialect,
+            table_prefix=table_prefix,
+            rows_per_insert=rows_per_insert,
+            max_insert_bytes=max_insert_bytes,
+            output_format=output_format,
+            profiler=job.profiler
+        )
+        sheet_names = parser.get_sheet_names() if sheet_names is None else list(sheet_names)
+        job.sheets_total = len(sheet_names)
+        parse_options = {
+            'header_row': header_row,
+            'data_start_row': data_start_row,
+            'valid_column_start': valid_column_start,
+            'valid_column_end': valid_column_end
+        }
+
+        def update_progress(sheets_done, rows_emitted):
+            job.sheets_done = sheets_done
+            job.rows_emitted = rows_emitted
+
+        with open(job.result_path, 'w', encoding='utf-8') as f:
+            if parser.can_stream():
+                chunks = iter_workbook_sql(
+                    parser,
+                    generator,
+                    sheet_names,
+                    table_prefix=table_prefix,
+                    batch_size=batch_size,
+                    progress=update_progress,
+                    **parse_options
+                )
+                for chunk in chunks:
+                    f.write(chunk)
+                return
+
+            # xls等格式无法逐批读取，逐个工作表整表解析
+            for sheet_idx, sheet_name in enumerate(sheet_names):
+                sheet_data = parser.parse_sheet(sheet_name, **parse_options)
+                table_name = f"{table_prefix or ''}{sheet_name}"
+                if sheet_idx:
+                    f.write("\n\n")
+                f.write(generator.generate_create_table(table_name, sheet_data))
+                f.write("\n\n")
+                f.write(generator.generate_data(table_name, sheet_data))
+                update_progress(sheet_idx + 1, job.rows_emitted + len(sheet_data['data']))
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据库导入模块
+
+不经过SQL文本，直接将解析后的工作表写入数据库。
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+# 每个事务默认写入的行数
+DEFAULT_COMMIT_ROWS = 100000
+
+# 每次executemany默认绑定的行数
+DEFAULT_BATCH_SIZE = 1000
+
+# 连接池默认的连接数
+DEFAULT_POOL_SIZE = 4
+
+# 遇到死锁时默认的重试次数和首次重试前的等待秒数
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_DELAY = 0.1
+
+# 表示死锁或串行化失败的SQLSTATE（PostgreSQL等）和错误码（MySQL）
+DEADLOCK_SQLSTATES = frozenset({'40001', '40P01'})
+DEADLOCK_ERROR_CODES = frozenset({1205, 1213})
+
+SQLITE_URL_PREFIX = 'sqlite:///'
+
+
+def parse_sqlite_url(url):
+    """解析SQLite数据库地址
+
+    格式与SQLAlchemy一致：sqlite:///相对路径.db、sqlite:////绝对路径.db，
+    sqlite:///:memory: 表示内存数据库。
+
+    Args:
+        url (str): 数据库地址
+
+    Returns:
+        str: 数据库文件路径
+    """
+    if not url.startswith(SQLITE_URL_PREFIX):
+        raise ValueError(f"不支持的数据库地址，仅支持 {SQLITE_URL_PREFIX}路径: {url}")
+    database = url[len(SQLITE_URL_PREFIX):]
+    if not database:
+        raise ValueError(f"数据库地址缺少文件路径: {url}")
+    return database
+
+
+def is_deadlock(error):
+    """判断数据库错误是否为可以重试的死锁或锁冲突
+
+    Args:
+        error (Exception): 数据库驱动抛出的异常
+
+    Returns:
+        bool: 是否可以重试
+    """
+    sqlstate = getattr(error, 'sqlstate', None) or getattr(error, 'pgcode', None)
+    if sqlstate in DEADLOCK_SQLSTATES:
+        return True
+    if error.args and error.args[0] in DEADLOCK_ERROR_CODES:
+        return True
+    message = str(error).lower()
+    return 'deadlock' in message or 'database is locked' in message
+
+
+class ConnectionPool:
+    """DB-API连接池
+
+    连接在首次需要时创建，最多size个；连接用尽时等待其他线程归还。
+    """
+
+    def __init__(self, connection_factory, size=DEFAULT_POOL_SIZE, on_connect=None, on_close=None):
+        """初始化连接池
+
+        Args:
+            connection_factory (callable): 无参数、返回DB-API 2.0连接的函数
+            size (int, optional): 最大连接数，默认为4
+            on_connect (callable, optional): 连接创建后调用，参数为连接
+            on_close (callable, optional): 连接关闭前调用，参数为连接
+        """
+        self.size = int(size)
+        if self.size < 1:
+            raise ValueError(f"连接池大小必须为正整数: {size}")
+        self._factory = connection_factory
+        self._on_connect = on_connect
+        self._on_close = on_close
+        self._idle = queue.LifoQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """借出一个连接，使用完毕后归还
+
+        Yields:
+            连接对象
+        """
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def _acquire(self):
+        """取出空闲连接，没有空闲连接且未达到上限时创建新连接"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = len(self._connections) < self.size
+            if create:
+                # 先占位，保证并发创建时不超过上限
+                self._connections.append(None)
+        if not create:
+            return self._idle.get()
+
+        try:
+            connection = self._factory()
+            if self._on_connect is not None:
+                self._on_connect(connection)
+        except Exception:
+            with self._lock:
+                self._connections.remove(None)
+            raise
+        with self._lock:
+            self._connections[self._connections.index(None)] = connection
+        return connection
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            connections = [c for c in self._connections if c is not None]
+            self._connections = []
+        self._idle = queue.LifoQueue()
+        for connection in connections:
+            try:
+                if self._on_close is not None:
+                    self._on_close(connection)
+            finally:
+                connection.close()
+
+
+class DBAPILoader:
+    """基于DB-API 2.0的批量导入器
+
+    每个工作表在连接池中的一个连接上建表，并按固定行数分批调用executemany写入；
+    多个工作表在不同的连接上并发导入。事务按commit_rows提交，遇到死锁时回滚并重放整个事务。
+    """
+
+    def __init__(self, connection_factory, paramstyle='qmark', pool_size=DEFAULT_POOL_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 commit_rows=DEFAULT_COMMIT_ROWS, max_retries=DEFAULT_MAX_RETRIES, retry_delay=DEFAULT_RETRY_DELAY,
+                 is_retryable=is_deadlock):
+        """初始化导入器
+
+        Args:
+            connection_factory (callable): 无参数、返回DB-API 2.0连接的函数，连接需要能在创建它的线程之外使用
+            paramstyle (str, optional): 驱动的参数风格，即驱动模块的paramstyle属性，默认为'qmark'
+            pool_size (int, optional): 连接池大小，也是同时导入的工作表数，默认为4
+            batch_size (int, optional): 每次executemany绑定的行数，默认为1000
+            commit_rows (int, optional): 每个事务最多写入的行数，默认为100000；为None时每个工作表一个事务
+            max_retries (int, optional): 事务遇到死锁时的最多重试次数，默认为3
+            retry_delay (float, optional): 首次重试前等待的秒数，之后按重试次数线性增加，默认为0.1
+            is_retryable (callable, optional): 判断异常是否可以重试的函数，默认为is_deadlock
+        """
+        self.connection_factory = connection_factory
+        self.paramstyle = paramstyle
+        self.pool_size = int(pool_size)
+        self.batch_size = int(batch_size)
+        if self.batch_size < 1:
+            raise ValueError(f"每批的行数必须为正整数: {batch_size}")
+        self.commit_rows = None if commit_rows is None else int(commit_rows)
+        if self.commit_rows is not None and self.commit_rows < 1:
+            raise ValueError(f"每个事务的行数必须为正整数: {commit_rows}")
+        self.max_retries = int(max_retries)
+        self.retry_delay = retry_delay
+        self.is_retryable = is_retryable
+
+    def load(self, generator, table_name, sheet_data):
+        """建表并导入一个工作表
+
+        Args:
+            generator (SQLGenerator): 与目标数据库方言一致的SQL生成器，用于生成建表语句和插入语句
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers、types和data
+
+        Returns:
+            int: 导入的行数
+        """
+        return self.load_sheets(generator, [(table_name, sheet_data)])[0]
+
+    def load_sheets(self, generator, sheets):
+        """建表并并发导入多个工作表
+
+        Args:
+            generator (SQLGenerator): 与目标数据库方言一致的SQL生成器
+            sheets (iterable): (表名, 工作表数据)元组
+
+        Returns:
+            list: 每个工作表导入的行数，顺序与sheets一致
+        """
+        pool = self._create_pool()
+        try:
+            if pool.size == 1:
+                return [self._load_sheet(pool, generator, table_name, sheet_data) for table_name, sheet_data in sheets]
+
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                futures = [
+                    executor.submit(self._load_sheet, pool, generator, table_name, sheet_data)
+                    for table_name, sheet_data in sheets
+                ]
+                return [future.result() for future in futures]
+        finally:
+            pool.close()
+
+    def _create_pool(self):
+        """创建本次导入使用的连接池"""
+        return ConnectionPool(self.connection_factory, size=self.pool_size)
+
+    def _load_sheet(self, pool, generator, table_name, sheet_data):
+        """在连接池的一个连接上建表并导入工作表
+
+        Args:
+            pool (ConnectionPool): 连接池
+            generator (SQLGenerator): SQL生成器
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据
+
+        Returns:
+            int: 导入的行数
+        """
+        create_sql = generator.generate_create_table(table_name, sheet_data)
+        insert_sql = generator.generate_parameterized_insert(table_name, sheet_data, paramstyle=self.paramstyle)
+
+        with pool.connection() as connection:
+            self._execute(connection, [(create_sql, None)], commit=True)
+
+            total_rows = 0
+            # 当前事务中已执行的语句，出错时整体重放
+            pending = []
+            pending_rows = 0
+            for batch in self._iter_batches(generator.iter_parameter_rows(sheet_data)):
+                pending.append((insert_sql, batch))
+                self._execute(connection, pending, start=len(pending) - 1)
+                total_rows += len(batch)
+                pending_rows += len(batch)
+                if self.commit_rows is not None and pending_rows >= self.commit_rows:
+                    self._execute(connection, pending, start=len(pending), commit=True)
+                    pending = []
+                    pending_rows = 0
+            self._execute(connection, pending, start=len(pending), commit=True)
+        return total_rows
+
+    def _iter_batches(self, chunks):
+        """将参数块重新切分为batch_size行一批
+
+        Args:
+            chunks (iterable): 参数元组列表
+
+        Yields:
+            list: 一批参数元组
+        """
+        buffer = []
+        for rows in chunks:
+            buffer.extend(rows)
+            while len(buffer) >= self.batch_size:
+                yield buffer[:self.batch_size]
+                buffer = buffer[self.batch_size:]
+        if buffer:
+            yield buffer
+
+    def _execute(self, connection, statements, start=0, commit=False):
+        """执行当前事务中尚未执行的语句
+
+        出现可重试的错误时回滚，等待后从头重放statements中的全部语句。
+
+        Args:
+            connection: 数据库连接
+            statements (list): 当前事务的(语句, 参数批)列表，参数批为None时直接执行语句
+            start (int, optional): 从第几条语句开始执行，之前的语句已经执行过
+            commit (bool, optional): 执行完毕后是否提交事务
+        """
+        attempt = 0
+        while True:
+            try:
+                cursor = connection.cursor()
+                try:
+                    for sql, rows in statements[start:]:
+                        if rows is None:
+                            cursor.execute(sql)
+                        else:
+                            cursor.executemany(sql, rows)
+                finally:
+                    cursor.close()
+                if commit:
+                    connection.commit()
+                return
+            except Exception as error:
+                connection.rollback()
+                attempt += 1
+                if attempt > self.max_retries or not self.is_retryable(error):
+                    raise
+                time.sleep(self.retry_delay * attempt)
+                start = 0
+
+
+class SQLiteLoader(DBAPILoader):
+    """SQLite导入器
+
+    SQLite同一时间只允许一个写入者，因此只使用一个连接，工作表依次导入。
+    导入期间开启WAL日志并关闭同步写盘，导入结束后恢复原来的日志模式和同步设置。
+    """
+
+    def __init__(self, database, commit_rows=DEFAULT_COMMIT_ROWS, batch_size=DEFAULT_BATCH_SIZE,
+                 max_retries=DEFAULT_MAX_RETRIES, retry_delay=DEFAULT_RETRY_DELAY):
+        """初始化SQLite导入器
+
+        Args:
+            database (str): 数据库文件路径，或sqlite:///开头的数据库地址
+            commit_rows (int, optional): 每个事务最多写入的行数，默认为100000
+            batch_size (int, optional): 每次executemany绑定的行数，默认为1000
+            max_retries (int, optional): 数据库被锁定时的最多重试次数，默认为3
+            retry_delay (float, optional): 首次重试前等待的秒数，默认为0.1
+        """
+        if '://' in str(database):
+            database = parse_sqlite_url(str(database))
+        self.database = database if database == ':memory:' else str(Path(database))
+        super().__init__(
+            self._connect,
+            paramstyle=sqlite3.paramstyle,
+            pool_size=1,
+            batch_size=batch_size,
+            commit_rows=commit_rows,
+            max_retries=max_retries,
+            retry_delay=retry_delay
+        )
+
+    def load_sheets(self, generator, sheets):
+        """建表并依次导入多个工作表
+
+        sheets可以是按需解析工作表的生成器，每个工作表导入完成后才解析下一个。
+
+        Args:
+            generator (SQLGenerator): sqlite方言的SQL生成器
+            sheets (iterable): (表名, 工作表数据)元组
+
+        Returns:
+            list: 每个工作表导入的行数
+        """
+        if generator.dialect != 'sqlite':
+            raise ValueError(f"SQLite导入需要sqlite方言的SQL生成器: {generator.dialect}")
+        return super().load_sheets(generator, sheets)
+
+    def _connect(self):
+        """打开数据库连接"""
+        return sqlite3.connect(self.database, check_same_thread=False)
+
+    def _create_pool(self):
+        """创建连接池，连接打开后调整写入参数，关闭前恢复"""
+        return ConnectionPool(self.connection_factory, size=1, on_connect=self._begin_load, on_close=self._end_load)
+
+    def _begin_load(self, connection):
+        """开启WAL日志并关闭同步写盘，记录原来的设置"""
+        self._journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self._synchronous = connection.execute("PRAGMA synchronous").fetchone()[0]
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+
+    def _end_load(self, connection):
+        """恢复日志模式和同步写盘设置，离开WAL模式时会合并并删除-wal、-shm文件"""
+        connection.execute(f"PRAGMA journal_mode={self._journal_mode}")
+        connection.execute(f"PRAGMA synchronous={int(self._synchronous)}")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+转换流水线模块
+
+将Excel解析和SQL生成串联起来，支持流式输出和多进程并行转换。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .excel_parser import ExcelParser
+    from .sql_generator import SQLGenerator
+    from .profiling import Profiler
+except ImportError:
+    # 直接运行core/chat_excel.py时，core目录位于sys.path中
+    from excel_parser import ExcelParser
+    from sql_generator import SQLGenerator
+    from profiling import Profiler
+
+
+def convert_workbook(excel_file, dialect='mysql', sheet_names=None, table_prefix=None, header_row=0, data_start_row=1,
+                     valid_column_start=0, valid_column_end=None, inference='full', jobs=1,
+                     rows_per_insert=None, max_insert_bytes=None, output_format='insert', data_dir=None, upsert=False,
+                     key_columns=None, sheet_cache=None, profiler=None):
+    """将工作簿转换为SQL语句
+
+    jobs大于1时，每个工作表的解析、建表语句和数据语句生成在独立的进程中完成，
+    输出顺序与工作表顺序一致。文件内容或文件对象无法在进程间共享，始终在当前进程中转换。
+
+    Args:
+        excel_file (str): Excel文件路径，也可以是文件内容或二进制文件对象，见ExcelParser
+        dialect (str, optional): SQL方言，默认为'mysql'
+        sheet_names (list, optional): 要处理的工作表名称，默认为None（表示所有工作表）
+        table_prefix (str, optional): 表名前缀
+        header_row (int, optional): 表头所在行索引，默认为0（第一行）
+        data_start_row (int, optional): 数据开始行索引，默认为1（第二行）
+        valid_column_start (int, optional): 有效列起始索引，默认为0（第一列）
+        valid_column_end (int, optional): 有效列结束索引，默认为None（表示所有列）
+        inference (str, optional): 类型推断策略，默认为'full'
+        jobs (int, optional): 并行进程数，默认为1；为None或0时使用全部CPU核心
+        rows_per_insert (int, optional): 每条INSERT语句最多包含的行数，见SQLGenerator
+        max_insert_bytes (int, optional): 每条INSERT语句最多占用的字节数，见SQLGenerator
+        output_format (str, optional): 数据输出格式，'insert'（默认）、'copy'或'load'，见SQLGenerator
+        data_dir (str, optional): 'load'格式下数据文件的输出目录
+        upsert (bool, optional): 是否生成upsert，见SQLGenerator
+        key_columns (list, optional): upsert的键列名，默认自动检测
+        sheet_cache (SheetCache, optional): 解析结果的磁盘缓存，见ExcelParser
+        profiler (Profiler, optional): 性能统计，多进程转换时汇总各工作进程的统计
+
+    Returns:
+        list: 依次为每个工作表的建表语句和数据语句
+    """
+    jobs = jobs or os.cpu_count() or 1
+    parse_options = {
+        'header_row': header_row,
+        'data_start_row': data_start_row,
+        'valid_column_start': valid_column_start,
+        'valid_column_end': valid_column_end
+    }
+    generator_options = {
+        'dialect': dialect,
+        'table_prefix': table_prefix,
+        'rows_per_insert': rows_per_insert,
+        'max_insert_bytes': max_insert_bytes,
+        'output_format': output_format,
+        'data_dir': data_dir,
+        'upsert': upsert,
+        'key_columns': key_columns
+    }
+
+    parser = ExcelParser(excel_file, inference=inference, profiler=profiler, sheet_cache=sheet_cache)
+    sheet_names = parser.get_sheet_names() if sheet_names is None else list(sheet_names)
+
+    if jobs == 1 or len(sheet_names) < 2 or parser.excel_file is None:
+        generator = SQLGenerator(profiler=profiler, **generator_options)
+        sheets_data = parser.parse_all_sheets(sheet_names=sheet_names, **parse_options)
+
+        sql_statements = []
+        for sheet_name, data in sheets_data.items():
+            table_name = f"{table_prefix or ''}{sheet_name}"
+            sql_statements.append(generator.generate_create_table(table_name, data))
+            sql_statements.append(generator.generate_data(table_name, data))
+        return sql_statements
+
+    # 工作进程各自统计，结束后汇总到profiler
+    trace_memory = None if profiler is None else profiler.trace_memory
+    tasks = [
+        (str(excel_file), sheet_name, inference, parse_options, generator_options, trace_memory, sheet_cache)
+        for sheet_name in sheet_names
+    ]
+    sql_statements = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        # map按提交顺序返回结果，保证输出顺序稳定
+        for create_table, insert_data, report in executor.map(_convert_sheet, tasks):
+            sql_statements.append(create_table)
+            sql_statements.append(insert_data)
+            if report is not None:
+                profiler.merge(report)
+    return sql_statements
+
+
+def profile_workbook(excel_file, trace_memory=False, **options):
+    """转换工作簿并统计各阶段的性能
+
+    返回值只包含可以pickle的数据，可以在工作进程中执行。
+
+    Args:
+        excel_file (str): Excel文件路径，也可以是文件内容或二进制文件对象，见ExcelParser
+        trace_memory (bool, optional): 是否记录峰值内存，默认为False
+        **options: 传给convert_workbook的参数
+
+    Returns:
+        tuple: (SQL语句列表, Profiler.report的结果)
+    """
+    profiler = Profiler(trace_memory=trace_memory)
+    try:
+        return convert_workbook(excel_file, profiler=profiler, **options), profiler.report()
+    finally:
+        profiler.close()
+
+
+def _convert_sheet(task):
+    """在工作进程中转换单个工作表
+
+    Args:
+        task (tuple): (文件路径, 工作表名称, 类型推断策略, 解析参数, SQL生成器参数, 是否记录峰值内存, 工作表缓存)，
+            是否记录峰值内存为None时不统计性能
+
+    Returns:
+        tuple: (建表语句, 数据语句, Profiler.report的结果或None)
+    """
+    excel_file, sheet_name, inference, parse_options, generator_options, trace_memory, sheet_cache = task
+    profiler = None if trace_memory is None else Profiler(trace_memory=trace_memory)
+    parser = ExcelParser(excel_file, inference=inference, profiler=profiler, sheet_cache=sheet_cache)
+    generator = SQLGenerator(profiler=profiler, **generator_options)
+
+    try:
+        data = parser.parse_sheet(sheet_name, **parse_options)
+        table_name = f"{generator_options['table_prefix'] or ''}{sheet_name}"
+        create_table, insert_data = generator.generate_create_table(table_name, data), generator.generate_data(table_name, data)
+    finally:
+        if profiler is not None:
+            profiler.close()
+    return create_table, insert_data, None if profiler is None else profiler.report()
+
+
+def iter_workbook_sql(parser, generator, sheet_names, table_prefix=None, header_row=0, data_start_row=1,
+                      valid_column_start=0, valid_column_end=None, batch_size=10000, progress=None):
+    """逐段产出工作簿的SQL文本
+
+    每个工作表按第一批数据推断列类型并立即输出建表语句，再按批读取数据并逐段输出数据语句，
+    工作表只读取一遍，内存占用只与批大小有关。后续批次放宽列类型时在数据语句之间插入修改列类型的语句，
+    没有放宽时所有片段依次拼接后与非流式模式的输出一致。
+
+    Args:
+        parser (ExcelParser): Excel解析器
+        generator (SQLGenerator): SQL生成器
+        sheet_names (list): 要处理的工作表名称
+        table_prefix (str, optional): 表名前缀
+        header_row (int, optional): 表头所在行索引，默认为0（第一行）
+        data_start_row (int, optional): 数据开始行索引，默认为1（第二行）
+        valid_column_start (int, optional): 有效列起始索引，默认为0（第一列）
+        valid_column_end (int, optional): 有效列结束索引，默认为None（表示所有列）
+        batch_size (int, optional): 每批读取的行数，默认为10000
+        progress (callable, optional): 进度回调，每产出一条数据语句和每完成一个工作表时调用，
+            参数为(已完成的工作表数, 已输出的数据行数)
+
+    Yields:
+        str: SQL文本片段
+    """
+    rows_emitted = 0
+
+    def count_rows(records):
+        nonlocal rows_emitted
+        for record in records:
+            rows_emitted += 1
+            yield record
+
+    for sheet_idx, sheet_name in enumerate(sheet_names):
+        sheet_data = parser.stream_sheet(
+            sheet_name,
+            header_row=header_row,
+            data_start_row=data_start_row,
+            valid_column_start=valid_column_start,
+            valid_column_end=valid_column_end,
+            batch_size=batch_size
+        )
+        table_name = f"{table_prefix or ''}{sheet_name}"
+        if progress is not None:
+            sheet_data['data'] = count_rows(sheet_data['data'])
+
+        if sheet_idx:
+            yield "\n\n"
+        yield generator.generate_create_table(table_name, sheet_data)
+        yield "\n\n"
+
+        for statement_idx, statement in enumerate(generator.iter_data(table_name, sheet_data)):
+            yield f"\n{statement}" if statement_idx else statement
+            if progress is not None:
+                progress(sheet_idx, rows_emitted)
+
+        if progress is not None:
+            progress(sheet_idx + 1, rows_emitted)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能分析模块
+
+按阶段统计转换的耗时、行数、字节数和峰值内存，用于定位慢转换的瓶颈。
+"""
+
+import cProfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class Profiler:
+    """分阶段的性能统计
+
+    ExcelParser记录open、read、infer_types、null_values阶段，SQLGenerator记录format阶段和输出SQL的output计数。
+    每个阶段累计耗时、调用次数、行数和字节数；trace_memory为True时使用tracemalloc记录各阶段执行期间新增内存的峰值。
+    阶段之间不应嵌套。
+    """
+
+    def __init__(self, trace_memory=False, cprofile_stage=None):
+        """初始化性能统计
+
+        Args:
+            trace_memory (bool, optional): 是否记录峰值内存，默认为False；开启后转换会明显变慢
+            cprofile_stage (str, optional): 使用cProfile分析的阶段名称，结果通过dump_cprofile保存
+        """
+        self.trace_memory = trace_memory
+        self.cprofile_stage = cprofile_stage
+        self._cprofile = cProfile.Profile() if cprofile_stage else None
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self._owns_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    @contextmanager
+    def stage(self, name, rows=0, bytes=0):
+        """统计一个阶段的一次执行
+
+        Args:
+            name (str): 阶段名称
+            rows (int, optional): 处理的行数
+            bytes (int, optional): 处理的字节数
+        """
+        start_memory = 0
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        profile = self._cprofile if name == self.cprofile_stage else None
+        if profile is not None:
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            peak_memory = tracemalloc.get_traced_memory()[1] - start_memory if self.trace_memory else None
+            self._record(name, elapsed, 1, rows, bytes, peak_memory)
+
+    def count(self, name, rows=0, bytes=0):
+        """只累计行数和字节数，不计时
+
+        Args:
+            name (str): 阶段名称
+            rows (int, optional): 行数
+            bytes (int, optional): 字节数
+        """
+        self._record(name, 0.0, 0, rows, bytes, None)
+
+    def iter_stage(self, name, iterable):
+        """迭代时统计每次取下一个元素的耗时，消费元素的时间不计入该阶段
+
+        Args:
+            name (str): 阶段名称
+            iterable (iterable): 被统计的可迭代对象
+
+        Yields:
+            iterable中的元素
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def merge(self, report):
+        """合并另一个Profiler的report结果，用于汇总工作进程中的统计
+
+        Args:
+            report (dict): Profiler.report的返回值
+        """
+        for name, stats in report['stages'].items():
+            self._record(name, stats['seconds'], stats['calls'], stats['rows'], stats['bytes'], stats.get('peak_memory'))
+
+    def report(self):
+        """返回统计结果
+
+        Returns:
+            dict: total_seconds为创建以来经过的秒数，stages按首次出现的顺序列出每个阶段的
+                seconds、calls、rows、bytes，记录内存时另有peak_memory（字节）
+        """
+        with self._lock:
+            stages = {name: dict(stats) for name, stats in self._stages.items()}
+        return {
+            'total_seconds': time.perf_counter() - self._started_at,
+            'stages': stages
+        }
+
+    def format_report(self):
+        """格式化统计结果，用于命令行输出
+
+        Returns:
+            str: 每个阶段一行的表格
+        """
+        report = self.report()
+        total = report['total_seconds']
+        lines = [f"{'阶段':<12}{'耗时(ms)':>12}{'占比':>8}{'次数':>8}{'行数':>12}{'字节数':>14}{'峰值内存(MB)':>14}"]
+        for name, stats in report['stages'].items():
+            peak_memory = stats.get('peak_memory')
+            lines.append(
+                f"{name:<12}{stats['seconds'] * 1000:>12.1f}{stats['seconds'] / total if total else 0:>8.1%}"
+                f"{stats['calls']:>8}{stats['rows']:>12}{stats['bytes']:>14}"
+                f"{'' if peak_memory is None else f'{peak_memory / 1024 / 1024:.1f}':>14}"
+            )
+        # 多进程转换时各阶段的耗时是所有进程之和，可能超过总耗时
+        other = total - sum(stats['seconds'] for stats in report['stages'].values())
+        if other >= 0:
+            lines.append(f"{'其他':<12}{other * 1000:>12.1f}{other / total if total else 0:>8.1%}")
+        lines.append(f"{'合计':<12}{total * 1000:>12.1f}")
+        return "\n".join(lines)
+
+    def dump_cprofile(self, path):
+        """保存cProfile的分析结果，可以用pstats或snakeviz查看
+
+        Args:
+            path (str): 输出文件路径
+        """
+        if self._cprofile is None:
+            raise ValueError("没有指定使用cProfile分析的阶段")
+        self._cprofile.dump_stats(path)
+
+    def close(self):
+        """停止由本对象开启的tracemalloc"""
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _record(self, name, seconds, calls, rows, bytes, peak_memory):
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = {'seconds': 0.0, 'calls': 0, 'rows': 0, 'bytes': 0}
+            stats['seconds'] += seconds
+            stats['calls'] += calls
+            stats['rows'] += rows
+            stats['bytes'] += bytes
+            if peak_memory is not None:
+                stats['peak_memory'] = max(stats.get('peak_memory', 0), peak_memory)
+
+
+class NullProfiler:
+    """不做任何统计的Profiler，未开启性能分析时使用"""
+
+    def stage(self, name, rows=0, bytes=0):
+        return nullcontext()
+
+    def count(self, name, rows=0, bytes=0):
+        pass
+
+    def iter_stage(self, name, iterable):
+        return iterable
+
+
+NULL_PROFILER = NullProfiler()
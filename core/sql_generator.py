@@ -8,8 +8,46 @@ SQL生成模块
 """
 
 import re
-import pandas as pd
 from datetime import datetime
+from pathlib import Path
+from functools import partial
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .profiling import NULL_PROFILER
+except ImportError:
+    # 直接运行core/chat_excel.py时，core目录位于sys.path中
+    from profiling import NULL_PROFILER
+
+# 每条INSERT语句默认包含的行数
+DEFAULT_ROWS_PER_INSERT = 500
+
+# 各方言单条INSERT语句默认的字节上限，None表示不限制
+# SQLite默认的SQLITE_MAX_SQL_LENGTH为1000000字节
+DEFAULT_MAX_INSERT_BYTES = {
+    'mysql': None,
+    'sqlite': 1000000,
+    'postgresql': None
+}
+
+# 按列格式化时每次处理的行数
+FORMAT_CHUNK_SIZE = 10000
+
+# 数据输出格式及其支持的方言
+OUTPUT_FORMATS = {
+    'insert': ('mysql', 'sqlite', 'postgresql'),
+    'copy': ('postgresql',),
+    'load': ('mysql',)
+}
+
+# PostgreSQL COPY文本格式需要转义的字符
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# MySQL LOAD DATA（ESCAPED BY '\\'）需要转义的字符
+LOAD_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
 
 class SQLGenerator:
     """SQL生成器
@@ -17,16 +55,52 @@ class SQLGenerator:
     用于生成SQL建表语句和数据插入语句。
     """
     
-    def __init__(self, dialect='mysql', table_prefix=None):
+    def __init__(self, dialect='mysql', table_prefix=None, rows_per_insert=None, max_insert_bytes=None, output_format='insert',
+                 data_dir=None, upsert=False, key_columns=None, profiler=None):
         """初始化SQL生成器
         
         Args:
             dialect (str): SQL方言，支持'mysql', 'sqlite', 'postgresql'
             table_prefix (str, optional): 表名前缀
+            rows_per_insert (int, optional): 每条INSERT语句最多包含的行数，默认为500；为1时每行一条语句
+            max_insert_bytes (int, optional): 每条INSERT语句最多占用的字节数（UTF-8），
+                用于满足MySQL的max_allowed_packet、SQLite的SQLITE_MAX_SQL_LENGTH等限制；
+                默认SQLite为1000000，其他方言不限制。单行超过上限时单独成为一条语句
+            output_format (str, optional): 数据输出格式，'insert'（默认）为INSERT语句，
+                'copy'为PostgreSQL的COPY ... FROM STDIN数据块，
+                'load'为MySQL的LOAD DATA LOCAL INFILE语句，数据写入data_dir下每个表一个TSV文件
+            data_dir (str, optional): 'load'格式下数据文件的输出目录
+            upsert (bool, optional): 是否生成upsert：建表语句带主键，键值已存在的行更新而不是重复插入，
+                重复执行转换结果幂等。MySQL使用ON DUPLICATE KEY UPDATE（load格式使用REPLACE），
+                PostgreSQL和SQLite使用ON CONFLICT DO UPDATE；不支持copy格式
+            key_columns (list, optional): upsert的键列名，默认使用工作表数据中自动检测的键列（见ExcelParser._detect_key_columns）
+            profiler (Profiler, optional): 性能统计，记录format阶段和输出SQL的output计数，默认不统计
         """
         self.dialect = dialect.lower()
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
         self.table_prefix = table_prefix or ''
         
+        self.rows_per_insert = DEFAULT_ROWS_PER_INSERT if rows_per_insert is None else int(rows_per_insert)
+        if self.rows_per_insert < 1:
+            raise ValueError(f"每条INSERT语句的行数必须为正整数: {rows_per_insert}")
+        self.max_insert_bytes = DEFAULT_MAX_INSERT_BYTES.get(self.dialect) if max_insert_bytes is None else int(max_insert_bytes)
+        if self.max_insert_bytes is not None and self.max_insert_bytes < 1:
+            raise ValueError(f"每条INSERT语句的字节上限必须为正整数: {max_insert_bytes}")
+        
+        self.output_format = output_format.lower()
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        if self.dialect not in OUTPUT_FORMATS[self.output_format]:
+            raise ValueError(f"输出格式 {output_format} 不支持 {dialect} 方言")
+        if self.output_format == 'load' and data_dir is None:
+            raise ValueError("输出格式 load 需要指定数据文件目录")
+        self.data_dir = None if data_dir is None else Path(data_dir)
+        
+        self.upsert = bool(upsert)
+        self.key_columns = list(key_columns) if key_columns else None
+        if self.upsert and self.output_format == 'copy':
+            raise ValueError("输出格式 copy 不支持upsert")
+        
         # 不同方言的类型映射
         self.type_mappings = {
             'mysql': {
@@ -70,9 +144,11 @@ class SQLGenerator:
     def generate_create_table(self, table_name, sheet_data):
         """生成建表SQL语句
         
+        upsert时在键列上添加主键。
+        
         Args:
             table_name (str): 表名
-            sheet_data (dict): 工作表数据，包含headers和types
+            sheet_data (dict): 工作表数据，包含headers和types，upsert时可以包含key_columns
             
         Returns:
             str: 建表SQL语句
@@ -80,16 +156,7 @@ class SQLGenerator:
         headers = sheet_data['headers']
         types = sheet_data['types']
         
-        # 使用原始工作表名作为表名
-        safe_table_name = table_name
-        # 清理表名，使其符合SQL规范
-        safe_table_name = self._sanitize_identifier(safe_table_name)
-        
-        # 确保表前缀不会覆盖原始表名
-        if self.table_prefix:
-            prefixed_table_name = f"{self.table_prefix}_{safe_table_name}"
-        else:
-            prefixed_table_name = safe_table_name
+        prefixed_table_name = self._prefixed_table_name(table_name)
         
         # 生成列定义
         columns = []
@@ -98,6 +165,15 @@ class SQLGenerator:
             # 直接使用原始列名，不进行额外处理
             columns.append(f"    {self._quote_identifier(header)} {sql_type}")
         
+        # upsert依赖键列上的主键判断冲突
+        key_columns = self._upsert_key_columns(table_name, sheet_data)
+        if key_columns:
+            if self.dialect == 'mysql':
+                text_keys = [column for column in key_columns if self._map_type(types[column]) == 'TEXT']
+                if text_keys:
+                    raise ValueError(f"MySQL中TEXT类型的列不能作为主键: {', '.join(text_keys)}")
+            columns.append(f"    PRIMARY KEY ({', '.join(self._quote_identifier(column) for column in key_columns)})")
+        
         # 生成建表语句
         if self.dialect == 'mysql':
             create_sql = f"CREATE TABLE IF NOT EXISTS {self._quote_identifier(prefixed_table_name)} (\n"
@@ -114,6 +190,141 @@ class SQLGenerator:
         
         return create_sql
     
+    def generate_data(self, table_name, sheet_data):
+        """按输出格式生成数据部分的SQL
+        
+        Args:
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers和data
+            
+        Returns:
+            str: 数据部分的SQL
+        """
+        return "\n".join(self.iter_data(table_name, sheet_data))
+    
+    def iter_data(self, table_name, sheet_data):
+        """按输出格式逐段生成数据部分的SQL
+        
+        data为流式数据（见ExcelParser.stream_sheet）时，types可能在遍历过程中放宽，
+        此时在放宽后的数据之前插入修改列类型的语句。
+        
+        Args:
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers和data
+            
+        Returns:
+            iterator: SQL片段，依次以换行符连接
+        """
+        if self.output_format == 'copy':
+            statements = self.iter_copy_data(table_name, sheet_data)
+        elif self.output_format == 'load':
+            statements = self.iter_load_data(table_name, sheet_data)
+        else:
+            statements = self.iter_insert_data(table_name, sheet_data)
+        if self.profiler is NULL_PROFILER:
+            return statements
+        return self._count_output(statements)
+    
+    def _count_output(self, statements):
+        """统计输出的SQL片段数和UTF-8字节数"""
+        for statement in statements:
+            self.profiler.count('output', rows=1, bytes=len(statement.encode('utf-8')))
+            yield statement
+    
+    def iter_copy_data(self, table_name, sheet_data):
+        """逐段生成PostgreSQL的COPY数据块
+        
+        使用COPY文本格式：列之间以制表符分隔，空值写为\\N，反斜杠、制表符和换行符转义，
+        数据以\\.结束，可以直接用psql执行。
+        
+        Args:
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers和data
+            
+        Yields:
+            str: COPY语句、每块数据行和结束标记
+        """
+        headers = sheet_data['headers']
+        data = sheet_data['data']
+        types = sheet_data['types']
+        
+        prefixed_table_name = self._prefixed_table_name(table_name)
+        columns_str = ", ".join([self._quote_identifier(h) for h in headers])
+        
+        has_data = False
+        copying = False
+        emitted_types = dict(types)
+        for chunk in self._iter_frames(data, headers):
+            has_data = True
+            # 修改列类型前先结束当前的COPY数据块
+            alter_sqls = self._alter_widened_columns(table_name, types, emitted_types)
+            if alter_sqls and copying:
+                yield "\\."
+                copying = False
+            yield from alter_sqls
+            if not copying:
+                yield f"COPY {self._quote_identifier(prefixed_table_name)} ({columns_str}) FROM STDIN;"
+                copying = True
+            with self.profiler.stage('format', rows=len(chunk)):
+                columns = [self._format_copy_column(chunk[header], types[header]) for header in headers]
+                block = "\n".join("\t".join(row_values) for row_values in zip(*columns))
+            yield block
+        
+        if copying:
+            yield "\\."
+        if not has_data:
+            yield f"-- 没有数据需要插入到表 {prefixed_table_name}"
+    
+    def iter_load_data(self, table_name, sheet_data):
+        """将数据写入TSV文件并生成MySQL的LOAD DATA语句
+        
+        数据按列格式化后分块写入data_dir下的“表名.tsv”，使用UTF-8编码，
+        列之间以制表符分隔，空值写为\\N，反斜杠、制表符、换行符和NUL转义。
+        
+        Args:
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers和data
+            
+        Yields:
+            str: LOAD DATA LOCAL INFILE语句
+        """
+        headers = sheet_data['headers']
+        data = sheet_data['data']
+        types = sheet_data['types']
+        
+        prefixed_table_name = self._prefixed_table_name(table_name)
+        columns_str = ", ".join([self._quote_identifier(h) for h in headers])
+        data_file = (self.data_dir / f"{re.sub(r'[/:]', '_', prefixed_table_name)}.tsv").resolve()
+        
+        has_data = False
+        # 数据文件在LOAD DATA之前写完，修改列类型的语句统一在LOAD DATA之前输出
+        alter_sqls = []
+        emitted_types = dict(types)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        with open(data_file, 'w', encoding='utf-8', newline='') as f:
+            for chunk in self._iter_frames(data, headers):
+                has_data = True
+                alter_sqls.extend(self._alter_widened_columns(table_name, types, emitted_types))
+                with self.profiler.stage('format', rows=len(chunk)):
+                    columns = [self._format_copy_column(chunk[header], types[header], LOAD_ESCAPES) for header in headers]
+                    f.write("\n".join("\t".join(row_values) for row_values in zip(*columns)))
+                    f.write("\n")
+        
+        if not has_data:
+            data_file.unlink()
+            yield f"-- 没有数据需要插入到表 {prefixed_table_name}"
+            return
+        
+        yield from alter_sqls
+        escaped_path = str(data_file).replace("\\", "\\\\").replace("'", "\\'")
+        # upsert时用REPLACE替换主键冲突的行，LOCAL默认会忽略冲突的行
+        replace = "REPLACE " if self.upsert else ""
+        yield (
+            f"LOAD DATA LOCAL INFILE '{escaped_path}' {replace}INTO TABLE {self._quote_identifier(prefixed_table_name)} "
+            f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({columns_str});"
+        )
+    
     def generate_insert_data(self, table_name, sheet_data):
         """生成数据插入SQL语句
         
@@ -124,66 +335,417 @@ class SQLGenerator:
         Returns:
             str: 数据插入SQL语句
         """
+        return "\n".join(self.iter_insert_data(table_name, sheet_data))
+    
+    def iter_insert_data(self, table_name, sheet_data):
+        """逐条生成数据插入SQL语句
+        
+        data可以是列表，也可以是按需产出数据行的迭代器（见ExcelParser.stream_sheet），
+        语句在生成后立即产出，不会在内存中累积。upsert时每条语句带冲突处理子句，键值不能为空或重复。
+        
+        Args:
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers和data
+            
+        Yields:
+            str: 数据插入SQL语句
+        """
         headers = sheet_data['headers']
         data = sheet_data['data']
         types = sheet_data['types']
         
-        # 使用原始工作表名作为表名
-        safe_table_name = table_name
-        # 清理表名，使其符合SQL规范
-        safe_table_name = self._sanitize_identifier(safe_table_name)
-        
-        # 确保表前缀不会覆盖原始表名
-        if self.table_prefix:
-            prefixed_table_name = f"{self.table_prefix}_{safe_table_name}"
-        else:
-            prefixed_table_name = safe_table_name
+        prefixed_table_name = self._prefixed_table_name(table_name)
         
         # 生成列名部分
         # 直接使用原始列名，不进行额外处理
         columns_str = ", ".join([self._quote_identifier(h) for h in headers])
         
-        # 生成插入语句
-        if not data:
-            return f"-- 没有数据需要插入到表 {prefixed_table_name}"
+        insert_sql = f"INSERT INTO {self._quote_identifier(prefixed_table_name)} ({columns_str}) VALUES"
+        key_columns = self._upsert_key_columns(table_name, sheet_data)
+        upsert_sql = self._upsert_clause(headers, key_columns) if key_columns else None
+        insert_bytes = len(insert_sql.encode('utf-8')) + 2
+        if upsert_sql is not None:
+            insert_bytes += len(upsert_sql.encode('utf-8')) + 1
         
-        insert_statements = []
+        has_data = False
+        seen_keys = set()
         
-        # 根据方言生成不同的插入语句
-        if self.dialect == 'mysql':
-            insert_sql = f"INSERT INTO {self._quote_identifier(prefixed_table_name)} ({columns_str}) VALUES\n"
-            
-            values = []
-            for row in data:
-                row_values = []
-                for header in headers:
-                    value = row.get(header)
-                    sql_type = types[header]
-                    formatted_value = self._format_value(value, sql_type)
-                    row_values.append(formatted_value)
+        # 按行数和字节数分批，每批一条INSERT语句
+        batch = []
+        batch_bytes = insert_bytes
+        emitted_types = dict(types)
+        for chunk in self._iter_frames(data, headers):
+            has_data = True
+            # 修改列类型前先输出已格式化的行
+            alter_sqls = self._alter_widened_columns(table_name, types, emitted_types)
+            if alter_sqls and batch:
+                yield self._insert_statement(insert_sql, batch, upsert_sql)
+                batch = []
+                batch_bytes = insert_bytes
+            yield from alter_sqls
+            with self.profiler.stage('format', rows=len(chunk)):
+                if key_columns:
+                    self._check_keys(prefixed_table_name, chunk, key_columns, types, seen_keys)
+                formatted = self._format_frame(chunk, headers, types)
+            for row_values in formatted:
+                row_sql = f"({row_values})"
                 
-                values.append(f"({', '.join(row_values)})")
-            
-            # 分批插入，每500行一批
-            batch_size = 500
-            for i in range(0, len(values), batch_size):
-                batch = values[i:i+batch_size]
-                insert_statements.append(insert_sql + ",\n".join(batch) + ";")
-        
-        elif self.dialect in ['sqlite', 'postgresql']:
-            # SQLite和PostgreSQL每行一个INSERT语句
-            for row in data:
-                row_values = []
-                for header in headers:
-                    value = row.get(header)
-                    sql_type = types[header]
-                    formatted_value = self._format_value(value, sql_type)
-                    row_values.append(formatted_value)
+                if self.max_insert_bytes is not None:
+                    # 每行额外计入分隔符",\n"
+                    row_bytes = len(row_sql.encode('utf-8')) + 2
+                    if batch and batch_bytes + row_bytes > self.max_insert_bytes:
+                        yield self._insert_statement(insert_sql, batch, upsert_sql)
+                        batch = []
+                        batch_bytes = insert_bytes
+                    batch_bytes += row_bytes
                 
-                values_str = ", ".join(row_values)
-                insert_statements.append(f"INSERT INTO {self._quote_identifier(prefixed_table_name)} ({columns_str}) VALUES ({values_str});")
+                batch.append(row_sql)
+                if len(batch) >= self.rows_per_insert:
+                    yield self._insert_statement(insert_sql, batch, upsert_sql)
+                    batch = []
+                    batch_bytes = insert_bytes
+        
+        if batch:
+            yield self._insert_statement(insert_sql, batch, upsert_sql)
+        
+        if not has_data:
+            yield f"-- 没有数据需要插入到表 {prefixed_table_name}"
+    
+    def _alter_widened_columns(self, table_name, types, emitted_types):
+        """为流式数据中放宽的列生成修改列类型的语句
+        
+        Args:
+            table_name (str): 表名
+            types (dict): 当前的列类型映射
+            emitted_types (dict): 已输出的SQL所使用的列类型映射，生成语句后更新为当前类型
+            
+        Returns:
+            list: 修改列类型的SQL语句，没有放宽的列时为空列表
+        """
+        if types == emitted_types:
+            return []
+        
+        alter_sqls = []
+        for column, excel_type in types.items():
+            if emitted_types[column] == excel_type:
+                continue
+            if self._map_type(emitted_types[column]) != self._map_type(excel_type):
+                alter_sqls.append(self.generate_alter_column_type(table_name, column, excel_type))
+            emitted_types[column] = excel_type
+        return alter_sqls
+    
+    def _insert_statement(self, insert_sql, rows, upsert_sql=None):
+        """拼接一条INSERT语句
+        
+        Args:
+            insert_sql (str): 到VALUES为止的语句前缀
+            rows (list): 已格式化的值列表，如"(1, 'a')"
+            upsert_sql (str, optional): upsert的冲突处理子句
+            
+        Returns:
+            str: INSERT语句
+        """
+        if self.rows_per_insert == 1:
+            suffix = f" {upsert_sql}" if upsert_sql else ""
+            return f"{insert_sql} {rows[0]}{suffix};"
+        suffix = f"\n{upsert_sql}" if upsert_sql else ""
+        return insert_sql + "\n" + ",\n".join(rows) + suffix + ";"
+    
+    def _upsert_key_columns(self, table_name, sheet_data):
+        """返回upsert使用的键列，未开启upsert时返回空列表
+        
+        Args:
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers，可以包含自动检测的key_columns
+            
+        Returns:
+            list: 键列名
+        """
+        if not self.upsert:
+            return []
+        key_columns = self.key_columns or sheet_data.get('key_columns')
+        if not key_columns and 'key_columns' not in sheet_data:
+            raise ValueError(f"表 {table_name} 在流式模式下不会自动检测键列，请指定upsert的键列")
+        if not key_columns:
+            raise ValueError(f"表 {table_name} 没有非空且不重复的列可以作为upsert的键，请指定键列")
+        missing = [column for column in key_columns if column not in sheet_data['headers']]
+        if missing:
+            raise ValueError(f"表 {table_name} 中找不到键列: {', '.join(missing)}")
+        return list(key_columns)
+    
+    def _upsert_clause(self, headers, key_columns):
+        """生成INSERT语句的冲突处理子句，键值已存在时用新值更新其余列
+        
+        Args:
+            headers (list): 列名列表
+            key_columns (list): 键列名
+            
+        Returns:
+            str: MySQL为ON DUPLICATE KEY UPDATE子句，PostgreSQL和SQLite为ON CONFLICT子句
+        """
+        update_columns = [self._quote_identifier(h) for h in headers if h not in key_columns]
+        if self.dialect == 'mysql':
+            # 所有列都是键列时没有需要更新的列，用键列赋值自身忽略冲突
+            update_columns = update_columns or [self._quote_identifier(key_columns[0])]
+            return "ON DUPLICATE KEY UPDATE " + ", ".join(f"{column} = VALUES({column})" for column in update_columns)
+        
+        conflict = f"ON CONFLICT ({', '.join(self._quote_identifier(column) for column in key_columns)})"
+        if not update_columns:
+            return f"{conflict} DO NOTHING"
+        return f"{conflict} DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+    
+    def _check_keys(self, table_name, frame, key_columns, types, seen_keys):
+        """检查一块数据的键值非空且与之前的数据不重复
+        
+        同一条语句中重复的键在PostgreSQL中会报错，在其他方言中只保留最后一行，统一视为错误。
+        
+        Args:
+            table_name (str): 表名
+            frame (DataFrame): 一块数据
+            key_columns (list): 键列名
+            types (dict): 列类型映射
+            seen_keys (set): 之前各块的键值，检查后加入本块的键值
+        """
+        key_values = []
+        for column in key_columns:
+            values = self._format_column(frame[column], types[column])
+            if 'NULL' in values:
+                raise ValueError(f"表 {table_name} 的键列 {column} 有空值")
+            key_values.append(values)
+        keys = key_values[0] if len(key_values) == 1 else list(zip(*key_values))
+        
+        # 集合大小的增量小于行数时说明有重复的键
+        size = len(seen_keys)
+        seen_keys.update(keys)
+        if len(seen_keys) - size != len(keys):
+            raise ValueError(f"表 {table_name} 的键列 {', '.join(key_columns)} 有重复值")
+    
+    def generate_add_column(self, table_name, column, excel_type):
+        """生成新增列的SQL语句
+        
+        Args:
+            table_name (str): 表名
+            column (str): 列名
+            excel_type (str): Excel解析的类型
+            
+        Returns:
+            str: ALTER TABLE ... ADD COLUMN语句
+        """
+        prefixed_table_name = self._prefixed_table_name(table_name)
+        return (
+            f"ALTER TABLE {self._quote_identifier(prefixed_table_name)} "
+            f"ADD COLUMN {self._quote_identifier(column)} {self._map_type(excel_type)};"
+        )
+    
+    def generate_alter_column_type(self, table_name, column, excel_type):
+        """生成修改列类型的SQL语句
+        
+        SQLite不支持修改列类型，但按值存储类型，原类型的列仍可写入新数据，此时返回注释。
+        
+        Args:
+            table_name (str): 表名
+            column (str): 列名
+            excel_type (str): 新的Excel解析的类型
+            
+        Returns:
+            str: ALTER TABLE语句或注释
+        """
+        quoted_table = self._quote_identifier(self._prefixed_table_name(table_name))
+        quoted_column = self._quote_identifier(column)
+        sql_type = self._map_type(excel_type)
+        if self.dialect == 'mysql':
+            return f"ALTER TABLE {quoted_table} MODIFY COLUMN {quoted_column} {sql_type};"
+        if self.dialect == 'postgresql':
+            return f"ALTER TABLE {quoted_table} ALTER COLUMN {quoted_column} TYPE {sql_type} USING {quoted_column}::{sql_type};"
+        return f"-- SQLite不支持修改列类型，列 {quoted_column} 保留原类型（新类型为 {sql_type}）"
+    
+    def generate_update(self, table_name, assignments, conditions):
+        """生成更新一行数据的SQL语句
         
-        return "\n".join(insert_statements)
+        Args:
+            table_name (str): 表名
+            assignments (list): (列名, 已格式化的值)元组，为SET部分
+            conditions (list): (列名, 已格式化的值)元组，为WHERE部分，按相等条件以AND连接
+            
+        Returns:
+            str: UPDATE语句
+        """
+        prefixed_table_name = self._prefixed_table_name(table_name)
+        set_str = ", ".join(f"{self._quote_identifier(column)} = {value}" for column, value in assignments)
+        where_str = " AND ".join(f"{self._quote_identifier(column)} = {value}" for column, value in conditions)
+        return f"UPDATE {self._quote_identifier(prefixed_table_name)} SET {set_str} WHERE {where_str};"
+    
+    def iter_delete(self, table_name, key_columns, key_rows):
+        """按键值批量生成删除数据的SQL语句
+        
+        每条语句最多包含rows_per_insert行，多个键列使用行值比较，如 WHERE (a, b) IN ((1, 2), (3, 4))。
+        
+        Args:
+            table_name (str): 表名
+            key_columns (list): 键列名
+            key_rows (list): 每行键列的已格式化的值元组
+            
+        Yields:
+            str: DELETE语句
+        """
+        prefixed_table_name = self._prefixed_table_name(table_name)
+        delete_sql = f"DELETE FROM {self._quote_identifier(prefixed_table_name)} WHERE "
+        if len(key_columns) == 1:
+            delete_sql += f"{self._quote_identifier(key_columns[0])} IN "
+        else:
+            delete_sql += f"({', '.join(self._quote_identifier(column) for column in key_columns)}) IN "
+        
+        for start in range(0, len(key_rows), self.rows_per_insert):
+            batch = key_rows[start:start + self.rows_per_insert]
+            if len(key_columns) == 1:
+                values = ", ".join(row[0] for row in batch)
+            else:
+                values = ", ".join(f"({', '.join(row)})" for row in batch)
+            yield f"{delete_sql}({values});"
+    
+    def generate_delete_all(self, table_name):
+        """生成删除表中所有数据的SQL语句
+        
+        Args:
+            table_name (str): 表名
+            
+        Returns:
+            str: DELETE语句
+        """
+        return f"DELETE FROM {self._quote_identifier(self._prefixed_table_name(table_name))};"
+    
+    def generate_parameterized_insert(self, table_name, sheet_data, paramstyle='qmark'):
+        """生成参数化的单行INSERT语句，供数据库驱动的executemany使用
+        
+        Args:
+            table_name (str): 表名
+            sheet_data (dict): 工作表数据，包含headers
+            paramstyle (str, optional): DB-API的参数风格，支持'qmark'（默认）、'numeric'、'format'和'pyformat'，
+                参数均按位置绑定
+            
+        Returns:
+            str: 参数化INSERT语句，upsert时带冲突处理子句
+        """
+        headers = sheet_data['headers']
+        prefixed_table_name = self._prefixed_table_name(table_name)
+        
+        if paramstyle == 'qmark':
+            placeholders = ["?"] * len(headers)
+        elif paramstyle == 'numeric':
+            placeholders = [f":{i}" for i in range(1, len(headers) + 1)]
+        elif paramstyle in ('format', 'pyformat'):
+            placeholders = ["%s"] * len(headers)
+        else:
+            raise ValueError(f"不支持的参数风格: {paramstyle}")
+        
+        columns_str = ", ".join([self._quote_identifier(h) for h in headers])
+        placeholders = ", ".join(placeholders)
+        insert_sql = f"INSERT INTO {self._quote_identifier(prefixed_table_name)} ({columns_str}) VALUES ({placeholders})"
+        key_columns = self._upsert_key_columns(table_name, sheet_data)
+        if key_columns:
+            insert_sql += " " + self._upsert_clause(headers, key_columns)
+        return insert_sql
+    
+    def iter_parameter_rows(self, sheet_data):
+        """逐块产出绑定参数
+        
+        值按列转换为Python原生类型（int、float、str、None），不经过SQL字面量格式化，
+        与generate_parameterized_insert配合直接写入数据库。
+        
+        Args:
+            sheet_data (dict): 工作表数据，包含headers、types和data
+            
+        Yields:
+            list: 一块数据，每行一个参数元组
+        """
+        headers = sheet_data['headers']
+        types = sheet_data['types']
+        
+        for chunk in self._iter_frames(sheet_data['data'], headers):
+            if not headers:
+                yield [()] * len(chunk)
+                continue
+            with self.profiler.stage('format', rows=len(chunk)):
+                columns = [self._bind_column(chunk[header], types[header]) for header in headers]
+                parameters = list(zip(*columns))
+            yield parameters
+    
+    def _iter_frames(self, data, headers):
+        """将数据按FORMAT_CHUNK_SIZE行切分为DataFrame
+        
+        按列存储的数据（DataFrame或带frame属性的ColumnarData）直接切片，
+        字典形式的数据行先分块再构建DataFrame。
+        
+        Args:
+            data: 数据行
+            headers (list): 列名列表
+            
+        Yields:
+            DataFrame: 一块数据
+        """
+        frame = data if isinstance(data, pd.DataFrame) else getattr(data, 'frame', None)
+        if frame is not None:
+            for start in range(0, len(frame), FORMAT_CHUNK_SIZE):
+                yield frame.iloc[start:start + FORMAT_CHUNK_SIZE]
+            return
+        
+        for chunk in self._iter_chunks(data, FORMAT_CHUNK_SIZE):
+            yield pd.DataFrame.from_records(chunk, columns=headers)
+    
+    def _iter_chunks(self, data, chunk_size):
+        """将数据行按固定行数分块
+        
+        Args:
+            data (iterable): 数据行
+            chunk_size (int): 每块行数
+            
+        Yields:
+            list: 数据行列表
+        """
+        iterator = iter(data)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def _format_frame(self, frame, headers, types):
+        """按列格式化一块数据
+        
+        每列只解析一次类型，整列使用向量化的字符串操作格式化，再按行拼接。
+        
+        Args:
+            frame (DataFrame): 数据
+            headers (list): 列名列表
+            types (dict): 列类型映射
+            
+        Returns:
+            list: 每行逗号分隔的值列表
+        """
+        if not headers:
+            return [''] * len(frame)
+        
+        columns = [self._format_column(frame[header], types[header]) for header in headers]
+        return [", ".join(row_values) for row_values in zip(*columns)]
+    
+    def _prefixed_table_name(self, table_name):
+        """生成带前缀的表名
+        
+        Args:
+            table_name (str): 表名
+            
+        Returns:
+            str: 清理并添加前缀后的表名
+        """
+        # 使用原始工作表名作为表名
+        safe_table_name = table_name
+        # 清理表名，使其符合SQL规范
+        safe_table_name = self._sanitize_identifier(safe_table_name)
+        
+        # 确保表前缀不会覆盖原始表名
+        if self.table_prefix:
+            return f"{self.table_prefix}_{safe_table_name}"
+        return safe_table_name
     
     def _map_type(self, excel_type):
         """将Excel解析的类型映射到对应方言的SQL类型
@@ -261,48 +823,222 @@ class SQLGenerator:
         Returns:
             str: 格式化后的值
         """
-        if value is None:
+        if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
             return 'NULL'
         
+        return self._compile_formatter(sql_type)(value)
+    
+    def _compile_formatter(self, sql_type):
+        """根据SQL类型选择非空值的格式化函数
+        
+        每列只需解析一次类型，避免逐个值重复判断。
+        
+        Args:
+            sql_type (str): SQL类型
+            
+        Returns:
+            callable: 接收非空值、返回SQL字面量的函数
+        """
         # 根据SQL类型格式化值
         if 'INT' in sql_type or sql_type == 'BOOLEAN':
-            # 布尔值转换为0/1
-            if isinstance(value, bool) or (hasattr(value, 'dtype') and pd.api.types.is_bool_dtype(value.dtype)):
-                # 安全地处理pandas Series和numpy array
-                if hasattr(value, 'item'):
-                    try:
-                        return '1' if value.item() else '0'
-                    except (ValueError, TypeError):
-                        return '0'
-                else:
-                    return '1' if value else '0'
-            # 确保是整数
-            try:
-                return str(int(value))
-            except (ValueError, TypeError):
-                return '0'
-        
+            return self._format_integer
         elif 'DECIMAL' in sql_type or sql_type == 'REAL' or sql_type == 'NUMERIC':
-            # 确保是浮点数
-            try:
-                return str(float(value))
-            except (ValueError, TypeError):
-                return '0.0'
-        
+            return self._format_decimal
         elif sql_type in ['DATE', 'DATETIME', 'TIMESTAMP']:
-            # 日期时间格式化
-            if isinstance(value, datetime):
-                if sql_type == 'DATE':
-                    return f"'{value.strftime('%Y-%m-%d')}'"
-                else:
-                    return f"'{value.strftime('%Y-%m-%d %H:%M:%S')}'"
+            date_format = '%Y-%m-%d' if sql_type == 'DATE' else '%Y-%m-%d %H:%M:%S'
+            return partial(self._format_datetime, date_format=date_format)
+        else:  # VARCHAR, TEXT等字符串类型
+            return self._format_string
+    
+    def _format_column(self, values, sql_type):
+        """格式化一整列的值
+        
+        常见的列类型使用向量化操作，其余情况逐个调用该列的格式化函数，结果与_format_value一致。
+        
+        Args:
+            values (Series): 列数据
+            sql_type (str): SQL类型
+            
+        Returns:
+            list: 格式化后的值
+        """
+        formatter = self._compile_formatter(sql_type)
+        null_mask = values.isna().to_numpy()
+        non_null = values[~null_mask]
+        
+        formatted = None
+        if len(non_null) == 0:
+            formatted = []
+        elif formatter == self._format_integer:
+            if pd.api.types.is_bool_dtype(non_null):
+                formatted = np.where(non_null.to_numpy(), '1', '0')
+            elif pd.api.types.is_integer_dtype(non_null):
+                formatted = non_null.to_numpy().astype(str)
+            elif pd.api.types.is_float_dtype(non_null):
+                array = non_null.to_numpy(dtype=np.float64)
+                if np.isfinite(array).all() and (np.abs(array) < 2 ** 63).all():
+                    formatted = np.trunc(array).astype(np.int64).astype(str)
+        elif formatter == self._format_decimal:
+            if pd.api.types.is_float_dtype(non_null) or pd.api.types.is_integer_dtype(non_null):
+                formatted = non_null.to_numpy(dtype=np.float64).astype(str)
+        elif formatter == self._format_string:
+            if pd.api.types.infer_dtype(non_null, skipna=False) in ('string', 'empty'):
+                formatted = ("'" + non_null.str.replace("'", "''", regex=False) + "'").to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(non_null):
+            formatted = ("'" + non_null.dt.strftime(formatter.keywords['date_format']) + "'").to_numpy()
+        
+        if formatted is None:
+            formatted = [formatter(value) for value in non_null.tolist()]
+        
+        result = np.full(len(values), 'NULL', dtype=object)
+        result[~null_mask] = formatted
+        return result.tolist()
+    
+    def _format_copy_column(self, values, sql_type, escapes=COPY_ESCAPES):
+        """按COPY/LOAD DATA文本格式格式化一整列的值
+        
+        数值与INSERT语句中的写法相同；日期和字符串不加引号，按escapes转义；空值写为\\N。
+        
+        Args:
+            values (Series): 列数据
+            sql_type (str): SQL类型
+            escapes (dict, optional): 字符串转义表，默认为COPY_ESCAPES
+            
+        Returns:
+            list: 格式化后的值
+        """
+        formatter = self._compile_formatter(sql_type)
+        if formatter in (self._format_integer, self._format_decimal):
+            # 数值的格式化结果不含引号，也不会与NULL冲突
+            return ['\\N' if value == 'NULL' else value for value in self._format_column(values, sql_type)]
+        
+        null_mask = values.isna().to_numpy()
+        non_null = values[~null_mask]
+        
+        if formatter == self._format_string:
+            if pd.api.types.infer_dtype(non_null, skipna=False) not in ('string', 'empty'):
+                non_null = non_null.map(str)
+            formatted = non_null.astype(object).str.translate(escapes).to_numpy() if len(non_null) else []
+        else:
+            date_format = formatter.keywords['date_format']
+            if pd.api.types.is_datetime64_any_dtype(non_null):
+                formatted = non_null.dt.strftime(date_format).to_numpy()
             else:
-                return "'0000-00-00'"
+                formatted = [
+                    value.strftime(date_format) if isinstance(value, datetime) else '0000-00-00'
+                    for value in non_null.tolist()
+                ]
         
-        else:  # VARCHAR, TEXT等字符串类型
-            # 转义单引号并用单引号包围
-            if isinstance(value, str):
-                escaped_value = value.replace("'", "''")
-                return f"'{escaped_value}'"
+        result = np.full(len(values), '\\N', dtype=object)
+        result[~null_mask] = formatted
+        return result.tolist()
+    
+    def _bind_column(self, values, sql_type):
+        """将一整列的值转换为可绑定的Python原生值
+        
+        转换规则与_format_column一致：布尔值为0/1，日期按列类型转为字符串，空值为None。
+        
+        Args:
+            values (Series): 列数据
+            sql_type (str): SQL类型
+            
+        Returns:
+            list: 转换后的值
+        """
+        formatter = self._compile_formatter(sql_type)
+        null_mask = values.isna().to_numpy()
+        non_null = values[~null_mask]
+        
+        bound = None
+        if len(non_null) == 0:
+            bound = []
+        elif formatter == self._format_integer:
+            if pd.api.types.is_bool_dtype(non_null) or pd.api.types.is_integer_dtype(non_null):
+                bound = non_null.to_numpy().astype(np.int64).tolist()
+            elif pd.api.types.is_float_dtype(non_null):
+                array = non_null.to_numpy(dtype=np.float64)
+                if np.isfinite(array).all() and (np.abs(array) < 2 ** 63).all():
+                    bound = np.trunc(array).astype(np.int64).tolist()
+        elif formatter == self._format_decimal:
+            if pd.api.types.is_float_dtype(non_null) or pd.api.types.is_integer_dtype(non_null):
+                bound = non_null.to_numpy(dtype=np.float64).tolist()
+        elif formatter == self._format_string:
+            if pd.api.types.infer_dtype(non_null, skipna=False) in ('string', 'empty'):
+                bound = non_null.tolist()
+        elif pd.api.types.is_datetime64_any_dtype(non_null):
+            bound = non_null.dt.strftime(formatter.keywords['date_format']).tolist()
+        
+        if bound is None:
+            bound = [self._bind_value(value, formatter) for value in non_null.tolist()]
+        
+        result = np.full(len(values), None, dtype=object)
+        result[~null_mask] = bound
+        return result.tolist()
+    
+    def _bind_value(self, value, formatter):
+        """将单个非空值转换为可绑定的Python原生值
+        
+        Args:
+            value: 原始值
+            formatter (callable): 该列的格式化函数，见_compile_formatter
+            
+        Returns:
+            int|float|str: 转换后的值
+        """
+        if formatter == self._format_integer:
+            try:
+                return int(value)
+            except (ValueError, TypeError):
+                return 0
+        elif formatter == self._format_decimal:
+            try:
+                return float(value)
+            except (ValueError, TypeError):
+                return 0.0
+        elif formatter == self._format_string:
+            return value if isinstance(value, str) else str(value)
+        elif isinstance(value, datetime):
+            return value.strftime(formatter.keywords['date_format'])
+        return '0000-00-00'
+    
+    def _format_integer(self, value):
+        """格式化整数和布尔值"""
+        # 布尔值转换为0/1
+        if isinstance(value, bool) or (hasattr(value, 'dtype') and pd.api.types.is_bool_dtype(value.dtype)):
+            # 安全地处理pandas Series和numpy array
+            if hasattr(value, 'item'):
+                try:
+                    return '1' if value.item() else '0'
+                except (ValueError, TypeError):
+                    return '0'
             else:
-                return f"'{str(value)}'"
\ No newline at end of file
+                return '1' if value else '0'
+        # 确保是整数
+        try:
+            return str(int(value))
+        except (ValueError, TypeError):
+            return '0'
+    
+    def _format_decimal(self, value):
+        """格式化小数"""
+        # 确保是浮点数
+        try:
+            return str(float(value))
+        except (ValueError, TypeError):
+            return '0.0'
+    
+    def _format_datetime(self, value, date_format):
+        """格式化日期时间"""
+        if isinstance(value, datetime):
+            return f"'{value.strftime(date_format)}'"
+        else:
+            return "'0000-00-00'"
+    
+    def _format_string(self, value):
+        """格式化字符串"""
+        # 转义单引号并用单引号包围
+        if isinstance(value, str):
+            escaped_value = value.replace("'", "''")
+            return f"'{escaped_value}'"
+        else:
+            return f"'{str(value)}'"
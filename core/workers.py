@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+工作池模块
+
+在独立的进程（或线程）中执行CPU密集的转换任务，避免阻塞异步服务的事件循环。
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# 支持的工作池类型
+WORKER_MODES = ('process', 'thread')
+
+
+class WorkerPoolFull(RuntimeError):
+    """工作池中执行和排队的任务数已达上限"""
+
+
+class WorkerPool:
+    """有界的工作池
+
+    最多max_workers个任务同时执行，另有max_queue个任务排队等待；
+    超过上限时立即抛出WorkerPoolFull，而不是无限制地积压任务。
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, mode='process'):
+        """初始化工作池
+
+        Args:
+            max_workers (int, optional): 同时执行的任务数，默认为CPU核心数
+            max_queue (int, optional): 排队等待的任务数上限，默认为max_workers的2倍
+            mode (str, optional): 'process'（默认）使用进程池，'thread'使用线程池
+        """
+        self.max_workers = int(max_workers or os.cpu_count() or 1)
+        if self.max_workers < 1:
+            raise ValueError(f"工作进程数必须为正整数: {max_workers}")
+        self.max_queue = self.max_workers * 2 if max_queue is None else int(max_queue)
+        if self.max_queue < 0:
+            raise ValueError(f"排队任务数不能为负数: {max_queue}")
+        self.mode = mode.lower()
+        if self.mode not in WORKER_MODES:
+            raise ValueError(f"不支持的工作池类型: {mode}")
+
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """提交任务
+
+        进程模式下fn和参数需要可以被pickle。
+
+        Args:
+            fn (callable): 任务函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            concurrent.futures.Future: 任务结果
+
+        Raises:
+            WorkerPoolFull: 执行和排队的任务数已达上限
+        """
+        if not self._slots.acquire(blocking=False):
+            raise WorkerPoolFull(f"工作池已满：{self.max_workers}个任务执行中，{self.max_queue}个任务排队中")
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """在工作池中执行任务并等待结果，等待期间不阻塞事件循环
+
+        Args:
+            fn (callable): 任务函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            任务函数的返回值
+
+        Raises:
+            WorkerPoolFull: 执行和排队的任务数已达上限
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        """关闭工作池
+
+        Args:
+            wait (bool, optional): 是否等待已提交的任务完成，默认为True
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _get_executor(self):
+        """首次提交任务时创建执行器"""
+        with self._lock:
+            if self._executor is None:
+                if self.mode == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
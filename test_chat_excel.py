@@ -8,6 +8,13 @@
 """
 
 import unittest
+import asyncio
+import threading
+import shutil
+import mmap
+import time
+import sqlite3
+import numpy as np
 import pandas as pd
 import tempfile
 import os
@@ -15,6 +22,104 @@ from pathlib import Path
 
 from core.excel_parser import ExcelParser
 from core.sql_generator import SQLGenerator
+from core.pipeline import convert_workbook, iter_workbook_sql, profile_workbook
+from core.loader import SQLiteLoader, DBAPILoader
+from core.cache import ResultCache, SheetCache, cache_key
+from core.workers import WorkerPool, WorkerPoolFull
+from core.jobs import JobManager, JOB_DONE, JOB_FAILED
+from core.profiling import Profiler
+from core.diff import diff_sheet, diff_workbook, load_manifest, save_manifest
+from fastapi.testclient import TestClient
+import api
+from benchmarks.synthetic import generate_frame, generate_workbook
+from benchmarks.run_benchmarks import run_benchmarks, compare_with_baseline
+
+def legacy_infer_column_types(df):
+    """逐值推断列类型的原始实现，用于回归测试"""
+    column_types = {}
+    for column in df.columns:
+        non_null_values = df[column].dropna()
+        if len(non_null_values) == 0:
+            column_types[column] = 'TEXT'
+            continue
+        if pd.api.types.is_integer_dtype(non_null_values):
+            max_val = non_null_values.max()
+            min_val = non_null_values.min()
+            if min_val >= 0:
+                if max_val <= 255:
+                    column_types[column] = 'TINYINT UNSIGNED'
+                elif max_val <= 65535:
+                    column_types[column] = 'SMALLINT UNSIGNED'
+                elif max_val <= 4294967295:
+                    column_types[column] = 'INT UNSIGNED'
+                else:
+                    column_types[column] = 'BIGINT UNSIGNED'
+            else:
+                if min_val >= -128 and max_val <= 127:
+                    column_types[column] = 'TINYINT'
+                elif min_val >= -32768 and max_val <= 32767:
+                    column_types[column] = 'SMALLINT'
+                elif min_val >= -2147483648 and max_val <= 2147483647:
+                    column_types[column] = 'INT'
+                else:
+                    column_types[column] = 'BIGINT'
+        elif pd.api.types.is_float_dtype(non_null_values):
+            max_decimals = 0
+            for val in non_null_values:
+                if isinstance(val, (float, np.float64, np.float32)) and not np.isnan(val):
+                    decimals = len(str(val).split('.')[-1])
+                    max_decimals = max(max_decimals, decimals)
+            if max_decimals > 0:
+                column_types[column] = f'DECIMAL(20,{min(max_decimals, 10)})'
+            else:
+                column_types[column] = 'DECIMAL(20,0)'
+        elif pd.api.types.is_datetime64_dtype(non_null_values):
+            has_time = False
+            for val in non_null_values:
+                if pd.notna(val) and (val.hour != 0 or val.minute != 0 or val.second != 0):
+                    has_time = True
+                    break
+            column_types[column] = 'DATETIME' if has_time else 'DATE'
+        elif pd.api.types.is_bool_dtype(non_null_values):
+            column_types[column] = 'BOOLEAN'
+        else:
+            max_length = 0
+            for val in non_null_values:
+                if isinstance(val, str):
+                    max_length = max(max_length, len(val))
+            if max_length <= 255:
+                column_types[column] = f'VARCHAR({max(max_length, 50)})'
+            else:
+                column_types[column] = 'TEXT'
+    return column_types
+
+class FakeConnection:
+    """记录调用的DB-API连接，第一次executemany时模拟死锁"""
+    
+    def __init__(self, log, deadlocks):
+        self.log = log
+        self.deadlocks = deadlocks
+    
+    def cursor(self):
+        return self
+    
+    def execute(self, sql):
+        self.log.append(('execute', sql.split(' (')[0]))
+    
+    def executemany(self, sql, rows):
+        if self.deadlocks:
+            self.deadlocks.pop()
+            raise RuntimeError("Deadlock found when trying to get lock")
+        self.log.append(('executemany', len(rows)))
+    
+    def commit(self):
+        self.log.append(('commit',))
+    
+    def rollback(self):
+        self.log.append(('rollback',))
+    
+    def close(self):
+        pass
 
 class TestChatExcel(unittest.TestCase):
     """测试Chat-Excel工具的基本功能"""
@@ -71,6 +176,719 @@ class TestChatExcel(unittest.TestCase):
         # 验证数据
         self.assertEqual(len(sheet_data['data']), 5)
     
+    def test_sheet_info(self):
+        """测试不打开工作簿读取工作表元数据和预览"""
+        profiler = Profiler()
+        parser = ExcelParser(self.excel_file, profiler=profiler)
+        self.assertEqual(parser.get_sheet_names(), ["测试"])
+        
+        info = parser.get_sheet_info(preview_rows=2)
+        self.assertEqual([(sheet['name'], sheet['rows'], sheet['columns']) for sheet in info], [("测试", 6, 5)])
+        self.assertEqual(info[0]['preview'][0], ["整数列", "浮点列", "文本列", "日期列", "布尔列"])
+        self.assertEqual(info[0]['preview'][1][:3], [1, 1.1, "a"])
+        self.assertEqual(len(parser.preview_sheet("测试", rows=100)), 6)
+        
+        # 元数据和预览不打开整个工作簿，读取数据时才打开
+        self.assertNotIn('open', profiler.report()['stages'])
+        parser.parse_sheet("测试")
+        self.assertIn('open', profiler.report()['stages'])
+        
+        # 文件内容同样只读取zip中的元数据
+        in_memory = ExcelParser(self.excel_file.read_bytes())
+        self.assertEqual(in_memory.get_sheet_info(), [{'name': "测试", 'rows': 6, 'columns': 5}])
+        with self.assertRaises(ValueError):
+            in_memory.preview_sheet("不存在")
+    
+    def test_iter_sheet(self):
+        """测试流式读取工作表"""
+        parser = ExcelParser(self.excel_file)
+        
+        batches = list(parser.iter_sheet("测试", batch_size=2))
+        
+        # 验证分批结果
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(list(batches[0].columns), parser.parse_sheet("测试")['headers'])
+        
+        # 验证数据与整表读取一致
+        streamed = pd.concat(batches, ignore_index=True)
+        self.assertEqual(streamed['整数列'].tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(streamed['文本列'].tolist(), ["a", "b", "c", "d", "e"])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(streamed['日期列']))
+        
+        # 验证列范围
+        batch = next(parser.iter_sheet("测试", valid_column_start=1, valid_column_end=2))
+        self.assertEqual(list(batch.columns), ["浮点列", "文本列"])
+    
+    def test_stream_pipeline(self):
+        """测试流式流水线与整表转换结果一致"""
+        parser = ExcelParser(self.excel_file)
+        
+        for dialect in ['mysql', 'sqlite', 'postgresql']:
+            generator = SQLGenerator(dialect=dialect)
+            sheet_data = parser.parse_sheet("测试")
+            expected = '\n\n'.join([
+                generator.generate_create_table("测试", sheet_data),
+                generator.generate_insert_data("测试", sheet_data)
+            ])
+            
+            streamed = ''.join(iter_workbook_sql(parser, generator, ["测试"], batch_size=2))
+            self.assertEqual(streamed, expected)
+        
+        # 按第一批数据建表，后续批次放宽类型时先修改列类型
+        excel_file = self.temp_path / "widen.xlsx"
+        pd.DataFrame({"数值": [1, 2, 3, 4.5], "文本": ["a", "b", "c", "x" * 300]}).to_excel(excel_file, sheet_name="放宽", index=False)
+        parser = ExcelParser(excel_file)
+        sheet_data = parser.stream_sheet("放宽", batch_size=2)
+        self.assertEqual(sheet_data['types'], {"数值": 'TINYINT UNSIGNED', "文本": 'VARCHAR(50)'})
+        self.assertEqual(len(list(sheet_data['data'])), 4)
+        self.assertEqual(sheet_data['types'], parser.parse_sheet("放宽")['types'])
+        
+        streamed = ''.join(iter_workbook_sql(parser, SQLGenerator(dialect='mysql'), ["放宽"], batch_size=2))
+        self.assertIn("`数值` TINYINT,", streamed)
+        self.assertLess(streamed.index("MODIFY COLUMN `数值` DECIMAL(20,1);"), streamed.index("INSERT INTO"))
+        self.assertIn("MODIFY COLUMN `文本` TEXT;", streamed)
+        
+        streamed = ''.join(iter_workbook_sql(parser, SQLGenerator(dialect='sqlite'), ["放宽"], batch_size=2))
+        connection = sqlite3.connect(":memory:")
+        connection.executescript(streamed)
+        self.assertEqual([row[0] for row in connection.execute('SELECT "数值" FROM "放宽"')], [1, 2, 3, 4.5])
+        connection.close()
+        
+        # 第一批中全为空值的列在出现非空值后放宽，空值保持为NULL
+        excel_file = self.temp_path / "late.xlsx"
+        pd.DataFrame({"id": range(6), "n": [None] * 5 + [2.5]}).to_excel(excel_file, sheet_name="后出现", index=False)
+        parser = ExcelParser(excel_file)
+        for dialect in ['mysql', 'sqlite', 'postgresql']:
+            generator = SQLGenerator(dialect=dialect)
+            sheet_data = parser.parse_sheet("后出现")
+            self.assertEqual(sheet_data['types']['n'], 'DECIMAL(20,1)')
+            expected = generator.generate_insert_data("后出现", sheet_data)
+            
+            streamed = ''.join(iter_workbook_sql(parser, generator, ["后出现"], batch_size=2))
+            self.assertTrue(streamed.endswith(expected))
+            self.assertIn(generator.generate_alter_column_type("后出现", "n", 'DECIMAL(20,1)'), streamed)
+    
+    def test_infer_column_types_regression(self):
+        """测试向量化类型推断与逐值推断结果完全一致"""
+        parser = ExcelParser(self.excel_file)
+        rng = np.random.default_rng(0)
+        
+        columns = {
+            "小整数": [1, 2, 255],
+            "负整数": [-129, 5, 100],
+            "大整数": [1, 2 ** 40, 3],
+            "一位小数": [1.0, 2.0, 3.5],
+            "多位小数": [1.25, 0.125, np.nan],
+            "浮点误差": [0.1 + 0.2, 1.5, 2.0],
+            "科学计数": [1e-05, 1.5e-07, 2.0],
+            "大浮点": [1e20, 1.5, 123456789.12345678],
+            "无穷": [np.inf, 1.5, np.nan],
+            "负零": [-0.0, 0.0, np.nan],
+            "随机浮点": rng.normal(size=3) * 1000,
+            "舍入浮点": np.round(rng.uniform(-1e6, 1e6, size=3), 4),
+            "日期": pd.to_datetime(["2020-01-01", "2020-01-02", None]),
+            "日期时间": pd.to_datetime(["2020-01-01", "2020-01-02 12:30:00", None], format="ISO8601"),
+            "毫秒": pd.to_datetime(["2020-01-01 00:00:00.500", "2020-01-02", None], format="ISO8601"),
+            "布尔": [True, False, True],
+            "短文本": ["a", "bb", None],
+            "长文本": ["x" * 300, "y", None],
+            "中等文本": ["x" * 100, "y", None],
+            "混合": ["abc", 1, 2.5],
+            "无字符串": pd.Series([1, 2, None], dtype=object),
+            "全空": [None, None, None],
+        }
+        df = pd.DataFrame(columns)
+        self.assertEqual(parser._infer_column_types(df), legacy_infer_column_types(df))
+        
+        # 随机浮点列
+        for _ in range(20):
+            scale = 10.0 ** rng.integers(-8, 18)
+            values = rng.uniform(-1, 1, size=50) * scale
+            values = np.round(values, int(rng.integers(0, 12)))
+            df = pd.DataFrame({"f": values})
+            self.assertEqual(parser._infer_column_types(df), legacy_infer_column_types(df))
+    
+    def test_handle_null_values(self):
+        """测试空值处理：数值和日期列的空值为None或NaN/NaT，文本列为空字符串，布尔列为False"""
+        parser = ExcelParser(self.excel_file)
+        df = pd.DataFrame({
+            "整数": pd.Series([1, None, 3], dtype=object),
+            "小数": [1.5, np.nan, 2.0],
+            "日期": pd.Series([pd.Timestamp("2024-01-01"), None, pd.Timestamp("2024-01-03")], dtype=object),
+            "混合": pd.Series([1, None, "x"], dtype=object),
+            "文本": ["a", None, "c"],
+            "布尔": pd.Series([True, None, False], dtype=object)
+        })
+        types = {"整数": "INT", "小数": "DECIMAL(10,1)", "日期": "DATE", "混合": "INT", "文本": "VARCHAR(50)", "布尔": "BOOLEAN"}
+        
+        expected = df.copy()
+        for column in ["整数", "小数", "日期", "混合"]:
+            expected[column] = expected[column].apply(lambda x: None if pd.isna(x) else x)
+        result = parser._handle_null_values(df.copy(), types)
+        
+        for column in ["整数", "小数", "日期", "混合"]:
+            self.assertTrue(result[column].equals(expected[column]), column)
+            self.assertEqual(result[column].dtype, expected[column].dtype)
+        self.assertEqual(result["混合"].tolist(), [1, None, "x"])
+        self.assertEqual(result["文本"].tolist(), ["a", "", "c"])
+        self.assertEqual(result["布尔"].tolist(), [True, False, False])
+        self.assertEqual(result["布尔"].dtype, bool)
+    
+    def test_inference_strategies(self):
+        """测试抽样和渐进式类型推断"""
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({
+            "整数": np.append(rng.integers(0, 100, size=999), 70000),
+            "浮点": np.append(np.round(rng.normal(size=999), 1), 0.125),
+            "文本": ["a"] * 999 + ["x" * 120],
+            "长文本": ["x" * 300] + ["a"] * 999,
+            "日期": pd.to_datetime(["2020-01-01"] * 999 + ["2020-01-02 08:00:00"], format="ISO8601"),
+            "空值日期": pd.to_datetime([None, "2020-01-01"] * 499 + ["2020-01-02 00:00:01", None], format="ISO8601"),
+            "稀疏": [np.nan] * 999 + [0.125],
+        })
+        full_types = ExcelParser(self.excel_file)._infer_column_types(df)
+        
+        # 抽样推断经过放宽后不会得到比全量推断更窄的类型
+        sample_types = ExcelParser(self.excel_file, inference='sample(10)')._infer_column_types(df)
+        self.assertEqual(sample_types, full_types)
+        
+        progressive_types = ExcelParser(self.excel_file, inference='progressive')._infer_column_types(df)
+        self.assertEqual(progressive_types, full_types)
+        
+        with self.assertRaises(ValueError):
+            ExcelParser(self.excel_file, inference='guess')
+    
+    def test_parse_all_sheets(self):
+        """测试批量解析工作表与逐个解析结果一致"""
+        excel_file = self.temp_path / "multi_sheet.xlsx"
+        with pd.ExcelWriter(excel_file) as writer:
+            pd.DataFrame({"编号": [1, 2], "名称": ["a", "b"]}).to_excel(writer, sheet_name="表1", index=False)
+            pd.DataFrame({"金额": [1.5, None]}).to_excel(writer, sheet_name="表2", index=False)
+        parser = ExcelParser(excel_file)
+        
+        result = parser.parse_all_sheets()
+        self.assertEqual(list(result), ["表1", "表2"])
+        for sheet_name, sheet_data in result.items():
+            self.assertEqual(sheet_data, parser.parse_sheet(sheet_name))
+        
+        # 只解析指定的工作表
+        self.assertEqual(list(parser.parse_all_sheets(sheet_names=["表2"])), ["表2"])
+    
+    def test_convert_workbook_parallel(self):
+        """测试多进程转换与单进程结果一致"""
+        excel_file = self.temp_path / "multi_sheet.xlsx"
+        with pd.ExcelWriter(excel_file) as writer:
+            for idx in range(3):
+                pd.DataFrame({"编号": [idx, idx + 1], "名称": ["a", "b"]}).to_excel(writer, sheet_name=f"表{idx}", index=False)
+        
+        serial = convert_workbook(excel_file, dialect='postgresql')
+        parallel = convert_workbook(excel_file, dialect='postgresql', jobs=2)
+        
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(serial), 6)
+        self.assertIn('"表0"', serial[0])
+    
+    def test_profiler(self):
+        """测试分阶段性能统计"""
+        expected = convert_workbook(self.excel_file, dialect='postgresql')
+        sql_statements, report = profile_workbook(self.excel_file, trace_memory=True, dialect='postgresql')
+        self.assertEqual(sql_statements, expected)
+        
+        stages = report['stages']
+        self.assertEqual(list(stages), ['open', 'read', 'infer_types', 'null_values', 'format', 'output'])
+        self.assertEqual(stages['open']['bytes'], self.excel_file.stat().st_size)
+        self.assertEqual(stages['format']['rows'], 5)
+        self.assertEqual(stages['output']['bytes'], len(sql_statements[1].encode('utf-8')))
+        self.assertTrue(all('peak_memory' in stats for name, stats in stages.items() if stats['calls']))
+        
+        # 流式转换和cProfile
+        profiler = Profiler(cprofile_stage='format')
+        parser = ExcelParser(self.excel_file, profiler=profiler)
+        generator = SQLGenerator(dialect='postgresql', profiler=profiler)
+        "".join(iter_workbook_sql(parser, generator, parser.get_sheet_names()))
+        self.assertEqual(profiler.report()['stages']['null_values']['rows'], 5)
+        self.assertIn('infer_types', profiler.format_report())
+        profile_file = self.temp_path / "format.prof"
+        profiler.dump_cprofile(profile_file)
+        self.assertTrue(profile_file.exists())
+        
+        # 多进程转换汇总各工作进程的统计
+        excel_file = self.temp_path / "multi_sheet.xlsx"
+        with pd.ExcelWriter(excel_file) as writer:
+            for idx in range(2):
+                pd.DataFrame({"编号": [idx, idx + 1]}).to_excel(writer, sheet_name=f"表{idx}", index=False)
+        profiler = Profiler()
+        convert_workbook(excel_file, jobs=2, profiler=profiler)
+        self.assertEqual(profiler.report()['stages']['format']['rows'], 4)
+    
+    def test_columnar_data(self):
+        """测试按列存储的解析结果"""
+        parser = ExcelParser(self.excel_file)
+        sheet_data = parser.parse_sheet("测试")
+        data = sheet_data['data']
+        
+        # 行视图与字典形式的数据行一致
+        records = data.to_records()
+        self.assertEqual([dict(row) for row in data], records)
+        self.assertEqual(data[0].get('整数列'), 1)
+        self.assertIsInstance(data[-1]['整数列'], int)
+        self.assertIsNone(data[0].get('不存在的列'))
+        with self.assertRaises(IndexError):
+            data[5]
+        
+        # 按列数据和字典数据生成相同的SQL
+        generator = SQLGenerator(dialect='postgresql')
+        self.assertEqual(
+            generator.generate_insert_data("t", sheet_data),
+            generator.generate_insert_data("t", dict(sheet_data, data=records))
+        )
+    
+    def test_insert_batching(self):
+        """测试按行数和字节数分批生成INSERT语句"""
+        parser = ExcelParser(self.excel_file)
+        sheet_data = parser.parse_sheet("测试")
+        
+        # SQLite多行INSERT可以直接执行
+        generator = SQLGenerator(dialect='sqlite', rows_per_insert=2)
+        statements = list(generator.iter_insert_data("t", sheet_data))
+        self.assertEqual(len(statements), 3)
+        connection = sqlite3.connect(":memory:")
+        connection.executescript(generator.generate_create_table("t", sheet_data) + "\n".join(statements))
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM "t"').fetchone()[0], 5)
+        connection.close()
+        
+        # 每行一条语句
+        statements = list(SQLGenerator(dialect='postgresql', rows_per_insert=1).iter_insert_data("t", sheet_data))
+        self.assertEqual(len(statements), 5)
+        self.assertTrue(all(statement.count("\n") == 0 for statement in statements))
+        
+        # 字节上限
+        full_statement = SQLGenerator(dialect='mysql').generate_insert_data("t", sheet_data)
+        max_insert_bytes = len(full_statement.encode('utf-8')) // 2
+        generator = SQLGenerator(dialect='mysql', max_insert_bytes=max_insert_bytes)
+        statements = list(generator.iter_insert_data("t", sheet_data))
+        self.assertGreater(len(statements), 1)
+        self.assertTrue(all(len(statement.encode('utf-8')) <= max_insert_bytes for statement in statements))
+        self.assertEqual(sum(statement.count("\n(") for statement in statements), 5)
+    
+    def test_copy_format(self):
+        """测试PostgreSQL COPY输出格式"""
+        generator = SQLGenerator(dialect='postgresql', output_format='copy')
+        sheet_data = {
+            'headers': ["编号", "文本", "日期"],
+            'types': {"编号": "INT", "文本": "TEXT", "日期": "DATE"},
+            'data': [
+                {"编号": 1, "文本": "a\tb\nc\\d", "日期": pd.Timestamp("2020-01-01")},
+                {"编号": None, "文本": None, "日期": None},
+            ]
+        }
+        
+        self.assertEqual(generator.generate_data("t", sheet_data).split("\n"), [
+            'COPY "t" ("编号", "文本", "日期") FROM STDIN;',
+            '1\ta\\tb\\nc\\\\d\t2020-01-01',
+            '\\N\t\\N\t\\N',
+            '\\.'
+        ])
+        
+        with self.assertRaises(ValueError):
+            SQLGenerator(dialect='mysql', output_format='copy')
+    
+    def test_load_data_format(self):
+        """测试MySQL LOAD DATA输出格式"""
+        data_dir = self.temp_path / "data"
+        generator = SQLGenerator(dialect='mysql', output_format='load', data_dir=data_dir)
+        sheet_data = {
+            'headers': ["编号", "文本"],
+            'types': {"编号": "INT", "文本": "TEXT"},
+            'data': [{"编号": 1, "文本": "a\tb\\c"}, {"编号": None, "文本": None}]
+        }
+        
+        statement = generator.generate_data("t", sheet_data)
+        data_file = data_dir / "t.tsv"
+        self.assertIn(f"LOAD DATA LOCAL INFILE '{data_file.resolve()}' INTO TABLE `t`", statement)
+        self.assertIn("(`编号`, `文本`);", statement)
+        self.assertEqual(data_file.read_text(encoding='utf-8'), "1\ta\\tb\\\\c\n\\N\t\\N\n")
+        
+        with self.assertRaises(ValueError):
+            SQLGenerator(dialect='mysql', output_format='load')
+    
+    def test_upsert(self):
+        """测试upsert的键列检测、建表主键和重复执行的幂等性"""
+        parser = ExcelParser(self.excel_file)
+        sheet_data = parser.parse_sheet("测试")
+        # 浮点列不参与检测，第一个非空且不重复的列为整数列
+        self.assertEqual(sheet_data['key_columns'], ["整数列"])
+        
+        generator = SQLGenerator(dialect='sqlite', upsert=True)
+        self.assertIn('PRIMARY KEY ("整数列")', generator.generate_create_table("test_table", sheet_data))
+        
+        # 同一份SQL执行两次，行数不变
+        sql = "\n".join(convert_workbook(self.excel_file, dialect='sqlite', upsert=True))
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(sql)
+        conn.executescript(sql)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM "测试"').fetchone()[0], 5)
+        conn.close()
+        
+        rows = {'headers': ["a", "b"], 'types': {"a": "INT", "b": "INT"}, 'data': [{"a": 1, "b": 2}]}
+        mysql = SQLGenerator(dialect='mysql', upsert=True, key_columns=["a"])
+        self.assertEqual(mysql.generate_insert_data("t", rows),
+                         "INSERT INTO `t` (`a`, `b`) VALUES\n(1, 2)\nON DUPLICATE KEY UPDATE `b` = VALUES(`b`);")
+        postgresql = SQLGenerator(dialect='postgresql', upsert=True, key_columns=["a"])
+        self.assertEqual(postgresql.generate_parameterized_insert("t", rows, paramstyle='format'),
+                         'INSERT INTO "t" ("a", "b") VALUES (%s, %s) ON CONFLICT ("a") DO UPDATE SET "b" = EXCLUDED."b"')
+        
+        # 键值重复、键列无法确定或输出格式不支持时报错
+        with self.assertRaises(ValueError):
+            postgresql.generate_insert_data("t", dict(rows, data=[{"a": 1, "b": 2}, {"a": 1, "b": 3}]))
+        with self.assertRaises(ValueError):
+            SQLGenerator(dialect='sqlite', upsert=True).generate_create_table("t", dict(rows, key_columns=[]))
+        with self.assertRaises(ValueError):
+            SQLGenerator(dialect='postgresql', output_format='copy', upsert=True)
+    
+    def test_load_into_sqlite(self):
+        """测试参数化批量导入SQLite"""
+        database = self.temp_path / "output.db"
+        parser = ExcelParser(self.excel_file)
+        sheet_data = parser.parse_sheet("测试")
+        
+        loader = SQLiteLoader(f"sqlite:///{database}", commit_rows=1)
+        row_count = loader.load(SQLGenerator(dialect='sqlite'), "test_table", sheet_data)
+        self.assertEqual(row_count, len(sheet_data['data']))
+        
+        # 与执行INSERT脚本得到的数据一致
+        generator = SQLGenerator(dialect='sqlite')
+        expected = sqlite3.connect(":memory:")
+        expected.executescript(generator.generate_create_table("test_table", sheet_data) + "\n" +
+                               generator.generate_insert_data("test_table", sheet_data))
+        with sqlite3.connect(database) as conn:
+            self.assertEqual(conn.execute('SELECT * FROM "test_table"').fetchall(),
+                             expected.execute('SELECT * FROM "test_table"').fetchall())
+            # 导入结束后恢复原来的日志模式
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        self.assertFalse(Path(f"{database}-wal").exists())
+        expected.close()
+        
+        with self.assertRaises(ValueError):
+            SQLiteLoader("mysql://localhost/db")
+    
+    def test_dbapi_loader(self):
+        """测试DB-API批量导入的分批、提交和死锁重试"""
+        logs = []
+        deadlocks = [True]
+        
+        def connect():
+            log = []
+            logs.append(log)
+            return FakeConnection(log, deadlocks)
+        
+        generator = SQLGenerator(dialect='postgresql')
+        sheets = [
+            (f"t{i}", {'headers': ["a"], 'types': {"a": "INT"}, 'data': [{"a": n} for n in range(5)]})
+            for i in range(3)
+        ]
+        loader = DBAPILoader(connect, paramstyle='format', pool_size=2, batch_size=2, commit_rows=3, retry_delay=0)
+        self.assertEqual(loader.load_sheets(generator, sheets), [5, 5, 5])
+        self.assertLessEqual(len(logs), 2)
+        
+        # 每个工作表：建表并提交，2+2行后提交一次，剩余1行在结束时提交；死锁时回滚后重放
+        calls = [call for log in logs for call in log]
+        self.assertEqual(calls.count(('execute', 'CREATE TABLE IF NOT EXISTS "t0"')), 1)
+        self.assertEqual(calls.count(('executemany', 2)), 6)
+        self.assertEqual(calls.count(('executemany', 1)), 3)
+        self.assertEqual(calls.count(('commit',)), 9)
+        self.assertEqual(calls.count(('rollback',)), 1)
+        
+        self.assertEqual(generator.generate_parameterized_insert("t", sheets[0][1], paramstyle='numeric'),
+                         'INSERT INTO "t" ("a") VALUES (:1)')
+    
+    def test_incremental_diff(self):
+        """测试与清单比较的增量转换"""
+        parser = ExcelParser(self.excel_file)
+        generator = SQLGenerator(dialect='sqlite')
+        manifest_file = self.temp_path / "manifest.json"
+        
+        # 第一次转换与全量转换的输出一致
+        sql_parts, manifest = diff_workbook(parser, generator, ["测试"], load_manifest(manifest_file, 'sqlite'),
+                                            key_columns=["整数列"])
+        self.assertEqual(sql_parts, convert_workbook(self.excel_file, dialect='sqlite'))
+        save_manifest(manifest, manifest_file)
+        conn = sqlite3.connect(":memory:")
+        conn.executescript("\n".join(sql_parts))
+        
+        # 修改、删除、新增行，并新增一列（新列使所有保留的行都需要更新）
+        df = pd.read_excel(self.excel_file)
+        df.loc[1, "文本列"] = "changed"
+        df = df.drop(index=2)
+        df.loc[len(df) + 1] = [6, 6.6, "f", pd.Timestamp("2020-01-06"), False]
+        df["新列"] = range(len(df))
+        df.to_excel(self.excel_file, sheet_name="测试", index=False)
+        
+        parser = ExcelParser(self.excel_file)
+        sql_parts, manifest = diff_workbook(parser, generator, ["测试"], load_manifest(manifest_file, 'sqlite'),
+                                            key_columns=["整数列"])
+        sql = sql_parts[0]
+        self.assertIn('ALTER TABLE "测试" ADD COLUMN "新列"', sql)
+        self.assertIn('DELETE FROM "测试" WHERE "整数列" IN (3);', sql)
+        self.assertEqual(sql.count("UPDATE"), 4)
+        self.assertEqual(sql.count("INSERT INTO"), 1)
+        conn.executescript(sql)
+        self.assertEqual(conn.execute('SELECT "整数列", "文本列", "新列" FROM "测试" ORDER BY 1').fetchall(),
+                         [(1, "a", 0), (2, "changed", 1), (4, "d", 2), (5, "e", 3), (6, "f", 4)])
+        conn.close()
+        
+        # 再次比较时没有变化
+        self.assertEqual(diff_workbook(parser, generator, ["测试"], manifest, key_columns=["整数列"])[0],
+                         ['-- 表 测试 没有变化'])
+        with self.assertRaises(ValueError):
+            diff_workbook(parser, SQLGenerator(dialect='mysql'), ["测试"], manifest, key_columns=["整数列"])
+        
+        # 无键列时只追加的行直接插入，修改行时清空后重新插入
+        sheet_data = {'headers': ["a"], 'types': {"a": "INT"}, 'data': [{"a": n} for n in range(3)]}
+        _, entry = diff_sheet(parser, generator, "t", sheet_data)
+        sheet_data['data'].append({"a": 3})
+        sql = diff_sheet(parser, generator, "t", sheet_data, entry)[0][0]
+        self.assertEqual(sql, 'INSERT INTO "t" ("a") VALUES\n(3);')
+        sheet_data['data'][0] = {"a": 9}
+        sql = diff_sheet(parser, generator, "t", sheet_data, entry)[0][0]
+        self.assertTrue(sql.startswith('DELETE FROM "t";'))
+        
+        # 列类型放宽时值没有变化的行不需要更新
+        mysql = SQLGenerator(dialect='mysql')
+        sheet_data = {'headers': ["a"], 'types': {"a": "TINYINT UNSIGNED"}, 'data': [{"a": n} for n in range(3)]}
+        _, entry = diff_sheet(parser, mysql, "t", sheet_data)
+        widened = {'headers': ["a"], 'types': {"a": "DECIMAL(20,1)"}, 'data': [{"a": float(n)} for n in range(3)]}
+        self.assertEqual(diff_sheet(parser, mysql, "t", widened, entry)[0][0], "ALTER TABLE `t` MODIFY COLUMN `a` DECIMAL(20,1);")
+        keyed = {'headers': ["k", "a"], 'types': {"k": "TINYINT UNSIGNED", "a": "DATE"},
+                 'data': [{"k": n, "a": pd.Timestamp("2020-01-01")} for n in range(3)]}
+        _, entry = diff_sheet(parser, mysql, "t", keyed, key_columns=["k"])
+        keyed['types']["a"] = "DATETIME"
+        keyed['data'][2]["a"] = pd.Timestamp("2020-01-01 08:00:00")
+        sql = diff_sheet(parser, mysql, "t", keyed, entry, key_columns=["k"])[0][0]
+        self.assertEqual(sql.count("UPDATE"), 1)
+        self.assertIn("MODIFY COLUMN `a` DATETIME;", sql)
+    
+    def test_result_cache(self):
+        """测试转换结果缓存的LRU淘汰、磁盘缓存和命中统计"""
+        key = cache_key(b"content", dialect='mysql', sheet=None)
+        self.assertEqual(key, cache_key(b"content", sheet=None, dialect='mysql'))
+        self.assertNotEqual(key, cache_key(b"content", dialect='sqlite', sheet=None))
+        self.assertNotEqual(key, cache_key(b"other", dialect='mysql', sheet=None))
+        
+        cache_dir = self.temp_path / "cache"
+        cache = ResultCache(max_entries=2, cache_dir=cache_dir)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", ["A"])
+        cache.put("b", ["B"])
+        self.assertEqual(cache.get("a"), ["A"])
+        cache.put("c", ["C"])
+        self.assertEqual(cache.stats()['entries'], 2)
+        
+        # 内存中已淘汰的结果从磁盘读取，新的缓存实例也能命中
+        self.assertEqual(cache.get("b"), ["B"])
+        self.assertEqual(ResultCache(cache_dir=cache_dir).get("c"), ["C"])
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (2, 1))
+        
+        # 磁盘缓存超过大小上限时淘汰最久未使用的文件
+        small = ResultCache(max_entries=0, cache_dir=self.temp_path / "small", max_disk_bytes=20)
+        small.put("x", ["x" * 10])
+        os.utime(small._disk_path("x"), (0, 0))
+        small.put("y", ["y" * 10])
+        self.assertIsNone(small.get("x"))
+        self.assertEqual(small.get("y"), ["y" * 10])
+    
+    def test_sheet_cache(self):
+        """测试解析结果缓存的命中、内存映射加载和按大小淘汰"""
+        cache = SheetCache(self.temp_path / "sheets")
+        expected = ExcelParser(self.excel_file).parse_sheet("测试")
+        self.assertEqual(ExcelParser(self.excel_file, sheet_cache=cache).parse_sheet("测试")['data'], expected['data'])
+        
+        # 新的解析器命中缓存，不再读取工作表；数值列以内存映射方式加载
+        profiler = Profiler()
+        cached = ExcelParser(self.excel_file, profiler=profiler, sheet_cache=cache).parse_sheet("测试")
+        self.assertNotIn('read', profiler.report()['stages'])
+        self.assertEqual(cached['types'], expected['types'])
+        self.assertEqual(cached['key_columns'], expected['key_columns'])
+        self.assertEqual(cached['data'], expected['data'])
+        values = cached['data'].frame["整数列"].to_numpy()
+        while isinstance(values.base, np.ndarray):
+            values = values.base
+        self.assertIsInstance(values.base, mmap.mmap)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        
+        # 更换方言时输出与不使用缓存时一致；解析范围不同时不命中
+        for dialect in ['mysql', 'sqlite', 'postgresql']:
+            self.assertEqual(convert_workbook(self.excel_file, dialect=dialect, sheet_cache=cache),
+                             convert_workbook(self.excel_file, dialect=dialect))
+        ExcelParser(self.excel_file, sheet_cache=cache).parse_sheet("测试", valid_column_start=1)
+        self.assertEqual(cache.stats()['entries'], 2)
+        
+        # 总大小超过上限时淘汰最久未使用的条目
+        small = SheetCache(self.temp_path / "small", max_disk_bytes=cache.stats()['disk_bytes'] // 2 + 1)
+        ExcelParser(self.excel_file, sheet_cache=small).parse_sheet("测试")
+        ExcelParser(self.excel_file, sheet_cache=small).parse_sheet("测试", valid_column_start=1)
+        self.assertEqual(small.stats()['entries'], 1)
+    
+    def test_worker_pool(self):
+        """测试工作池的有界队列和进程模式"""
+        release = threading.Event()
+        pool = WorkerPool(max_workers=1, max_queue=1, mode='thread')
+        futures = [pool.submit(release.wait), pool.submit(release.wait)]
+        with self.assertRaises(WorkerPoolFull):
+            pool.submit(release.wait)
+        release.set()
+        pool.shutdown()
+        self.assertTrue(all(future.done() for future in futures))
+        
+        pool = WorkerPool(max_workers=2)
+        try:
+            sql_statements = asyncio.run(pool.run(convert_workbook, str(self.excel_file), dialect='sqlite'))
+        finally:
+            pool.shutdown()
+        self.assertEqual(sql_statements, convert_workbook(self.excel_file, dialect='sqlite'))
+    
+    def test_job_manager(self):
+        """测试后台转换任务的进度和过期删除"""
+        manager = JobManager(concurrency=1, ttl=60, work_dir=self.temp_path / "jobs")
+        try:
+            job = manager.create("上传.xlsx")
+            shutil.copy(self.excel_file, job.source_path)
+            manager.start(job, dialect='sqlite')
+            failed = manager.create("上传.xlsx")
+            shutil.copy(self.excel_file, failed.source_path)
+            manager.start(failed, sheet_names=["不存在"])
+        finally:
+            manager.shutdown()
+        
+        self.assertEqual(job.status, JOB_DONE)
+        self.assertEqual((job.sheets_total, job.sheets_done, job.rows_emitted), (1, 1, 5))
+        self.assertEqual(job.result_path.read_text(encoding='utf-8'),
+                         "\n\n".join(convert_workbook(self.excel_file, dialect='sqlite')))
+        self.assertFalse(job.source_path.exists())
+        self.assertEqual(failed.status, JOB_FAILED)
+        self.assertIn("不存在", failed.error)
+        
+        job.finished_at = time.time() - 61
+        self.assertIsNone(manager.get(job.id))
+        self.assertFalse(job.work_dir.exists())
+        self.assertIs(manager.get(failed.id), failed)
+    
+    def test_api_endpoints(self):
+        """测试/sheets、/convert/stream和/jobs接口"""
+        client = TestClient(api.app)
+        content = self.excel_file.read_bytes()
+        upload = {"file": ("test_data.xlsx", content)}
+        
+        response = client.post("/sheets", files=upload, data={"preview_rows": 2})
+        self.assertEqual(response.status_code, 200)
+        sheet = response.json()["sheets"][0]
+        self.assertEqual((sheet["name"], sheet["rows"], sheet["columns"]), ("测试", 6, 5))
+        self.assertEqual(sheet["preview"][0], ["整数列", "浮点列", "文本列", "日期列", "布尔列"])
+        self.assertEqual(client.post("/sheets", files=upload, data={"preview_rows": -1}).status_code, 400)
+        self.assertEqual(client.post("/sheets", files={"file": ("a.xlsx", b"not excel")}).status_code, 400)
+        
+        expected = "\n\n".join(convert_workbook(self.excel_file, dialect='postgresql'))
+        response = client.post("/convert/stream", files=upload, data={"dialect": "postgresql", "batch_size": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, expected)
+        for data in ({"sheet": "不存在"}, {"batch_size": 0}):
+            self.assertEqual(client.post("/convert/stream", files=upload, data=data).status_code, 400)
+        self.assertEqual(client.post("/convert/stream", files={"file": ("a.xlsx", b"not excel")}).status_code, 400)
+        
+        response = client.post("/jobs", files=upload, data={"dialect": "postgresql"})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        failed_id = client.post("/jobs", files=upload, data={"sheet": "不存在"}).json()["job_id"]
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            statuses = {client.get(f"/jobs/{job_id}").json()["status"], client.get(f"/jobs/{failed_id}").json()["status"]}
+            if statuses <= {JOB_DONE, JOB_FAILED}:
+                break
+            time.sleep(0.05)
+        self.assertEqual(client.get(f"/jobs/{job_id}").json()["status"], JOB_DONE)
+        self.assertEqual(client.get(f"/jobs/{job_id}/result").text, expected)
+        self.assertEqual(client.get(f"/jobs/{failed_id}/result").status_code, 409)
+        self.assertEqual(client.get("/jobs/不存在").status_code, 404)
+    
+    def test_convert_endpoint(self):
+        """测试/convert接口的两种工作池模式和上传大小上限"""
+        content = self.excel_file.read_bytes()
+        upload = {"file": ("test_data.xlsx", content)}
+        expected = convert_workbook(self.excel_file, dialect='sqlite')
+        
+        worker_pool, result_cache = api.worker_pool, api.result_cache
+        try:
+            for mode in ('thread', 'process'):
+                api.worker_pool = WorkerPool(max_workers=1, mode=mode)
+                api.result_cache = ResultCache()
+                response = TestClient(api.app).post("/convert?dialect=sqlite", files=upload)
+                api.worker_pool.shutdown()
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.headers["X-Cache"], "MISS")
+                self.assertEqual(response.json()["sql_statements"], expected)
+        finally:
+            api.worker_pool, api.result_cache = worker_pool, result_cache
+        
+        # 声明的Content-Length超过上限，或分块上传累计超过上限时返回413
+        client = TestClient(api.UploadLimitMiddleware(api.app, max_bytes=len(content)))
+        self.assertEqual(client.post("/sheets", files=upload).status_code, 413)
+        boundary = "chat-excel-boundary"
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.xlsx\"\r\n\r\n"
+        ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+        response = client.post(
+            "/sheets",
+            content=(body[start:start + 1024] for start in range(0, len(body), 1024)),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        )
+        self.assertEqual(response.status_code, 413)
+        client = TestClient(api.UploadLimitMiddleware(api.app, max_bytes=len(body)))
+        response = client.post(
+            "/sheets",
+            content=(body[start:start + 1024] for start in range(0, len(body), 1024)),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        )
+        self.assertEqual(response.status_code, 200)
+    
+    def test_in_memory_sources(self):
+        """测试从文件内容和文件对象解析，结果与文件路径一致"""
+        expected = convert_workbook(self.excel_file, dialect='postgresql')
+        content = self.excel_file.read_bytes()
+        
+        for source in (content, memoryview(content)):
+            parser = ExcelParser(source)
+            self.assertTrue(parser.can_stream())
+            self.assertEqual(convert_workbook(source, dialect='postgresql', jobs=2), expected)
+        
+        with open(self.excel_file, 'rb') as f:
+            parser = ExcelParser(f)
+            chunks = iter_workbook_sql(parser, SQLGenerator(dialect='postgresql'), parser.get_sheet_names())
+            self.assertEqual("".join(chunks), "\n\n".join(expected))
+    
+    def test_benchmarks(self):
+        """测试合成工作簿生成和基线比较"""
+        frame = generate_frame(50, 7, type_mix='int:2,text', null_ratio=0.2, string_length=8)
+        self.assertEqual(list(frame.columns), ['int_1', 'int_2', 'text_3', 'int_4', 'int_5', 'text_6', 'int_7'])
+        self.assertTrue(frame['text_3'].dropna().str.len().eq(8).all())
+        self.assertTrue(frame.isna().any().all())
+        with self.assertRaises(ValueError):
+            generate_frame(10, 2, type_mix='int,blob')
+        
+        excel_file = self.temp_path / "benchmark.xlsx"
+        self.assertEqual(generate_workbook(excel_file, rows=20, columns=5, sheets=2), ['Sheet1', 'Sheet2'])
+        stages = run_benchmarks(excel_file, repeat=1, dialects=('sqlite',))
+        self.assertEqual(set(stages), {
+            'open', 'parse_sheet', '_infer_column_types', '_handle_null_values',
+            'generate_create_table.sqlite', 'generate_insert_data.sqlite'
+        })
+        
+        baseline = {'params': {'rows': 20}, 'stages': {'parse_sheet': 0.1, 'open': 0.001}}
+        result = {'params': {'rows': 20}, 'stages': {'parse_sheet': 0.2, 'open': 0.004, 'new_stage': 1.0}}
+        rows = compare_with_baseline(result, baseline)
+        self.assertEqual([(stage, regressed) for stage, *_, regressed in rows], [('parse_sheet', True), ('open', False)])
+        with self.assertRaises(ValueError):
+            compare_with_baseline({'params': {'rows': 10}, 'stages': {}}, baseline)
+    
     def test_sql_generator_mysql(self):
         """测试MySQL SQL生成器"""
         parser = ExcelParser(self.excel_file)
@@ -93,6 +911,31 @@ class TestChatExcel(unittest.TestCase):
         self.assertIn("INSERT INTO", insert_sql)
         self.assertIn("`test_table`", insert_sql)
     
+    def test_format_columns(self):
+        """测试按列格式化与逐值格式化结果一致"""
+        generator = SQLGenerator(dialect='mysql')
+        types = {
+            "整数": "INT", "小数": "DECIMAL(20,2)", "文本": "VARCHAR(50)", "日期时间": "DATETIME",
+            "日期": "DATE", "布尔": "BOOLEAN", "混合": "TEXT", "混合整数": "TINYINT"
+        }
+        rows = [
+            {"整数": 1, "小数": 1.5, "文本": "it's", "日期时间": pd.Timestamp("2020-01-01 10:11:12"),
+             "日期": pd.Timestamp("2020-01-01"), "布尔": True, "混合": "x", "混合整数": 1},
+            {"整数": None, "小数": np.nan, "文本": None, "日期时间": pd.NaT,
+             "日期": "foo", "布尔": False, "混合": 3, "混合整数": "12"},
+            {"整数": 3, "小数": 2, "文本": "abc", "日期时间": None,
+             "日期": None, "布尔": True, "混合": 2.5, "混合整数": True},
+        ]
+        headers = list(types)
+        
+        expected = [", ".join(generator._format_value(row.get(h), types[h]) for h in headers) for row in rows]
+        frame = pd.DataFrame.from_records(rows, columns=headers)
+        self.assertEqual(generator._format_frame(frame, headers, types), expected)
+        for header in headers:
+            self.assertEqual(generator._format_column(frame[header], types[header]),
+                             [generator._format_value(row.get(header), types[header]) for row in rows])
+        self.assertEqual(expected[1].split(", ")[:4], ["NULL"] * 4)
+    
     def test_sql_generator_sqlite(self):
         """测试SQLite SQL生成器"""
         parser = ExcelParser(self.excel_file)